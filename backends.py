@@ -0,0 +1,187 @@
+import time
+import threading
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+
+from settings import get_settings
+
+# Сколько держать открытым неиспользуемое соединение с API, секунд
+# (httpx по умолчанию закрывает его через 5 секунд, и каждая транскрибация заново тратит время на DNS и TLS)
+KEEPALIVE_SECONDS = 300
+
+# Соединение, которым пользовались недавно, повторно не прогревается
+WARM_UP_INTERVAL = 60
+
+# Таймаут прогревающего запроса: недоступный API не должен задерживать запуск
+WARM_UP_TIMEOUT = 10
+
+
+class TranscriptionBackend:
+    """Базовый класс движка распознавания речи"""
+
+    # Короткое имя движка для выбора в настройках ("openai", "local")
+    name = ""
+
+    # Максимальный размер файла, который движок принимает за один запрос (None - без ограничений)
+    max_file_size = None
+
+    def transcribe(self, audio_file, language=None, prompt=None, with_segments=False):
+        """
+        Распознать один файл
+
+        Args:
+            audio_file: Путь к файлу, открытый файл или BytesIO с атрибутом name
+            language (str, optional): Код языка (например, "ru", "en", "kk")
+            prompt (str, optional): Подсказка с предыдущим контекстом или словарем терминов
+            with_segments (bool): Вернуть сегменты с таймкодами
+
+        Returns:
+            dict: {"text": str, "segments": list, "error": None}
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Подготовить движок к первому запросу (по умолчанию ничего не делает)"""
+        pass
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """Распознавание через Whisper API от OpenAI"""
+
+    name = "openai"
+    max_file_size = 25 * 1024 * 1024
+
+    def __init__(self, api_key, model="whisper-1"):
+        # Создаем клиента OpenAI (только новая версия API 1.x) с долгоживущими соединениями
+        self.client = OpenAI(api_key=api_key, http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20,
+                                keepalive_expiry=KEEPALIVE_SECONDS)
+        ))
+        self.model = model
+        # Время последнего успешного обращения к API (по time.monotonic)
+        self.last_used = 0.0
+        print("[INFO] Инициализирован клиент OpenAI API v1.x")
+
+    def transcribe(self, audio_file, language=None, prompt=None, with_segments=False):
+        if isinstance(audio_file, str):
+            with open(audio_file, "rb") as f:
+                return self.transcribe(f, language=language, prompt=prompt, with_segments=with_segments)
+
+        # Создаем параметры для запроса
+        params = {
+            "model": self.model,
+            "file": audio_file
+        }
+
+        # Добавляем параметр языка, если он указан
+        if language:
+            params["language"] = language
+
+        if prompt:
+            params["prompt"] = prompt
+
+        if with_segments:
+            params["response_format"] = "verbose_json"
+            params["timestamp_granularities"] = ["segment"]
+
+        # Отправляем запрос
+        response = self.client.audio.transcriptions.create(**params)
+        self.last_used = time.monotonic()
+
+        segments = []
+        for segment in (getattr(response, "segments", None) or []):
+            segments.append({
+                "start": float(segment.start),
+                "end": float(segment.end),
+                "text": segment.text.strip()
+            })
+
+        return {"text": response.text, "segments": segments, "error": None}
+
+    def warm_up(self):
+        """
+        Открыть соединение с API заранее легким запросом информации о модели
+
+        DNS, TLS и проверка ключа выполняются до первой транскрибации, а открытое
+        соединение остается в пуле клиента. Если API использовался в последние
+        WARM_UP_INTERVAL секунд, соединение уже открыто и запрос не отправляется.
+        """
+        if time.monotonic() - self.last_used < WARM_UP_INTERVAL:
+            return
+        self.client.with_options(timeout=WARM_UP_TIMEOUT, max_retries=0).models.retrieve(self.model)
+        self.last_used = time.monotonic()
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Локальное распознавание на CPU через faster-whisper (квантование int8)"""
+
+    name = "local"
+
+    # Загруженные модели общие для всех экземпляров: модель грузится один раз и остается в памяти
+    _models = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, model_size="small", device="cpu", compute_type="int8", cpu_threads=0):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        # CTranslate2 не гарантирует корректную работу одной модели из нескольких потоков
+        self.inference_lock = threading.Lock()
+
+    def _get_model(self):
+        """Загрузить модель при первом обращении"""
+        key = (self.model_size, self.device, self.compute_type)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise RuntimeError(
+                        "Для локального распознавания установите пакет faster-whisper: pip install faster-whisper"
+                    )
+
+                print(f"[INFO] Загрузка локальной модели Whisper '{self.model_size}' ({self.device}, {self.compute_type})...")
+                start_time = time.time()
+                model = WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads
+                )
+                self._models[key] = model
+                print(f"[INFO] Локальная модель загружена за {time.time() - start_time:.2f} секунд")
+            return model
+
+    def warm_up(self):
+        self._get_model()
+
+    def transcribe(self, audio_file, language=None, prompt=None, with_segments=False):
+        model = self._get_model()
+
+        with self.inference_lock:
+            segments_iter, info = model.transcribe(
+                audio_file,
+                language=language or None,
+                initial_prompt=prompt,
+                vad_filter=True
+            )
+            # Распознавание выполняется лениво, по мере чтения сегментов
+            segments = [
+                {"start": float(segment.start), "end": float(segment.end), "text": segment.text.strip()}
+                for segment in segments_iter
+            ]
+
+        text = " ".join(segment["text"] for segment in segments)
+        return {"text": text, "segments": segments if with_segments else [], "error": None}
+
+
+def create_local_backend():
+    """Создать локальный движок с параметрами из настроек"""
+    settings = get_settings()
+    return LocalWhisperBackend(
+        model_size=settings["transcription.local_model"],
+        compute_type=settings["transcription.local_compute_type"],
+        cpu_threads=settings["transcription.local_threads"]
+    )
@@ -1,21 +1,220 @@
 import os
 import csv
+import time
+import threading
+from contextlib import contextmanager
 import pandas as pd
-from datetime import datetime
+
+from search_index import TranscriptIndex
+from parquet_export import ParquetExporter
+from profiling import profiled
+
+# Колонки CSV. Порядок и названия используются поиском, экспортом в Parquet
+# и уже созданными файлами, поэтому не выносятся в настройки
+CSV_HEADERS = ("Имя менеджера", "Дата", "ID", "Резюме", "Таймкоды",
+               "Оплачено, сек", "Запросов", "Отправлено, байт", "Стоимость, $")
+
+# Задержка обновления индекса поиска после записи, сек: строки, дописанные подряд,
+# индексируются одним проходом в фоне, а не чтением файла и коммитом SQLite на каждую строку
+INDEX_SYNC_DELAY = 2.0
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(file_path):
+    """
+    Межпроцессная блокировка CSV файла на время записи
+    
+    Блокируется отдельный файл <имя>.lock, чтобы не мешать чтению самого CSV.
+    
+    Args:
+        file_path (str): Путь к CSV файлу
+    """
+    with open(file_path + ".lock", "a+b") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            # LK_LOCK повторяет попытку каждую секунду (до 10 раз), пока другой процесс держит блокировку
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class CSVBatchWriter:
+    """
+    Буферизованная запись строк в CSV через один открытый файл
+    
+    Строки накапливаются и сбрасываются на диск пачками: при наборе batch_size строк,
+    не реже чем раз в flush_interval секунд или при явном вызове flush().
+    fsync выполняется не чаще раза в fsync_interval секунд и при закрытии.
+    """
+    
+    def __init__(self, handler, batch_size=500, flush_interval=2.0, fsync_interval=10.0):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.pending = []
+        self.lock = threading.RLock()
+        self.last_fsync = time.time()
+        
+        file_headers = handler._get_file_headers()
+        self.headers = file_headers or handler.headers
+        self.file = open(handler.file_path, 'a', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        if file_headers is None:
+            self.pending.append(list(self.headers))
+        
+        # Фоновый сброс по времени, чтобы строки не задерживались в памяти при редкой записи
+        self.stop_event = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+    
+    def _flush_loop(self):
+        """Периодический сброс буфера, выполняемый в отдельном потоке"""
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WARNING] Ошибка при периодической записи в CSV: {e}")
+    
+    def write(self, values):
+        """
+        Добавить строку в буфер
+        
+        Args:
+            values (dict): Заголовок -> значение
+        """
+        with self.lock:
+            self.pending.append(self.handler._build_row(values, self.headers))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+    
+    def flush(self, fsync=False):
+        """
+        Записать накопленные строки в файл
+        
+        Args:
+            fsync (bool): Принудительно сбросить данные на диск
+        """
+        with self.lock:
+            if self.pending:
+                with file_lock(self.handler.file_path):
+                    self.writer.writerows(self.pending)
+                    self.file.flush()
+                    if fsync or time.time() - self.last_fsync >= self.fsync_interval:
+                        os.fsync(self.file.fileno())
+                        self.last_fsync = time.time()
+                self.pending = []
+                self.handler._schedule_index_sync()
+            elif fsync:
+                os.fsync(self.file.fileno())
+                self.last_fsync = time.time()
+    
+    def close(self):
+        """Сбросить буфер на диск и закрыть файл"""
+        self.stop_event.set()
+        if self.flush_thread.is_alive() and self.flush_thread is not threading.current_thread():
+            self.flush_thread.join(timeout=self.flush_interval + 1)
+        with self.lock:
+            try:
+                self.flush(fsync=True)
+            finally:
+                self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
 
 class CSVHandler:
     def __init__(self, file_path=None):
         self.file_path = file_path
-        self.headers = ["Имя менеджера", "Дата", "ID", "Резюме"]
+        self.headers = list(CSV_HEADERS)
         self.unsaved_changes = False
+        self.index = None
+        self.index_timer = None
+        self.index_timer_lock = threading.Lock()
+        # (путь, устройство, inode) файла и его заголовки, чтобы не читать их при каждой записи
+        self.file_headers = None
+        self.batch = None
+        if file_path:
+            self._open_index()
+    
+    def _open_index(self):
+        """Открыть индекс поиска для текущего файла и догнать его в фоне"""
+        self._cancel_index_sync()
+        self.file_headers = None
+        if self.index:
+            self.index.close()
+            self.index = None
+        try:
+            self.index = TranscriptIndex(self.file_path)
+        except Exception as e:
+            print(f"[WARNING] Не удалось открыть индекс поиска: {e}")
+            return
+        
+        # Первое построение индекса для большого файла может занять время, не блокируем интерфейс
+        threading.Thread(target=self._sync_index, daemon=True).start()
+    
+    def _sync_index(self):
+        """Добавить в индекс новые строки CSV файла"""
+        if not self.index:
+            return
+        try:
+            self.index.sync()
+        except Exception as e:
+            print(f"[WARNING] Ошибка при обновлении индекса поиска: {e}")
+    
+    def _schedule_index_sync(self):
+        """Обновить индекс в фоне через INDEX_SYNC_DELAY секунд, если обновление еще не запланировано"""
+        if not self.index:
+            return
+        with self.index_timer_lock:
+            if self.index_timer is None:
+                self.index_timer = threading.Timer(INDEX_SYNC_DELAY, self._run_scheduled_sync)
+                self.index_timer.daemon = True
+                self.index_timer.start()
+    
+    def _run_scheduled_sync(self):
+        # Снимаем отметку до чтения файла: строки, дописанные во время синхронизации,
+        # запланируют следующую
+        with self.index_timer_lock:
+            self.index_timer = None
+        self._sync_index()
+    
+    def _cancel_index_sync(self):
+        """Отменить запланированное обновление индекса"""
+        with self.index_timer_lock:
+            if self.index_timer is not None:
+                self.index_timer.cancel()
+                self.index_timer = None
     
     def set_file_path(self, file_path):
         """Установить путь к файлу CSV"""
+        self.end_batch()
         self.file_path = file_path
         self.unsaved_changes = False
+        self._open_index()
     
     def create_new_file(self, file_path):
         """Создать новый CSV файл с заголовками"""
+        self.end_batch()
+        
         # Проверяем, существует ли директория, иначе создаем её
         directory = os.path.dirname(file_path)
         if directory and not os.path.exists(directory):
@@ -28,9 +227,66 @@ class CSVHandler:
         
         self.file_path = file_path
         self.unsaved_changes = False
+        self._open_index()
         return file_path
     
-    def add_entry(self, manager_name, date, conversation_id, summary):
+    def _read_file_headers(self):
+        """
+        Прочитать заголовки существующего CSV файла
+        
+        Returns:
+            list: Заголовки файла или None, если файла нет или он пуст
+        """
+        if not os.path.isfile(self.file_path):
+            return None
+        
+        with open(self.file_path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            return next(csv.reader(csvfile), None)
+    
+    def _get_file_headers(self):
+        """
+        Заголовки CSV файла с кэшированием
+        
+        Файл перечитывается, только если он заменен (другое устройство или inode) или пуст.
+        
+        Returns:
+            list: Заголовки файла или None, если файла нет или он пуст
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            self.file_headers = None
+            return None
+        
+        key = (self.file_path, stat.st_dev, stat.st_ino)
+        if stat.st_size and self.file_headers and self.file_headers[0] == key:
+            return self.file_headers[1]
+        
+        headers = self._read_file_headers()
+        self.file_headers = (key, headers) if headers else None
+        return headers
+    
+    def _build_row(self, values, file_headers):
+        """
+        Разложить значения по колонкам файла
+        
+        Файлы, созданные старыми версиями программы, могут не содержать новых колонок.
+        В такие файлы пишутся только те колонки, которые в них есть, чтобы не сломать формат.
+        
+        Args:
+            values (dict): Заголовок -> значение
+            file_headers (list): Заголовки файла
+            
+        Returns:
+            list: Строка для записи
+        """
+        missing = [header for header in values if header not in file_headers and values[header]]
+        if missing:
+            print(f"[WARNING] В файле {self.file_path} нет колонок {missing}, эти данные не будут сохранены")
+        return [values.get(header, "") for header in file_headers]
+    
+    @profiled()
+    def add_entry(self, manager_name, date, conversation_id, summary, timestamps_file="", usage=None):
         """
         Добавить новую запись в CSV файл
         
@@ -39,26 +295,55 @@ class CSVHandler:
             date (str): Дата в формате ГГГГ-ММ-ДД
             conversation_id (str): ID переговора
             summary (str): Резюме переговора
+            timestamps_file (str, optional): Путь к файлу с таймкодами сегментов (SRT/VTT/JSONL)
+            usage (dict, optional): Расход распознавания (см. usage.request_usage)
             
         Returns:
             bool: True, если запись успешно добавлена
         """
         try:
-            # Проверяем, существует ли файл
-            file_exists = os.path.isfile(self.file_path)
+            values = {
+                "Имя менеджера": manager_name,
+                "Дата": date,
+                "ID": conversation_id,
+                "Резюме": summary,
+                "Таймкоды": timestamps_file
+            }
+            if usage:
+                values.update({
+                    "Оплачено, сек": f"{usage['billed_seconds']:.0f}",
+                    "Запросов": str(usage["requests"]),
+                    "Отправлено, байт": str(usage["bytes"]),
+                    "Стоимость, $": f"{usage['cost']:.4f}"
+                })
             
-            # Открываем файл для добавления записи
-            with open(self.file_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Если файл только что создан, добавляем заголовки
+            # В пакетном режиме строка попадает в буфер открытого файла
+            if self.batch:
+                self.batch.write(values)
+                return True
+            
+            with file_lock(self.file_path):
+                # Проверяем, существует ли файл, и какие в нем колонки
+                file_headers = self._get_file_headers()
+                file_exists = file_headers is not None
                 if not file_exists:
-                    writer.writerow(self.headers)
+                    file_headers = self.headers
                 
-                # Добавляем новую запись
-                writer.writerow([manager_name, date, conversation_id, summary])
+                # Открываем файл для добавления записи
+                with open(self.file_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
+                    writer = csv.writer(csvfile)
+                    
+                    # Если файл только что создан, добавляем заголовки
+                    if not file_exists:
+                        writer.writerow(self.headers)
+                    
+                    # Добавляем новую запись
+                    writer.writerow(self._build_row(values, file_headers))
             
             self.unsaved_changes = False
+            
+            # Индекс дочитает новые строки в фоне; search() перед поиском догоняет его сам
+            self._schedule_index_sync()
             return True
             
         except Exception as e:
@@ -85,6 +370,85 @@ class CSVHandler:
             print(f"Ошибка при чтении CSV: {e}")
             return []
     
+    def start_batch(self, batch_size=500, flush_interval=2.0, fsync_interval=10.0):
+        """
+        Включить пакетный режим записи: файл остается открытым, строки пишутся пачками
+        
+        Args:
+            batch_size (int): Количество строк, после которого буфер сбрасывается в файл
+            flush_interval (float): Максимальное время хранения строк в буфере, сек
+            fsync_interval (float): Минимальный интервал между fsync, сек
+            
+        Returns:
+            CSVBatchWriter: Активный буферизованный писатель
+        """
+        if not self.batch:
+            self.batch = CSVBatchWriter(self, batch_size=batch_size, flush_interval=flush_interval,
+                                        fsync_interval=fsync_interval)
+        return self.batch
+    
+    def flush(self):
+        """Записать на диск строки, накопленные в пакетном режиме"""
+        if self.batch:
+            self.batch.flush(fsync=True)
+    
+    def end_batch(self):
+        """Выключить пакетный режим, записав все накопленные строки"""
+        if self.batch:
+            batch, self.batch = self.batch, None
+            batch.close()
+    
+    @contextmanager
+    def batched(self, batch_size=500, flush_interval=2.0, fsync_interval=10.0):
+        """
+        Пакетный режим записи на время блока with
+        
+        Пример:
+            with handler.batched():
+                for row in rows:
+                    handler.add_entry(*row)
+        """
+        self.start_batch(batch_size=batch_size, flush_interval=flush_interval, fsync_interval=fsync_interval)
+        try:
+            yield self
+        finally:
+            self.end_batch()
+    
+    def search(self, query, limit=50):
+        """
+        Полнотекстовый поиск по сохраненным записям
+        
+        Args:
+            query (str): Слова для поиска
+            limit (int): Максимальное количество результатов
+            
+        Returns:
+            list: Результаты TranscriptIndex.search (пустой список, если индекс недоступен)
+        """
+        if not self.index:
+            return []
+        try:
+            # Подхватываем строки, дописанные в файл другими программами
+            self.index.sync()
+            return self.index.search(query, limit=limit)
+        except Exception as e:
+            print(f"Ошибка при поиске: {e}")
+            return []
+    
+    def export_parquet(self, dataset_dir):
+        """
+        Дописать новые записи в набор данных Parquet для аналитики
+        
+        Args:
+            dataset_dir (str): Каталог набора данных
+            
+        Returns:
+            int: Количество экспортированных строк
+        """
+        # Экспортируем только то, что уже записано в файл
+        self.flush()
+        return ParquetExporter(self.file_path, dataset_dir).sync()
+    
     def has_unsaved_changes(self):
         """Проверить, есть ли несохраненные изменения"""
-        return self.unsaved_changes
\ No newline at end of file
+        return self.unsaved_changes or bool(self.batch and self.batch.pending)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import io
+import csv
+
+
+class CSVTail:
+    """
+    Потоковое чтение строк CSV файла, начиная с известного смещения в байтах
+
+    Используется для инкрементальной обработки: потребитель запоминает end_offset
+    и в следующий раз читает только строки, дописанные после него.
+
+    Читаются только полностью записанные строки (запись заканчивается переводом строки
+    вне кавычек). Строка, которую другой процесс еще дописывает, не возвращается,
+    и end_offset остается перед ней, поэтому она будет прочитана в следующий раз.
+
+    Пример:
+        tail = CSVTail(path, offset)
+        for row in tail:
+            ...
+        offset = tail.end_offset
+    """
+
+    def __init__(self, csv_path, offset=0):
+        self.csv_path = csv_path
+        self.offset = offset
+        # Заголовки заполняются при чтении с начала файла
+        self.headers = None
+        self.end_offset = offset
+
+    def __iter__(self):
+        with open(self.csv_path, "rb") as raw:
+            raw.seek(self.offset)
+            position = self.offset
+            record = b""
+            quotes = 0
+
+            for line in raw:
+                record += line
+                quotes += line.count(b'"')
+                # Строка не дописана до конца или перевод строки стоит внутри значения в кавычках
+                if not line.endswith(b"\n") or quotes % 2:
+                    continue
+
+                # BOM есть только в начале файла
+                encoding = "utf-8-sig" if position == 0 else "utf-8"
+                row = next(csv.reader(io.StringIO(record.decode(encoding), newline="")), None)
+                is_header = position == 0
+                position += len(record)
+                record = b""
+                quotes = 0
+
+                if is_header:
+                    self.headers = row
+                elif row:
+                    yield row
+                self.end_offset = position
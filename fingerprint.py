@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import sqlite3
+import struct
+import hashlib
+import threading
+
+from wav_reader import WavReader
+
+# Размер блока при хешировании файла
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Версия алгоритма отпечатка: при изменении старые записи кеша перестают совпадать
+FINGERPRINT_VERSION = "1"
+
+# Как часто проверять размер кеша: раз в столько сохраненных результатов
+PRUNE_EVERY = 100
+
+
+def audio_fingerprint(audio_path):
+    """
+    Вычислить отпечаток аудиофайла
+
+    Для PCM WAV хешируются только параметры формата и сами отсчеты, поэтому файлы
+    с разными именами, датами и служебными блоками заголовка (LIST, fact и т.п.)
+    получают одинаковый отпечаток. Остальные форматы хешируются целиком.
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+
+    Returns:
+        str: Шестнадцатеричный отпечаток
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(FINGERPRINT_VERSION.encode())
+
+    try:
+        reader = WavReader(audio_path)
+    except (ValueError, OSError, struct.error):
+        reader = None
+
+    if reader is not None:
+        with reader:
+            digest.update(f"pcm:{reader.format_tag}:{reader.channels}:{reader.sample_rate}:"
+                          f"{reader.bits_per_sample}:".encode())
+            position = reader.data_offset
+            end = reader.data_offset + reader.data_size
+            while position < end:
+                block = reader.view[position:min(position + HASH_BLOCK_SIZE, end)]
+                digest.update(block)
+                block.release()
+                position += HASH_BLOCK_SIZE
+        return digest.hexdigest()
+
+    digest.update(b"file:")
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_fingerprint(data):
+    """
+    Отпечаток подготовленного фрагмента аудио в памяти (например, части длинной записи)
+
+    Args:
+        data (bytes): Закодированный фрагмент
+
+    Returns:
+        str: Шестнадцатеричный отпечаток
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(FINGERPRINT_VERSION.encode())
+    digest.update(b"data:")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Индекс уже распознанных записей на SQLite
+
+    Результат сохраняется по отпечатку аудио и языку. Повторная отправка той же
+    записи (в том числе под другим именем) возвращает сохраненный результат без
+    обращения к движку распознавания. Отпечатки файлов запоминаются по пути,
+    размеру и времени изменения, чтобы не хешировать один и тот же файл повторно.
+    """
+
+    def __init__(self, db_path="transcript_cache.sqlite", max_entries=0):
+        """
+        Args:
+            db_path (str): Файл базы SQLite
+            max_entries (int): Максимум хранимых результатов; самые старые удаляются (0 - без ограничения)
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.stored = 0
+        self.lock = threading.Lock()
+
+        # Кеш используется из потоков транскрибации, доступ защищен блокировкой
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, fingerprint TEXT)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "fingerprint TEXT, language TEXT, backend TEXT, text TEXT, segments TEXT, "
+                "has_segments INTEGER, source_path TEXT, created REAL, "
+                "PRIMARY KEY (fingerprint, language))"
+            )
+        self.prune()
+
+    def fingerprint(self, audio_path):
+        """
+        Получить отпечаток файла, используя запомненное значение, если файл не менялся
+
+        Args:
+            audio_path (str): Путь к аудиофайлу
+
+        Returns:
+            str: Отпечаток аудио
+        """
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM files WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime)
+            ).fetchone()
+        if row:
+            return row[0]
+
+        fingerprint = audio_fingerprint(path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime, fingerprint) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, fingerprint)
+            )
+        return fingerprint
+
+    def lookup(self, fingerprint, language=None, with_segments=True):
+        """
+        Найти сохраненный результат распознавания
+
+        Args:
+            fingerprint (str): Отпечаток аудио
+            language (str, optional): Код языка распознавания
+            with_segments (bool): Нужны ли сегменты с таймкодами
+
+        Returns:
+            dict: Результат в формате {"text", "segments", "error"} или None
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT text, segments, has_segments, source_path FROM results WHERE fingerprint = ? AND language = ?",
+                (fingerprint, language or "")
+            ).fetchone()
+        if row is None:
+            return None
+
+        text, segments, has_segments, source_path = row
+        if with_segments and not has_segments:
+            # Ранее распознавали без таймкодов - нужен новый запрос
+            return None
+
+        print(f"[INFO] Запись уже распознавалась ранее ({source_path}), используется сохраненный результат")
+        return {"text": text, "segments": json.loads(segments) if with_segments else [], "error": None}
+
+    def store(self, fingerprint, result, language=None, backend=None, with_segments=True, source_path=None):
+        """
+        Сохранить успешный результат распознавания
+
+        Args:
+            fingerprint (str): Отпечаток аудио
+            result (dict): Результат в формате {"text", "segments", "error"}
+            language (str, optional): Код языка распознавания
+            backend (str, optional): Движок, который выполнил распознавание
+            with_segments (bool): Результат содержит сегменты с таймкодами
+            source_path (str, optional): Путь к исходному файлу (для журнала)
+        """
+        if result.get("error"):
+            return
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results "
+                "(fingerprint, language, backend, text, segments, has_segments, source_path, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, language or "", backend or "", result["text"],
+                 json.dumps(result["segments"], ensure_ascii=False), int(bool(with_segments)),
+                 source_path, time.time())
+            )
+            self.stored += 1
+        if self.stored % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Удалить самые старые результаты сверх max_entries"""
+        if not self.max_entries:
+            return
+        with self.lock, self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            # Отпечатки файлов без сохраненных результатов больше не нужны
+            self.connection.execute("DELETE FROM files WHERE fingerprint NOT IN (SELECT fingerprint FROM results)")
+        if deleted:
+            print(f"[INFO] Из кеша результатов удалено старых записей: {deleted}")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,440 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from settings import configure, parse_overrides
+
+# Расширения аудиофайлов, которые берутся из папки с корпусом записей
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+
+# Примерный объем одной секунды аудио для оценки длительности в ответе заглушки (16 кГц, 16 бит, моно)
+MOCK_BYTES_PER_SECOND = 32000
+
+# Интервал замера памяти во время прогона
+MEMORY_SAMPLE_INTERVAL = 0.5
+
+
+def parse_latency(spec):
+    """
+    Разобрать распределение задержки ответа заглушки
+
+    Форматы: "fixed:СЕК", "uniform:МИН:МАКС", "normal:СРЕДНЕЕ:СКО", "lognormal:MU:SIGMA"
+    (медиана lognormal равна e^MU секунд).
+
+    Returns:
+        callable: Функция без аргументов, возвращающая задержку в секундах
+    """
+    name, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(":")] if params else []
+        if name == "fixed" and len(values) == 1:
+            return lambda: values[0]
+        if name == "uniform" and len(values) == 2:
+            return lambda: random.uniform(values[0], values[1])
+        if name == "normal" and len(values) == 2:
+            return lambda: max(0.0, random.gauss(values[0], values[1]))
+        if name == "lognormal" and len(values) == 2:
+            return lambda: random.lognormvariate(values[0], values[1])
+    except ValueError:
+        pass
+    raise ValueError(f"Неверное распределение задержки: {spec!r}. "
+                     f"Примеры: fixed:1.5, uniform:0.5:2, normal:1:0.3, lognormal:0.5:0.4")
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу (fraction от 0 до 1)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def percentiles(values):
+    """p50, p95 и p99 с точностью до миллисекунды (None, если значений нет)"""
+    result = {}
+    for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        value = percentile(values, fraction)
+        result[name] = round(value, 3) if value is not None else None
+    return result
+
+
+class MockWhisperHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка эндпоинта POST /v1/audio/transcriptions
+
+    Отвечает с задержкой из заданного распределения, с заданной долей ошибок 500
+    и ответов 429 (случайно или при превышении числа одновременных запросов).
+    """
+
+    server_version = "MockWhisper/1.0"
+
+    def log_message(self, format, *args):
+        # Журнал запросов заглушки не нужен - итоги собираются в счетчиках
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/audio/transcriptions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        mock = self.server.mock
+
+        with mock.lock:
+            mock.counters["requests"] += 1
+            status = 200
+            if mock.max_concurrent and mock.in_flight >= mock.max_concurrent:
+                status = 429
+            elif random.random() < mock.rate_limit_rate:
+                status = 429
+            elif random.random() < mock.error_rate:
+                status = 500
+            if status == 200:
+                mock.in_flight += 1
+                mock.counters["peak_in_flight"] = max(mock.counters["peak_in_flight"], mock.in_flight)
+
+        if status == 429:
+            with mock.lock:
+                mock.counters["rate_limited"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                            "code": "rate_limit_exceeded"}},
+                            {"Retry-After": f"{mock.retry_after:g}"})
+            return
+        if status == 500:
+            with mock.lock:
+                mock.counters["errors"] += 1
+            self._send_json(500, {"error": {"message": "Internal server error", "type": "server_error"}})
+            return
+
+        try:
+            duration = max(1.0, length / MOCK_BYTES_PER_SECOND)
+            time.sleep(mock.latency() + mock.seconds_per_mb * length / (1024 * 1024))
+            text = f"тестовая расшифровка фрагмента длительностью {duration:.0f} секунд"
+            match = re.search(rb'name="response_format"\r\n\r\n(\w+)', body)
+            if match and match.group(1) == b"verbose_json":
+                payload = {"task": "transcribe", "language": "russian", "duration": duration, "text": text,
+                           "segments": [{"id": 0, "seek": 0, "start": 0.0, "end": duration, "text": text,
+                                         "tokens": [], "temperature": 0.0, "avg_logprob": 0.0,
+                                         "compression_ratio": 1.0, "no_speech_prob": 0.0}]}
+            else:
+                payload = {"text": text}
+            self._send_json(200, payload)
+            with mock.lock:
+                mock.counters["ok"] += 1
+        finally:
+            with mock.lock:
+                mock.in_flight -= 1
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockWhisperServer:
+    """Локальная заглушка Whisper API в фоновом потоке"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="lognormal:0.5:0.4", error_rate=0.0,
+                 rate_limit_rate=0.0, max_concurrent=0, retry_after=1.0, seconds_per_mb=0.0):
+        """
+        Args:
+            port (int): Порт (0 - любой свободный)
+            latency (str): Распределение задержки ответа (см. parse_latency)
+            error_rate (float): Доля ответов 500
+            rate_limit_rate (float): Доля случайных ответов 429
+            max_concurrent (int): Сколько запросов обрабатывается одновременно; сверх этого - 429 (0 - без ограничения)
+            retry_after (float): Значение заголовка Retry-After в ответах 429, секунд
+            seconds_per_mb (float): Дополнительная задержка на каждый МБ загруженного аудио
+        """
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.seconds_per_mb = seconds_per_mb
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "peak_in_flight": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), MockWhisperHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-whisper")
+        self.thread.daemon = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        print(f"[INFO] Заглушка Whisper API запущена: {self.base_url}")
+        return self
+
+    def snapshot(self):
+        """Текущие значения счетчиков и сброс пика одновременных запросов"""
+        with self.lock:
+            counters = dict(self.counters)
+            self.counters["peak_in_flight"] = self.in_flight
+        return counters
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class MemorySampler:
+    """Периодический замер памяти процесса во время прогона"""
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.process = psutil.Process() if psutil else None
+
+    def _sample(self, start_time):
+        sample = {"time": round(time.time() - start_time, 3)}
+        if self.process is not None:
+            sample["rss_mb"] = round(self.process.memory_info().rss / (1024 * 1024), 1)
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            sample["python_mb"] = round(current / (1024 * 1024), 1)
+        self.samples.append(sample)
+
+    def _run(self, start_time):
+        while not self.stop_event.wait(self.interval):
+            self._sample(start_time)
+
+    def start(self):
+        start_time = time.time()
+        self._sample(start_time)
+        self.thread = threading.Thread(target=self._run, args=(start_time,), name="memory-sampler")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        return self.samples
+
+
+def find_corpus(paths):
+    """Аудиофайлы из указанных файлов и папок (папки обходятся рекурсивно)"""
+    corpus = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                corpus.extend(os.path.join(root, name) for name in sorted(files)
+                              if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(path):
+            corpus.append(path)
+    return corpus
+
+
+def run_level(transcriber, corpus, concurrency, repeat, output_dir, language=None, arrival_rate=None, mock=None):
+    """
+    Прогнать корпус через очередь транскрибации и запись в CSV при заданной параллельности
+
+    Args:
+        transcriber (WhisperTranscriber): Транскрибатор, настроенный на заглушку
+        corpus (list): Пути к аудиофайлам
+        concurrency (int): Число обработчиков очереди
+        repeat (int): Сколько раз повторить корпус
+        output_dir (str): Папка для CSV и служебных файлов прогона
+        language (str, optional): Код языка
+        arrival_rate (float, optional): Средняя частота поступления файлов в секунду
+            (пуассоновский поток); без нее весь корпус ставится в очередь сразу
+        mock (MockWhisperServer, optional): Заглушка для подсчета ответов 429 и 500
+
+    Returns:
+        dict: Метрики прогона
+    """
+    from server import TranscriptionService
+
+    level_dir = os.path.join(output_dir, f"concurrency_{concurrency}")
+    os.makedirs(level_dir, exist_ok=True)
+    csv_path = os.path.join(level_dir, "results.csv")
+    service = TranscriptionService(transcriber, csv_path=csv_path, upload_dir=os.path.join(level_dir, "uploads"),
+                                   workers=concurrency)
+    if mock:
+        mock.snapshot()
+
+    print(f"[INFO] Прогон: параллельность {concurrency}, файлов {len(corpus) * repeat}")
+    sampler = MemorySampler().start()
+    start_time = time.time()
+    job_ids = []
+    for number in range(repeat):
+        for path in corpus:
+            # Таймкоды не сохраняются: сервис пишет их рядом с аудиофайлом, то есть в папку корпуса
+            job = service.submit(path, {"manager": "loadtest", "language": language, "timestamps": "0",
+                                        "conversation_id": f"loadtest-{concurrency}-{len(job_ids) + 1}"})
+            job_ids.append(job["id"])
+            if arrival_rate:
+                time.sleep(random.expovariate(arrival_rate))
+    service.queue.join()
+    elapsed = time.time() - start_time
+    memory = sampler.stop()
+
+    service.maintenance.stop()
+    service.store.close()
+    if service.csv_handler:
+        service.csv_handler.end_batch()
+
+    with service.lock:
+        # Сверх MAX_FINISHED_JOBS старые задачи сервис уже удалил - они не попадают в метрики
+        jobs = [dict(service.jobs[job_id]) for job_id in job_ids if job_id in service.jobs]
+    turnaround = [job["finished"] - job["created"] for job in jobs]
+    processing = [job["finished"] - job["started"] for job in jobs]
+    audio_seconds = sum((job["usage"] or {}).get("billed_seconds", 0.0) for job in jobs)
+    requests = sum((job["usage"] or {}).get("requests", 0) for job in jobs)
+    failed = [job for job in jobs if job["status"] != "done"]
+
+    report = {
+        "concurrency": concurrency,
+        "files": len(jobs),
+        "failed": len(failed),
+        "csv_rows": sum(1 for job in jobs if job["csv_saved"]),
+        "requests": requests,
+        "elapsed": round(elapsed, 3),
+        "files_per_minute": round(len(jobs) / elapsed * 60, 2) if elapsed else 0.0,
+        "audio_minutes_per_minute": round(audio_seconds / elapsed, 2) if elapsed else 0.0,
+        "turnaround": percentiles(turnaround),
+        "processing": percentiles(processing),
+        "peak_rss_mb": max((sample["rss_mb"] for sample in memory if "rss_mb" in sample), default=None),
+        "peak_python_mb": max((sample["python_mb"] for sample in memory if "python_mb" in sample), default=None),
+        "memory": memory,
+        "errors": sorted({job["error"] for job in failed if job["error"]})[:10]
+    }
+    if mock:
+        report["mock"] = mock.snapshot()
+    return report
+
+
+def print_summary(reports):
+    """Таблица итогов по уровням параллельности"""
+    print()
+    print(f"{'Парал.':>6} {'Файлов':>7} {'Ошибок':>7} {'Файл/мин':>9} {'Аудио x':>8} "
+          f"{'p50, с':>8} {'p95, с':>8} {'p99, с':>8} {'429':>6} {'500':>6} {'RSS, МБ':>8}")
+    for report in reports:
+        mock = report.get("mock", {})
+        rss = report["peak_rss_mb"]
+        # Если ни одна задача не завершилась, перцентилей нет
+        turnaround = " ".join(f"{value:>8.2f}" if value is not None else f"{'-':>8}"
+                              for value in (report["turnaround"][name] for name in ("p50", "p95", "p99")))
+        print(f"{report['concurrency']:>6} {report['files']:>7} {report['failed']:>7} "
+              f"{report['files_per_minute']:>9.1f} {report['audio_minutes_per_minute']:>8.1f} "
+              f"{turnaround} {mock.get('rate_limited', '-'):>6} {mock.get('errors', '-'):>6} "
+              f"{rss if rss is not None else '-':>8}")
+    print()
+    print("Аудио x - минут аудио, обработанных за минуту; p50/p95/p99 - время от постановки в очередь до записи в CSV")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочное тестирование: прогон корпуса записей через транскрибацию и запись в CSV "
+                    "на локальной заглушке Whisper API"
+    )
+    parser.add_argument("corpus", nargs="*", help="Аудиофайлы или папки с записями")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Уровни параллельности через запятую")
+    parser.add_argument("--repeat", type=int, default=1, help="Сколько раз повторить корпус на каждом уровне")
+    parser.add_argument("--arrival-rate", type=float,
+                        help="Средняя частота поступления файлов в секунду (по умолчанию весь корпус сразу)")
+    parser.add_argument("--language", default="ru")
+    parser.add_argument("--output", default=os.path.join("loadtest_results", datetime.now().strftime("%Y%m%d_%H%M%S")),
+                        help="Папка для отчета и CSV файлов прогона")
+    parser.add_argument("--base-url", help="Адрес уже запущенного API вместо встроенной заглушки")
+    parser.add_argument("--mock-only", action="store_true",
+                        help="Только запустить заглушку (для ручной проверки приложения через OPENAI_BASE_URL)")
+    parser.add_argument("--port", type=int, default=0, help="Порт заглушки (0 - любой свободный)")
+    parser.add_argument("--latency", default="lognormal:0.5:0.4", help="Распределение задержки заглушки")
+    parser.add_argument("--seconds-per-mb", type=float, default=0.0, help="Дополнительная задержка на МБ аудио")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля случайных ответов 429")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Одновременных запросов, сверх которых заглушка отвечает 429 (0 - без ограничения)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After в ответах 429, секунд")
+    parser.add_argument("--tracemalloc", action="store_true", help="Замерять память объектов Python (медленнее)")
+    parser.add_argument("--set", action="append", metavar="КЛЮЧ=ЗНАЧЕНИЕ", help="Переопределить настройку приложения")
+    args = parser.parse_args()
+
+    mock = None
+    if not args.base_url:
+        mock = MockWhisperServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                                 rate_limit_rate=args.rate_limit_rate, max_concurrent=args.max_concurrent,
+                                 retry_after=args.retry_after, seconds_per_mb=args.seconds_per_mb).start()
+    if args.mock_only:
+        print(f"[INFO] Для проверки приложения: OPENAI_BASE_URL={mock.base_url}. Остановка - Ctrl+C")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            mock.stop()
+        return 0
+
+    corpus = find_corpus(args.corpus)
+    if not corpus:
+        print("[ERROR] Не найдено ни одной записи для прогона")
+        return 1
+
+    # Служебные файлы прогона не смешиваются с рабочими, повторы не берутся из кеша результатов
+    os.makedirs(args.output, exist_ok=True)
+    os.environ["OPENAI_BASE_URL"] = args.base_url or mock.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+    os.environ["WHISPER_USAGE_PATH"] = os.path.join(args.output, "usage.sqlite")
+    overrides = {"cache.enabled": "false", "transcription.backend": "openai"}
+    try:
+        overrides.update(parse_overrides(args.set))
+        configure(overrides=overrides)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    from transcriber import WhisperTranscriber
+    transcriber = WhisperTranscriber(default_backend="openai")
+
+    reports = []
+    for concurrency in [int(value) for value in args.concurrency.split(",") if value.strip()]:
+        reports.append(run_level(transcriber, corpus, concurrency, args.repeat, args.output,
+                                 language=args.language, arrival_rate=args.arrival_rate, mock=mock))
+
+    report_path = os.path.join(args.output, "report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"corpus": corpus, "repeat": args.repeat, "latency": args.latency, "error_rate": args.error_rate,
+                   "rate_limit_rate": args.rate_limit_rate, "max_concurrent": args.max_concurrent,
+                   "levels": reports}, f, ensure_ascii=False, indent=2)
+
+    print_summary(reports)
+    print(f"[INFO] Отчет с графиками памяти сохранен в {report_path}")
+    if mock:
+        mock.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
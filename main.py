@@ -1,5 +1,8 @@
 import os
+import re
 import sys
+import glob
+import argparse
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
@@ -7,10 +10,30 @@ from tkcalendar import DateEntry
 from datetime import datetime
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from recorder import AudioRecorder
-from transcriber import WhisperTranscriber
+from recorder import AudioRecorder, MultiDeviceRecorder
+from transcriber import WhisperTranscriber, DEFAULT_SPEAKER_LABELS, join_segment_results
 from csv_handler import CSVHandler
+from subtitles import write_segments
+from shutdown import ShutdownCoordinator
+from usage import format_usage
+from storage import RecordingStore, StorageMaintenance, session_of
+from wav_writer import repair_directory
+from wav_reader import WavReader
+from settings import get_settings, add_arguments, configure_from_args
+from profiling import profiled
+from transcript_view import TranscriptView
+
+# Доступные движки распознавания: подпись в интерфейсе -> имя движка в WhisperTranscriber
+BACKEND_OPTIONS = {
+    "OpenAI Whisper API": "openai",
+    "Локально (faster-whisper, CPU)": "local",
+    "Автоматический выбор": "auto"
+}
+
+# Как часто проверять, не изменился ли файл настроек (мс)
+SETTINGS_POLL_INTERVAL = 5000
 
 # Устанавливаем тему для customtkinter
 ctk.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
@@ -34,27 +57,71 @@ class App(ctk.CTk):
         
         # Инициализация компонентов
         self.recorder = AudioRecorder()
+        # Второе устройство для одновременной записи (создается при первом использовании)
+        self.extra_recorder = None
+        self.recording_session = None
         self.transcriber = WhisperTranscriber()
         self.csv_handler = CSVHandler()
+        # Незавершенные задачи сохраняются на диск и продолжаются при следующем запуске
+        self.shutdown_coordinator = ShutdownCoordinator(cancel_event=self.transcriber.cancel_event)
+        # Сохраненные в CSV записи архивируются в фоне и ищутся по ID переговора
+        self.recording_store = RecordingStore("recordings")
+        self.storage_maintenance = StorageMaintenance(self.recording_store).start()
         
         # Переменные для отслеживания состояния
         self.is_recording = False
         self.is_transcribing = False
+        self.is_closing = False
+        self.transcription_thread = None
+        self.current_job_id = None
         self.current_audio_file = None
         self.current_csv_file = None
         self.selected_language = tk.StringVar(value="ru")
+        self.save_timestamps = tk.BooleanVar(value=True)
+        # Раздельная транскрибация говорящих: стерео-каналы или дорожки разных устройств
+        self.separate_speakers = tk.BooleanVar(value=False)
+        # Файлы распознанной записи: все сегменты, части сведенной записи или единственный файл
+        self.transcribed_audio_files = []
+        self.current_segments = []
+        # Расход распознавания текущего результата, сохраняется в строке CSV
+        self.current_usage = None
+        
+        # Сегменты длинной записи транскрибируются по мере закрытия, не дожидаясь ее окончания
+        self.segment_executor = ThreadPoolExecutor(max_workers=1)
+        self.segment_jobs = []
         
         # Создание интерфейса
         self.create_widgets()
         
-        # Запуск мониторинга уровня громкости
+        # Запуск мониторинга уровня громкости: поток устройства остается открытым и сразу переходит к записи
         self.recorder.start_monitoring(self.update_volume_indicator)
         
+        # Соединение с API и кодеки готовятся в фоне, пока пользователь заполняет форму
+        threading.Thread(target=self.transcriber.warm_up, args=(BACKEND_OPTIONS[self.backend_var.get()],),
+                         daemon=True).start()
+        
+        # Записи, оборванные аварийным завершением, исправляются и ставятся в очередь транскрибации
+        self._recover_recordings()
+        
+        # Продолжаем работу, прерванную закрытием приложения
+        self.after(500, self._restore_pending_jobs)
+        
         # Центрируем окно на экране
         self.center_window()
         
         # Открытие окна на полный экран
         self.after(100, self.maximize_window)
+        
+        # Измененный файл настроек применяется без перезапуска
+        self.after(SETTINGS_POLL_INTERVAL, self._check_settings)
+    
+    def _check_settings(self):
+        """Перечитать файл настроек, если он изменился; профиль записи применяется со следующей записи"""
+        if self.is_closing:
+            return
+        if get_settings().reload_if_changed():
+            self.status_var.set("Настройки обновлены")
+        self.after(SETTINGS_POLL_INTERVAL, self._check_settings)
     
     def maximize_window(self):
         """Открыть окно на весь экран"""
@@ -91,6 +158,20 @@ class App(ctk.CTk):
         self.new_file_button = ctk.CTkButton(file_frame, text="Создать новый", command=self.create_new_file)
         self.new_file_button.pack(side=tk.LEFT, padx=5)
         
+        # Поиск по сохраненным резюме
+        search_frame = ctk.CTkFrame(self.main_frame)
+        search_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        ctk.CTkLabel(search_frame, text="Поиск:").pack(side=tk.LEFT, padx=5)
+        
+        self.search_var = tk.StringVar()
+        self.search_entry = ctk.CTkEntry(search_frame, textvariable=self.search_var, width=400)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.search_entry.bind("<Return>", lambda event: self.search_entries())
+        
+        self.search_button = ctk.CTkButton(search_frame, text="Найти", command=self.search_entries)
+        self.search_button.pack(side=tk.LEFT, padx=5)
+        
         # Секция для настройки записи
         settings_frame = ctk.CTkFrame(self.main_frame)
         settings_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -121,6 +202,22 @@ class App(ctk.CTk):
         )
         self.device_combobox.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         
+        # Дополнительное устройство для одновременной записи (второй микрофон, линейный вход)
+        extra_device_frame = ctk.CTkFrame(settings_frame)
+        extra_device_frame.pack(fill=tk.X, pady=5)
+        
+        ctk.CTkLabel(extra_device_frame, text="Доп. устройство:", width=150).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        self.extra_device_var = tk.StringVar(value="Нет")
+        self.extra_device_combobox = ctk.CTkOptionMenu(
+            extra_device_frame,
+            values=["Нет"] + device_names,
+            variable=self.extra_device_var,
+            width=400,
+            dynamic_resizing=False
+        )
+        self.extra_device_combobox.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
+        
         # Выбор языка для транскрибации
         lang_frame = ctk.CTkFrame(settings_frame)
         lang_frame.pack(fill=tk.X, pady=5)
@@ -163,6 +260,43 @@ class App(ctk.CTk):
         )
         self.auto_radio.pack(side=tk.LEFT, padx=10)
         
+        # Сохранение таймкодов сегментов рядом с записью
+        self.timestamps_checkbox = ctk.CTkCheckBox(
+            lang_options_frame,
+            text="Сохранять таймкоды (SRT/JSONL)",
+            variable=self.save_timestamps
+        )
+        self.timestamps_checkbox.pack(side=tk.LEFT, padx=10)
+        
+        # Менеджер и клиент на разных каналах или устройствах
+        self.speakers_checkbox = ctk.CTkCheckBox(
+            lang_options_frame,
+            text="Раздельные дорожки (менеджер/клиент)",
+            variable=self.separate_speakers
+        )
+        self.speakers_checkbox.pack(side=tk.LEFT, padx=10)
+        
+        # Выбор движка распознавания
+        backend_frame = ctk.CTkFrame(settings_frame)
+        backend_frame.pack(fill=tk.X, pady=5)
+        
+        ctk.CTkLabel(backend_frame, text="Движок распознавания:", width=150).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        default_backend_label = next(
+            (label for label, name in BACKEND_OPTIONS.items() if name == self.transcriber.default_backend),
+            list(BACKEND_OPTIONS)[0]
+        )
+        self.backend_var = tk.StringVar(value=default_backend_label)
+        self.backend_menu = ctk.CTkOptionMenu(
+            backend_frame,
+            values=list(BACKEND_OPTIONS),
+            variable=self.backend_var,
+            width=400,
+            dynamic_resizing=False,
+            command=self.on_backend_change
+        )
+        self.backend_menu.pack(side=tk.LEFT, padx=5, pady=5)
+        
         # Секция для ввода данных
         data_frame = ctk.CTkFrame(self.main_frame)
         data_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -233,6 +367,8 @@ class App(ctk.CTk):
         
         self.transcription_text = ctk.CTkTextbox(transcription_frame, height=200, wrap="word")
         self.transcription_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Распознанные части появляются в поле по мере готовности, не дожидаясь конца транскрибации
+        self.transcript_view = TranscriptView(self.transcription_text)
         
         # Кнопки внизу
         button_frame = ctk.CTkFrame(self.main_frame)
@@ -253,6 +389,13 @@ class App(ctk.CTk):
         )
         self.clear_button.pack(side=tk.LEFT, padx=5, pady=5)
         
+        self.export_button = ctk.CTkButton(
+            button_frame, 
+            text="Экспорт в Parquet", 
+            command=self.export_parquet
+        )
+        self.export_button.pack(side=tk.LEFT, padx=5, pady=5)
+        
         # Если есть устройства, выбираем первое по умолчанию
         if self.devices:
             self.on_device_change(self.device_var.get())
@@ -277,6 +420,32 @@ class App(ctk.CTk):
             self.status_var.set(f"Выбрано устройство: {device_name}")
             print(f"[INFO] Выбрано устройство: {device_name} (индекс: {selected_device['index']})")
     
+    def on_backend_change(self, backend_label):
+        """
+        Обработчик изменения движка распознавания
+        
+        Args:
+            backend_label (str): Подпись выбранного движка
+        """
+        backend = BACKEND_OPTIONS[backend_label]
+        print(f"[INFO] Выбран движок распознавания: {backend}")
+        
+        # Локальную модель загружаем заранее в фоне, чтобы первая транскрибация не ждала загрузки
+        if backend == "local":
+            self.status_var.set("Загрузка локальной модели...")
+            threading.Thread(target=self._warm_up_backend, args=(backend,), daemon=True).start()
+    
+    def _warm_up_backend(self, backend):
+        """Загрузка движка распознавания, выполняемая в отдельном потоке"""
+        try:
+            self.transcriber.get_backend(backend).warm_up()
+            self.after(100, lambda: self.status_var.set("Локальная модель загружена"))
+        except Exception as e:
+            print(f"[ERROR] Не удалось загрузить движок {backend}: {e}")
+            # Переменная исключения удаляется после блока except, поэтому сообщение сохраняем заранее
+            message = f"Ошибка загрузки модели: {e}"
+            self.after(100, lambda m=message: self.status_var.set(m))
+    
     def browse_file(self):
         """Открыть диалог выбора CSV файла"""
         file_path = filedialog.askopenfilename(
@@ -306,6 +475,43 @@ class App(ctk.CTk):
             self.status_var.set(f"Создан новый файл: {os.path.basename(file_path)}")
             print(f"[INFO] Создан новый CSV файл: {file_path}")
     
+    def search_entries(self):
+        """Найти записи в текущем CSV файле и показать результаты"""
+        query = self.search_var.get().strip()
+        if not query:
+            return
+        
+        if not self.current_csv_file:
+            messagebox.showerror("Ошибка", "Сначала выберите или создайте CSV файл.")
+            return
+        
+        start_time = time.time()
+        results = self.csv_handler.search(query)
+        elapsed_ms = (time.time() - start_time) * 1000
+        
+        self.status_var.set(f"Найдено записей: {len(results)} за {elapsed_ms:.0f} мс")
+        print(f"[INFO] Поиск \"{query}\": {len(results)} результатов за {elapsed_ms:.0f} мс")
+        self._show_search_results(query, results)
+    
+    def _show_search_results(self, query, results):
+        """Показать результаты поиска в отдельном окне"""
+        window = ctk.CTkToplevel(self)
+        window.title(f"Поиск: {query}")
+        window.geometry("700x500")
+        
+        results_text = ctk.CTkTextbox(window, wrap="word")
+        results_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        if not results:
+            results_text.insert(tk.END, "Ничего не найдено")
+        for result in results:
+            results_text.insert(
+                tk.END,
+                f"Строка {result['row']} | {result['manager']} | {result['date']} | ID: {result['conversation_id']}\n"
+                f"{result['snippet']}\n\n"
+            )
+        results_text.configure(state="disabled")
+    
     def toggle_recording(self):
         """Переключение состояния записи"""
         if not self.current_csv_file:
@@ -334,6 +540,12 @@ class App(ctk.CTk):
             return
             
         self.is_recording = True
+        self.segment_jobs = []
+        # Несохраненный результат прошлой записи будет заменен новым, как и в поле ввода
+        if self.current_job_id:
+            self.shutdown_coordinator.finish_job(self.current_job_id)
+            self.current_job_id = None
+        self.transcript_view.new_session()
         self.record_button_text.set("Остановить")
         self.status_var.set("Идет запись...")
         
@@ -344,10 +556,46 @@ class App(ctk.CTk):
         self.recording_thread.daemon = True
         self.recording_thread.start()
     
+    def _recording_channels(self, use_extra_device):
+        """
+        Количество каналов записи основного устройства
+        
+        Стерео нужно только для раздельных дорожек с одного устройства: при записи
+        с двух устройств каждый говорящий и так пишется в свой файл.
+        """
+        if not self.separate_speakers.get() or use_extra_device:
+            return 1
+        
+        device = next((dev for dev in self.devices if dev['name'] == self.device_var.get()), None)
+        if device and device['channels'] >= 2:
+            return 2
+        
+        print("[WARNING] Устройство записи не поддерживает стерео, запись будет в моно")
+        self.after(100, lambda: self.status_var.set("Устройство не поддерживает стерео, запись в моно"))
+        return 1
+    
     def _recording_thread(self):
         """Функция записи, выполняемая в отдельном потоке"""
-        # Передаем функцию обратного вызова для обновления индикатора громкости
-        self.current_audio_file = self.recorder.start_recording(self.update_volume_indicator)
+        extra_device = next((dev for dev in self.devices if dev['name'] == self.extra_device_var.get()), None)
+        use_extra_device = bool(extra_device and extra_device['name'] != self.device_var.get())
+        
+        channels = self._recording_channels(use_extra_device)
+        if channels != self.recorder.channels:
+            self.recorder.set_channels(channels)
+        
+        if use_extra_device:
+            # Одновременная запись с двух устройств, каждое в своем потоке
+            if self.extra_recorder is None:
+                self.extra_recorder = AudioRecorder()
+            self.extra_recorder.set_device(extra_device['index'])
+            self.recording_session = MultiDeviceRecorder([self.recorder, self.extra_recorder])
+            files = self.recording_session.start_recording(self.update_volume_indicator)
+            self.current_audio_file = files[0]
+        else:
+            # Передаем функцию обратного вызова для обновления индикатора громкости
+            self.current_audio_file = self.recorder.start_recording(
+                self.update_volume_indicator, on_segment_closed=self._on_segment_closed
+            )
         
         # Обновляем UI во время записи (мигающая точка)
         dots = 0
@@ -357,6 +605,79 @@ class App(ctk.CTk):
             self.status_var.set(status_text)
             time.sleep(0.5)
     
+    def _on_segment_closed(self, segment):
+        """
+        Начать транскрибацию закрытого сегмента записи, пока запись продолжается
+        
+        Args:
+            segment (dict): Описание сегмента от AudioRecorder
+        """
+        language = self.selected_language.get()
+        backend = BACKEND_OPTIONS[self.backend_var.get()]
+        manager = self.manager_name_var.get().strip()
+        # Сегменты распознаются по очереди, поэтому предыдущий будет готов к началу этого
+        previous = self.segment_jobs[-1][1] if self.segment_jobs else None
+        print(f"[INFO] Сегмент {segment['index']} ({segment['path']}) передан на транскрибацию")
+        future = self.segment_executor.submit(self._transcribe_recording, segment["path"], language, backend,
+                                              self._stereo_mode(), manager, previous, self.transcript_view.append)
+        self.segment_jobs.append((segment, future))
+    
+    def _stereo_mode(self):
+        """Запись идет в стерео для раздельной транскрибации менеджера и клиента"""
+        return self.separate_speakers.get() and self.recorder.channels == 2
+    
+    def _transcribe_recording(self, audio_file, language, backend, stereo=False, manager=None, previous=None,
+                              on_partial=None):
+        """
+        Транскрибировать один файл записи с учетом режима раздельных дорожек
+        
+        Args:
+            manager (str, optional): Имя менеджера для словаря терминов
+            previous (Future, optional): Транскрибация предыдущего сегмента записи;
+                хвост ее текста передается в подсказке для связности
+            on_partial (callable, optional): Получает текст каждой распознанной части
+        """
+        if stereo:
+            return self.transcriber.transcribe_stereo(audio_file, language, backend=backend, manager=manager)
+        context = None
+        if previous is not None:
+            previous_result = previous.result()
+            if not previous_result["error"]:
+                context = previous_result["text"]
+        return self.transcriber.transcribe_audio_detailed(
+            audio_file, language, with_segments=self.save_timestamps.get(), backend=backend,
+            manager=manager, context=context, on_partial=on_partial
+        )
+    
+    def _join_segment_jobs(self, audio_file, language, backend, stereo=False, manager=None):
+        """
+        Дождаться транскрибации закрытых сегментов, распознать последний и объединить результат
+        
+        Args:
+            audio_file (str): Путь к последнему сегменту записи
+            language (str): Код языка
+            backend (str): Движок распознавания
+            stereo (bool): Запись в стерео с раздельными дорожками
+            manager (str, optional): Имя менеджера для словаря терминов
+            
+        Returns:
+            dict: Объединенный результат {"text", "segments", "error"}
+        """
+        jobs = self.segment_jobs
+        self.segment_jobs = []
+        parts = [(segment["start"], future.result()) for segment, future in jobs]
+        
+        # Последний сегмент уже в работе, если запись разделилась ровно в момент остановки
+        last = self.recorder.segments[-1]
+        if last["path"] == audio_file and all(segment is not last for segment, future in jobs):
+            previous = jobs[-1][1] if jobs else None
+            parts.append((last["start"], self._transcribe_recording(audio_file, language, backend, stereo,
+                                                                    manager, previous, self.transcript_view.append)))
+        
+        print(f"[INFO] Объединение результатов {len(parts)} сегментов записи {last['session_id']}")
+        return join_segment_results(parts)
+    
+    @profiled()
     def stop_recording(self):
         """Остановить запись аудио и начать транскрибацию"""
         if not self.is_recording:
@@ -370,7 +691,18 @@ class App(ctk.CTk):
         self.volume_indicator.set(0)
         
         # Остановка записи и получение пути к файлу
-        audio_file = self.recorder.stop_recording()
+        tracks = None
+        files = None
+        if self.recording_session:
+            # При записи с нескольких устройств транскрибируется сведенная запись
+            result = self.recording_session.stop_recording(mix=True)
+            self.recording_session = None
+            files = result["mix"] if result else None
+            audio_file = files[0][1] if files else None
+            if result and self.separate_speakers.get():
+                tracks = self._speaker_tracks(result)
+        else:
+            audio_file = self.recorder.stop_recording()
         
         if not audio_file:
             self.status_var.set("Ошибка при сохранении аудио")
@@ -389,19 +721,74 @@ class App(ctk.CTk):
         # Обновляем интерфейс перед запуском долгой операции
         self.update_idletasks()
         
+        # Соединение с API, закрытое за время простоя, открывается заново параллельно с подготовкой аудио
+        threading.Thread(target=self.transcriber.warm_up, args=(BACKEND_OPTIONS[self.backend_var.get()], False),
+                         daemon=True).start()
+        
         # Запускаем транскрибацию в отдельном потоке
-        transcription_thread = threading.Thread(target=self._transcribe_thread, args=(audio_file,))
-        transcription_thread.daemon = True
-        transcription_thread.start()
+        self.transcription_thread = threading.Thread(target=self._transcribe_thread,
+                                                     args=(audio_file, tracks, None, files))
+        self.transcription_thread.daemon = True
+        self.transcription_thread.start()
+    
+    def _speaker_tracks(self, result):
+        """
+        Дорожки говорящих по результату записи с нескольких устройств
+        
+        Каждое устройство - отдельный говорящий: менеджер, клиент, ... Сегменты дорожки
+        распознаются по отдельности, их сдвиг складывается из сдвига устройства и начала сегмента.
+        
+        Returns:
+            list: Кортежи (подпись говорящего, путь к сегменту, сдвиг в секундах)
+        """
+        tracks = []
+        for i, (segments, offset) in enumerate(zip(result["files"], result["offsets"])):
+            label = DEFAULT_SPEAKER_LABELS[i] if i < len(DEFAULT_SPEAKER_LABELS) else f"Дорожка {i + 1}"
+            tracks.extend((label, path, offset + start) for start, path in segments)
+        return tracks
+    
+    def _transcription_files(self, audio_file):
+        """Файлы записи со сдвигами начала: все сегменты или единственный файл"""
+        if self.segment_jobs:
+            return [[segment["start"], segment["path"]] for segment in self.recorder.segments]
+        return [[0.0, audio_file]]
     
-    def _transcribe_thread(self, audio_file):
-        """Функция транскрибации, выполняемая в отдельном потоке"""
+    @profiled()
+    def _transcribe_thread(self, audio_file, tracks=None, job=None, files=None):
+        """
+        Функция транскрибации, выполняемая в отдельном потоке
+        
+        Args:
+            audio_file (str): Путь к аудиофайлу
+            tracks (list, optional): Дорожки говорящих (подпись, путь, сдвиг) для раздельной транскрибации
+            job (tuple, optional): Задача (идентификатор, данные), прерванная при прошлом запуске
+            files (list, optional): Части записи [[начало в секундах, путь], ...], например сведенной
+                записи нескольких устройств (по умолчанию - сегменты записи или единственный файл)
+        """
+        job_id = None
         try:
-            # Обновляем статус в UI из отдельного потока
-            self.after(100, lambda: self.status_var.set("Транскрибация через Whisper API..."))
+            if job:
+                job_id, job_data = job
+                backend = job_data["backend"]
+                language = job_data["language"]
+                stereo = job_data["stereo"]
+                files = job_data["files"]
+                manager = job_data.get("manager")
+            else:
+                backend = BACKEND_OPTIONS[self.backend_var.get()]
+                language = self.selected_language.get()
+                stereo = self._stereo_mode()
+                files = files or self._transcription_files(audio_file)
+                manager = self.manager_name_var.get().strip()
+                job_id = self.shutdown_coordinator.add_job(
+                    "transcription", files=files, tracks=tracks, language=language, backend=backend, stereo=stereo,
+                    manager=manager
+                )
+            self.current_job_id = job_id
             
-            # Получаем выбранный язык
-            language = self.selected_language.get()
+            # Обновляем статус в UI из отдельного потока
+            backend_label = next((label for label, name in BACKEND_OPTIONS.items() if name == backend), backend)
+            self.after(100, lambda: self.status_var.set(f"Транскрибация через {backend_label}..."))
             
             # Информация о выбранном языке
             if language:
@@ -428,13 +815,46 @@ class App(ctk.CTk):
             # Получаем транскрипцию с учетом выбранного языка
             start_time = time.time()
             print(f"[DEBUG] Запуск transcribe_audio с файлом {audio_file}")
-            transcription = self.transcriber.transcribe_audio(audio_file, language)
+            # Пути запоминаются явно: после деления записи current_file указывает на уже переименованный файл
+            self.transcribed_audio_files = [path for start, path in files]
+            if tracks:
+                result = self.transcriber.transcribe_speakers(tracks, language, backend=backend, manager=manager)
+            elif self.segment_jobs:
+                result = self._join_segment_jobs(audio_file, language, backend, stereo, manager)
+            elif len(files) > 1:
+                # Части сведенной записи или сегменты записи, прерванной при прошлом запуске;
+                # уже распознанные берутся из кеша
+                result = join_segment_results([
+                    (start, self._transcribe_recording(path, language, backend, stereo, manager,
+                                                       on_partial=self.transcript_view.append))
+                    for start, path in files
+                ])
+            else:
+                result = self._transcribe_recording(audio_file, language, backend, stereo, manager,
+                                                    on_partial=self.transcript_view.append)
+            transcription = result["text"]
+            self.current_segments = result["segments"]
+            self.current_usage = result.get("usage")
             print(f"[DEBUG] Транскрибация завершена")
             
             # Останавливаем индикацию прогресса
             self.is_transcribing = False
             elapsed_time = time.time() - start_time
             
+            if result["error"] and self.shutdown_coordinator.is_shutting_down:
+                # Задача остается в списке и будет продолжена при следующем запуске
+                return
+            if result["error"]:
+                self.shutdown_coordinator.finish_job(job_id)
+            else:
+                # До сохранения в CSV результат хранится вместе с задачей
+                self.shutdown_coordinator.update_job(
+                    job_id, kind="transcript", text=transcription, segments=self.current_segments,
+                    audio_files=self.transcribed_audio_files, usage=self.current_usage
+                )
+            if self.is_closing:
+                return
+            
             # Обновляем UI с результатом транскрибации
             self.after(100, lambda: self._update_ui_with_transcription(transcription, elapsed_time))
             
@@ -444,17 +864,25 @@ class App(ctk.CTk):
             traceback.print_exc()
             self.is_transcribing = False
             
+            if job_id and not self.shutdown_coordinator.is_shutting_down:
+                self.shutdown_coordinator.finish_job(job_id)
+            if self.is_closing:
+                return
+            
             # Обновляем UI с ошибкой
-            self.after(100, lambda: self._update_ui_with_error(str(e)))
+            message = str(e)
+            self.after(100, lambda m=message: self._update_ui_with_error(m))
     
     def _update_ui_with_transcription(self, transcription, elapsed_time):
         """Обновляет UI с результатом транскрибации"""
-        # Обновляем текстовое поле с результатом
-        self.transcription_text.delete("0.0", tk.END)
-        self.transcription_text.insert("0.0", transcription)
+        # Итоговый текст (с удаленными повторами на стыках частей) заменяет показанные части
+        self.transcript_view.set(transcription)
         
-        # Обновляем статус
-        self.status_var.set(f"Транскрибация завершена за {elapsed_time:.1f} секунд!")
+        # Обновляем статус: время и стоимость распознавания
+        status = f"Транскрибация завершена за {elapsed_time:.1f} секунд!"
+        if self.current_usage and self.current_usage["requests"]:
+            status += f" ({format_usage(self.current_usage)})"
+        self.status_var.set(status)
         
         # Активируем кнопки
         self.save_button.configure(state="normal")
@@ -497,6 +925,7 @@ class App(ctk.CTk):
             if not self.is_transcribing:
                 break
     
+    @profiled()
     def save_to_csv(self):
         """Сохранить результаты в CSV файл"""
         manager_name = self.manager_name_var.get().strip()
@@ -517,27 +946,158 @@ class App(ctk.CTk):
             messagebox.showerror("Ошибка", "Нет текста транскрибации")
             return
         
+        # Сохраняем таймкоды рядом с аудиофайлом и ссылаемся на них из строки CSV
+        timestamps_file = ""
+        if self.save_timestamps.get() and self.current_segments and self.transcribed_audio_files:
+            try:
+                # Таймкоды относятся ко всей записи, а не к отдельному сегменту: файл называется по записи
+                first_file = os.path.abspath(self.transcribed_audio_files[0])
+                base_path = os.path.join(os.path.dirname(first_file), session_of(first_file))
+                paths = write_segments(self.current_segments, base_path, formats=("srt", "jsonl"))
+                timestamps_file = paths["srt"]
+            except Exception as e:
+                print(f"[WARNING] Не удалось сохранить таймкоды: {e}")
+        
         # Сохраняем в CSV
-        success = self.csv_handler.add_entry(manager_name, date, conversation_id, summary)
+        success = self.csv_handler.add_entry(manager_name, date, conversation_id, summary, timestamps_file,
+                                             usage=self.current_usage)
         
         if success:
+            if self.transcribed_audio_files:
+                try:
+                    self.recording_store.register(self.transcribed_audio_files, conversation_id, manager_name)
+                except Exception as e:
+                    print(f"[WARNING] Не удалось добавить запись в индекс архива: {e}")
+            if self.current_job_id:
+                self.shutdown_coordinator.finish_job(self.current_job_id)
+                self.current_job_id = None
             messagebox.showinfo("Успех", "Данные успешно сохранены в CSV файл")
             self.status_var.set("Данные сохранены в CSV")
+            self._restore_pending_jobs()
         else:
             messagebox.showerror("Ошибка", "Не удалось сохранить данные в CSV файл")
     
+    def export_parquet(self):
+        """Экспортировать записи текущего CSV файла в набор данных Parquet"""
+        if not self.current_csv_file:
+            messagebox.showerror("Ошибка", "Сначала выберите или создайте CSV файл.")
+            return
+        
+        dataset_dir = filedialog.askdirectory(title="Выберите папку для набора данных Parquet")
+        if not dataset_dir:
+            return
+        
+        try:
+            exported = self.csv_handler.export_parquet(dataset_dir)
+            self.status_var.set(f"Экспортировано в Parquet записей: {exported}")
+        except Exception as e:
+            print(f"[ERROR] Ошибка при экспорте в Parquet: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось экспортировать данные:\n\n{e}")
+    
     def clear_fields(self):
         """Очистить все поля ввода"""
         self.manager_name_var.set("")
         self.date_picker.set_date(datetime.now())
         self.conversation_id_var.set("")
-        self.transcription_text.delete("0.0", tk.END)
+        self.transcript_view.clear()
+        self.current_segments = []
+        self.current_usage = None
+        self.transcribed_audio_files = []
         self.save_button.configure(state="disabled")
         self.volume_indicator.set(0)  # Сбросить индикатор уровня громкости
         self.status_var.set("Поля очищены")
+        
+        # Очищенный результат больше не нужно восстанавливать
+        if self.current_job_id and not self.is_transcribing:
+            self.shutdown_coordinator.finish_job(self.current_job_id)
+            self.current_job_id = None
+            self._restore_pending_jobs()
+    
+    def _recover_recordings(self):
+        """Исправить заголовки оборванных записей и добавить их в задачи на транскрибацию"""
+        try:
+            repaired = repair_directory(self.recorder.output_directory)
+        except Exception as e:
+            print(f"[ERROR] Ошибка при проверке папки записей: {e}")
+            return
+        
+        # Сегменты одной записи транскрибируются вместе, со сдвигами от начала записи
+        sessions = {re.sub(r"_part\d+$", "", os.path.splitext(path)[0]) for path in repaired}
+        for base_path in sorted(sessions):
+            paths = sorted(glob.glob(glob.escape(base_path) + "_part[0-9][0-9][0-9].wav")) or [base_path + ".wav"]
+            files = []
+            start = 0.0
+            try:
+                for path in paths:
+                    with WavReader(path) as reader:
+                        files.append([start, path])
+                        start += reader.duration
+                        stereo = reader.channels == 2
+            except (OSError, ValueError) as e:
+                print(f"[WARNING] Восстановленная запись {base_path} пропущена: {e}")
+                continue
+            
+            print(f"[INFO] Запись {base_path} ({start / 60:.1f} мин) добавлена в очередь транскрибации")
+            self.shutdown_coordinator.add_job(
+                "transcription", files=files, tracks=None, language=self.selected_language.get(),
+                backend=BACKEND_OPTIONS[self.backend_var.get()], stereo=stereo, manager=""
+            )
+        
+        if sessions:
+            self.status_var.set(f"Восстановлено записей после сбоя: {len(sessions)}")
+    
+    def _restore_pending_jobs(self):
+        """Показать несохраненный результат или продолжить транскрибацию, прерванную при прошлом запуске"""
+        if self.current_job_id or self.is_recording or self.is_transcribing or self.is_closing:
+            return
+        
+        jobs = self.shutdown_coordinator.pending_jobs()
+        for job_id, job_data in jobs:
+            if job_data["kind"] == "transcript":
+                self.current_job_id = job_id
+                audio_files = job_data.get("audio_files")
+                if audio_files is None and job_data.get("audio_file"):
+                    # Задачи, сохраненные прежней версией, хранят один путь
+                    audio_files = [job_data["audio_file"]]
+                self.transcribed_audio_files = audio_files or []
+                self.current_segments = job_data["segments"]
+                self.current_usage = job_data.get("usage")
+                self.transcript_view.set(job_data["text"])
+                self.save_button.configure(state="normal")
+                self.status_var.set("Восстановлен несохраненный результат транскрибации")
+                return
+        
+        for job_id, job_data in jobs:
+            missing = [path for start, path in job_data["files"] if not os.path.exists(path)]
+            if missing:
+                print(f"[WARNING] Файлы записи не найдены, задача пропущена: {', '.join(missing)}")
+                self.shutdown_coordinator.finish_job(job_id)
+                continue
+            
+            print(f"[INFO] Продолжение транскрибации записи {job_data['files'][0][1]}")
+            self.current_job_id = job_id
+            self.transcript_view.new_session()
+            self.record_button.configure(state="disabled")
+            self.status_var.set("Продолжение транскрибации записи с прошлого запуска...")
+            self.transcription_thread = threading.Thread(
+                target=self._transcribe_thread,
+                args=(job_data["files"][-1][1], job_data["tracks"], (job_id, job_data))
+            )
+            self.transcription_thread.daemon = True
+            self.transcription_thread.start()
+            return
     
     def on_close(self):
-        """Обработчик закрытия окна"""
+        """
+        Обработчик закрытия окна
+        
+        Запись файла и ожидание начатой транскрибации выполняются в фоновом потоке,
+        окно закрывается после их завершения. Все, что не успело завершиться,
+        сохраняется как задачи и продолжается при следующем запуске.
+        """
+        if self.is_closing:
+            return
+        
         if self.is_recording:
             result = messagebox.askyesno(
                 "Подтверждение", 
@@ -545,9 +1105,9 @@ class App(ctk.CTk):
             )
             if not result:
                 return
-            
-            # Останавливаем запись
-            self.recorder.stop_recording()
+        
+        # С этого момента новые задачи не запускаются
+        self.is_closing = True
         
         # Проверяем наличие несохраненных изменений
         if self.csv_handler.has_unsaved_changes():
@@ -558,6 +1118,64 @@ class App(ctk.CTk):
             if result:
                 self.save_to_csv()
         
+        self.record_button.configure(state="disabled")
+        self.save_button.configure(state="disabled")
+        
+        steps = []
+        if self.is_recording:
+            self.is_recording = False
+            steps.append(("сохранение записи", self._save_recording_on_close))
+        steps.append(("ожидание транскрибации", self._wait_for_transcription))
+        steps.append(("остановка архивирования записей", self._stop_storage_maintenance))
+        
+        self.shutdown_coordinator.shutdown(
+            steps,
+            on_progress=lambda description: self.after(
+                0, lambda: self.status_var.set(f"Завершение работы: {description}...")
+            ),
+            on_done=lambda: self.after(0, self._finish_close)
+        )
+    
+    def _stop_storage_maintenance(self):
+        """Остановить архивирование после текущего файла и закрыть индекс"""
+        self.storage_maintenance.stop(self.shutdown_coordinator.remaining())
+        self.recording_store.close()
+    
+    def _save_recording_on_close(self):
+        """Дописать файл записи и оставить его в задачах на транскрибацию"""
+        # После остановки мониторинг громкости не нужен
+        self.recorder.callback = None
+        tracks = None
+        if self.recording_session:
+            result = self.recording_session.stop_recording(mix=True)
+            self.recording_session = None
+            if not result:
+                return
+            files = result["mix"]
+            if self.separate_speakers.get():
+                tracks = self._speaker_tracks(result)
+        else:
+            if not self.recorder.stop_recording():
+                return
+            files = [[segment["start"], segment["path"]] for segment in self.recorder.segments]
+        
+        self.shutdown_coordinator.add_job(
+            "transcription", files=files, tracks=tracks, language=self.selected_language.get(),
+            backend=BACKEND_OPTIONS[self.backend_var.get()], stereo=self._stereo_mode()
+        )
+    
+    def _wait_for_transcription(self):
+        """Дать завершиться уже отправленным запросам, новые части не отправляются"""
+        # Сегменты, которые еще не начали обрабатываться, останутся в задачах
+        self.segment_executor.shutdown(wait=False, cancel_futures=True)
+        wait([future for segment, future in self.segment_jobs], timeout=self.shutdown_coordinator.remaining())
+        
+        if self.transcription_thread and self.transcription_thread.is_alive():
+            self.transcription_thread.join(self.shutdown_coordinator.remaining())
+    
+    def _finish_close(self):
+        """Закрыть окно после завершения фоновой работы"""
+        self.recorder.stop_monitoring()
         self.destroy()
         sys.exit()
 
@@ -606,7 +1224,8 @@ def check_dependencies():
         from dotenv import load_dotenv
         load_dotenv()
         api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
+        # Для работы только с локальной моделью ключ не нужен
+        if not api_key and get_settings()["transcription.backend"] != "local":
             print("[WARNING] API ключ OpenAI не найден в переменных окружения")
             messagebox.showwarning(
                 "API ключ не найден", 
@@ -658,6 +1277,19 @@ if __name__ == "__main__":
     print("[INFO] Запуск приложения...")
     print(f"[INFO] Текущая директория: {os.getcwd()}")
     
+    # Загружаем и проверяем настройки: файл, переменные окружения (.env) и командная строка
+    parser = argparse.ArgumentParser(description="Система записи резюме переговоров")
+    add_arguments(parser)
+    args = parser.parse_args()
+    from dotenv import load_dotenv
+    load_dotenv()
+    try:
+        configure_from_args(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        messagebox.showerror("Ошибка в настройках", str(e))
+        sys.exit(1)
+    
     # Создаем папку для записей
     os.makedirs("recordings", exist_ok=True)
     
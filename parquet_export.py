@@ -0,0 +1,255 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import shutil
+from datetime import datetime
+
+from csv_tail import CSVTail
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Соответствие колонок CSV и колонок набора данных Parquet
+COLUMN_MAP = {
+    "Имя менеджера": "manager_name",
+    "Дата": "date",
+    "ID": "conversation_id",
+    "Резюме": "summary",
+    "Таймкоды": "timestamps_file"
+}
+
+# Колонки расхода распознавания: колонка Parquet и числовой тип значения.
+# В файлах, созданных до учета расхода, этих колонок нет - значения будут пустыми
+USAGE_COLUMN_MAP = {
+    "Оплачено, сек": ("billed_seconds", float),
+    "Запросов": ("requests", int),
+    "Отправлено, байт": ("bytes_uploaded", int),
+    "Стоимость, $": ("cost_usd", float)
+}
+
+# Версия схемы набора данных: набор, созданный другой версией, экспортируется заново
+EXPORT_VERSION = 2
+
+# Колонки, по которым набор данных разбит на каталоги (month=2024-05/manager=Иванов/...)
+PARTITION_COLUMNS = ["month", "manager"]
+
+# Имя файла состояния внутри каталога набора данных
+STATE_FILE = "_export_state.json"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Для экспорта в Parquet установите пакет pyarrow: pip install pyarrow")
+
+
+def _partition_value(value):
+    """Значение, безопасное для имени каталога"""
+    value = re.sub(r'[\\/:*?"<>|=]', "_", (value or "").strip())
+    return value or "unknown"
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d").date()
+    except (ValueError, AttributeError):
+        return None
+
+
+def _parse_number(value, cast):
+    """Число из ячейки CSV или None для пустой или нечисловой ячейки"""
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return int(number) if cast is int else number
+
+
+class ParquetExporter:
+    """
+    Инкрементальный экспорт CSV с резюме в набор данных Parquet
+
+    Набор данных разбит по месяцам и менеджерам и сжат zstd. Каждый запуск sync()
+    дописывает новые файлы только для строк, добавленных в CSV с прошлого запуска.
+    """
+
+    def __init__(self, csv_path, dataset_dir, compression="zstd"):
+        _require_pyarrow()
+        self.csv_path = csv_path
+        self.dataset_dir = dataset_dir
+        self.compression = compression
+        self.state_path = os.path.join(dataset_dir, STATE_FILE)
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {"offset": 0, "rows": 0, "headers": None}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        # Пишем через временный файл, чтобы сбой не оставил поврежденное состояние
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def _reset_dataset(self):
+        """Удалить ранее экспортированные данные (каталог принадлежит экспортеру)"""
+        for name in os.listdir(self.dataset_dir):
+            path = os.path.join(self.dataset_dir, name)
+            if os.path.isdir(path) and name.split("=")[0] in PARTITION_COLUMNS:
+                shutil.rmtree(path)
+
+    def _read_csv_header(self):
+        with open(self.csv_path, "r", newline="", encoding="utf-8-sig") as csvfile:
+            return next(csv.reader(csvfile), None)
+
+    def sync(self, batch_rows=50000):
+        """
+        Экспортировать строки, добавленные в CSV с прошлой синхронизации
+
+        Args:
+            batch_rows (int): Сколько строк держать в памяти перед записью очередной порции
+
+        Returns:
+            int: Количество экспортированных строк
+        """
+        os.makedirs(self.dataset_dir, exist_ok=True)
+        start_time = time.time()
+        state = self._load_state()
+        file_size = os.path.getsize(self.csv_path)
+
+        if state["offset"] > file_size or (state["offset"] and state["headers"] != self._read_csv_header()):
+            print(f"[INFO] CSV файл {self.csv_path} изменился, набор данных Parquet будет создан заново")
+            state = {"offset": 0, "rows": 0, "headers": None}
+        elif state["offset"] and state.get("version") != EXPORT_VERSION:
+            print(f"[INFO] Набор данных {self.dataset_dir} создан старой версией и будет создан заново")
+            state = {"offset": 0, "rows": 0, "headers": None}
+        if state["offset"] == 0:
+            self._reset_dataset()
+        if state["offset"] == file_size:
+            return 0
+
+        tail = CSVTail(self.csv_path, state["offset"])
+        headers = state["headers"]
+        row_number = state["rows"]
+        batch = []
+        exported = 0
+
+        for row in tail:
+            if headers is None:
+                headers = tail.headers
+            row_number += 1
+            batch.append((row_number, row))
+            if len(batch) >= batch_rows:
+                self._write_batch(batch, headers)
+                exported += len(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch, headers)
+            exported += len(batch)
+
+        self._save_state({
+            "offset": tail.end_offset,
+            "rows": row_number,
+            "headers": headers or tail.headers,
+            "version": EXPORT_VERSION
+        })
+
+        elapsed_time = time.time() - start_time
+        print(f"[INFO] В Parquet экспортировано строк: {exported} за {elapsed_time:.2f} секунд")
+        return exported
+
+    def _write_batch(self, batch, headers):
+        """Записать порцию строк в набор данных"""
+        positions = {column: headers.index(column) for column in list(COLUMN_MAP) + list(USAGE_COLUMN_MAP)
+                     if column in headers}
+        columns = {name: [] for name in COLUMN_MAP.values()}
+        columns.update({name: [] for name, cast in USAGE_COLUMN_MAP.values()})
+        columns.update({"row": [], "summary_length": [], "month": [], "manager": []})
+
+        for row_number, row in batch:
+            values = {}
+            for column, name in COLUMN_MAP.items():
+                position = positions.get(column)
+                values[name] = row[position] if position is not None and position < len(row) else ""
+
+            date = _parse_date(values["date"])
+            columns["row"].append(row_number)
+            columns["manager_name"].append(values["manager_name"])
+            columns["date"].append(date)
+            columns["conversation_id"].append(values["conversation_id"])
+            columns["summary"].append(values["summary"])
+            columns["timestamps_file"].append(values["timestamps_file"])
+            for column, (name, cast) in USAGE_COLUMN_MAP.items():
+                position = positions.get(column)
+                value = row[position] if position is not None and position < len(row) else ""
+                columns[name].append(_parse_number(value, cast))
+            columns["summary_length"].append(len(values["summary"]))
+            columns["month"].append(date.strftime("%Y-%m") if date else "unknown")
+            columns["manager"].append(_partition_value(values["manager_name"]))
+
+        schema = pa.schema([
+            ("row", pa.int64()),
+            ("manager_name", pa.string()),
+            ("date", pa.date32()),
+            ("conversation_id", pa.string()),
+            ("summary", pa.string()),
+            ("timestamps_file", pa.string()),
+            ("billed_seconds", pa.float64()),
+            ("requests", pa.int32()),
+            ("bytes_uploaded", pa.int64()),
+            ("cost_usd", pa.float64()),
+            ("summary_length", pa.int32()),
+            ("month", pa.string()),
+            ("manager", pa.string())
+        ])
+        table = pa.Table.from_pydict(columns, schema=schema)
+
+        # Уникальный префикс файлов, чтобы новые порции не перезаписывали старые
+        basename = f"part-{int(time.time() * 1000)}-{batch[0][0]}-{{i}}.parquet"
+        pq.write_to_dataset(
+            table,
+            root_path=self.dataset_dir,
+            partition_cols=PARTITION_COLUMNS,
+            compression=self.compression,
+            basename_template=basename
+        )
+
+
+def read_dataset(dataset_dir, columns=None, filters=None):
+    """
+    Прочитать набор данных с выбором колонок и фильтрами по разделам
+
+    Колонка summary с полным текстом читается, только если она явно запрошена.
+
+    Пример:
+        read_dataset("export", columns=["manager", "summary_length"], filters=[("month", "=", "2024-05")])
+
+    Args:
+        dataset_dir (str): Каталог набора данных
+        columns (list, optional): Колонки для чтения (по умолчанию - все, кроме summary)
+        filters (list, optional): Фильтры в формате pyarrow.parquet.read_table
+
+    Returns:
+        pandas.DataFrame: Прочитанные данные
+    """
+    _require_pyarrow()
+    if columns is None:
+        columns = ["row", "manager_name", "date", "conversation_id", "timestamps_file", "billed_seconds",
+                   "requests", "bytes_uploaded", "cost_usd", "summary_length", "month", "manager"]
+    table = pq.read_table(dataset_dir, columns=columns, filters=filters, partitioning="hive")
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Использование: python parquet_export.py <файл.csv> <каталог_parquet>")
+        sys.exit(1)
+    ParquetExporter(sys.argv[1], sys.argv[2]).sync()
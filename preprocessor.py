@@ -0,0 +1,432 @@
+import io
+import os
+import math
+import time
+import wave
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pydub import AudioSegment
+
+from wav_reader import WavReader
+
+# Whisper внутри работает с моно-сигналом 16 кГц, поэтому отправлять больше бессмысленно:
+# после понижения частоты 5 минут записи занимают ~9.6 МБ вместо ~26 МБ
+TARGET_SAMPLE_RATE = 16000
+TARGET_CHANNELS = 1
+
+# Лимит размера файла в Whisper API
+API_FILE_LIMIT = 25 * 1024 * 1024
+
+# Части тише этого уровня считаются тишиной и не отправляются в API
+SILENCE_THRESHOLD_DBFS = -55.0
+
+# Вырезание пауз в экономном режиме: уровень считается по окнам PAUSE_WINDOW секунд,
+# окна тише PAUSE_THRESHOLD_DBFS - пауза. У краев речи остается PAUSE_PADDING секунд,
+# чтобы не обрезать тихие начала и окончания слов
+PAUSE_THRESHOLD_DBFS = -45.0
+PAUSE_WINDOW = 0.1
+PAUSE_PADDING = 0.3
+
+# Длина блока при копировании участков записи без пауз, секунд
+COPY_BLOCK_SECONDS = 10
+
+
+def _convert_for_recognition(audio, sample_rate=TARGET_SAMPLE_RATE, channels=TARGET_CHANNELS):
+    """Привести аудио к числу каналов и частоте для распознавания"""
+    if channels and audio.channels != channels:
+        audio = audio.set_channels(channels)
+    if sample_rate and audio.frame_rate > sample_rate:
+        audio = audio.set_frame_rate(sample_rate)
+    return audio
+
+
+def load_audio(audio_path, sample_rate=TARGET_SAMPLE_RATE, channels=TARGET_CHANNELS):
+    """
+    Декодировать аудиофайл и привести его к формату для распознавания
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+        sample_rate (int): Частота дискретизации результата (None - не менять)
+        channels (int): Количество каналов результата (None - не менять)
+
+    Returns:
+        AudioSegment: Декодированное аудио
+    """
+    return _convert_for_recognition(AudioSegment.from_file(audio_path), sample_rate, channels)
+
+
+def open_pcm_wav(audio_path):
+    """
+    Открыть файл через WavReader, если это 16-битный PCM WAV
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+
+    Returns:
+        WavReader: Открытый файл или None, если файл в другом формате
+    """
+    try:
+        reader = WavReader(audio_path)
+    except (ValueError, OSError, struct.error):
+        return None
+    if not reader.is_pcm16:
+        reader.close()
+        return None
+    return reader
+
+
+def get_audio_duration(audio_path):
+    """
+    Определить длительность аудиофайла в секундах
+
+    Для WAV длительность берется из заголовка без декодирования файла.
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+
+    Returns:
+        float: Длительность в секундах
+    """
+    reader = open_pcm_wav(audio_path)
+    if reader is not None:
+        with reader:
+            return reader.duration
+    return len(AudioSegment.from_file(audio_path)) / 1000
+
+
+def split_channels(audio_path, output_paths=None, block_seconds=10):
+    """
+    Разложить многоканальный WAV на моно-файлы по каналам
+
+    Файл читается через mmap блоками, поэтому длинная запись не загружается в память целиком.
+
+    Args:
+        audio_path (str): Путь к 16-битному PCM WAV
+        output_paths (list, optional): Пути для файлов каналов (по умолчанию - <имя>_ch1.wav, <имя>_ch2.wav, ...)
+        block_seconds (float): Длина обрабатываемого за раз блока в секундах
+
+    Returns:
+        list: Пути к моно-файлам по порядку каналов
+    """
+    reader = open_pcm_wav(audio_path)
+    if reader is None:
+        raise ValueError(f"Разделение каналов поддерживается только для 16-битного PCM WAV: {audio_path}")
+
+    with reader:
+        if output_paths is None:
+            base_path = os.path.splitext(audio_path)[0]
+            output_paths = [f"{base_path}_ch{channel + 1}.wav" for channel in range(reader.channels)]
+
+        outputs = []
+        try:
+            for path in output_paths:
+                wf = wave.open(path, "wb")
+                wf.setnchannels(1)
+                wf.setsampwidth(reader.sample_width)
+                wf.setframerate(reader.sample_rate)
+                outputs.append(wf)
+
+            position = 0.0
+            while position < reader.duration:
+                with reader.samples(position, position + block_seconds) as samples:
+                    for channel, wf in enumerate(outputs):
+                        # Срез с шагом выбирает отсчеты одного канала без промежуточных копий
+                        wf.writeframes(samples[channel::reader.channels].tobytes())
+                position += block_seconds
+        finally:
+            for wf in outputs:
+                wf.close()
+
+    return list(output_paths)
+
+
+def iter_audio_chunks(audio_path, max_duration=5 * 60 * 1000, overlap=0, max_bytes=API_FILE_LIMIT,
+                      sample_rate=TARGET_SAMPLE_RATE, silence_threshold=SILENCE_THRESHOLD_DBFS,
+                      export_format="wav", bitrate=None):
+    """
+    Разбить аудиофайл на части, закодированные в памяти (по умолчанию в WAV)
+
+    16-битные PCM WAV файлы (записи программы) читаются через mmap: в памяти одновременно
+    находится только текущая часть, а уровень тишины считается прямо по отображенному файлу.
+    Остальные форматы декодируются целиком через pydub.
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+        max_duration (int): Максимальная длительность части в миллисекундах
+        overlap (int): Перекрытие соседних частей в миллисекундах
+        max_bytes (int): Максимальный размер закодированной части в байтах (None - без ограничения)
+        sample_rate (int): Частота дискретизации частей (None - как в исходном файле)
+        silence_threshold (float): Уровень в dBFS, ниже которого часть считается тишиной (None - не проверять)
+        export_format (str): Формат кодирования частей ("wav", "mp3", "ogg" и т.п.)
+        bitrate (str, optional): Битрейт для сжатых форматов, например "32k"
+
+    Yields:
+        dict: Описание части: index, start и end (мс), name, data (байты файла или None для тишины), silent
+    """
+    if overlap >= max_duration:
+        raise ValueError("Перекрытие чанков должно быть меньше их длительности")
+
+    reader = open_pcm_wav(audio_path)
+    if reader is None:
+        audio = load_audio(audio_path, sample_rate=sample_rate)
+        audio_length = len(audio)
+
+        def get_level(start, end):
+            return audio[start:end].dBFS
+
+        def get_chunk(start, end):
+            return audio[start:end]
+    else:
+        audio_length = int(reader.duration * 1000)
+
+        def get_level(start, end):
+            return reader.dbfs(start / 1000, end / 1000)
+
+        def get_chunk(start, end):
+            # Копируется и преобразуется только текущая часть файла
+            with reader.frames(start / 1000, end / 1000) as view:
+                chunk = AudioSegment(data=bytes(view), sample_width=reader.sample_width,
+                                     frame_rate=reader.sample_rate, channels=reader.channels)
+            return _convert_for_recognition(chunk, sample_rate)
+
+    current_start_time = 0
+    chunk_index = 1
+
+    try:
+        while current_start_time < audio_length:
+            chunk_end_time = min(current_start_time + max_duration, audio_length)
+
+            # Простейший VAD: полностью тихие части не кодируем и не отправляем
+            if silence_threshold is not None and get_level(current_start_time, chunk_end_time) < silence_threshold:
+                data = None
+            else:
+                buffer = io.BytesIO()
+                get_chunk(current_start_time, chunk_end_time).export(buffer, format=export_format, bitrate=bitrate)
+                data = buffer.getvalue()
+
+                if max_bytes and len(data) > max_bytes:
+                    print(f"[INFO] Часть {chunk_index} превышает лимит размера API ({len(data) / (1024 * 1024):.2f} МБ). Уменьшаем длительность...")
+                    max_duration = int(max_duration * 0.9)  # Уменьшение длительности чанка на 10%
+                    if overlap >= max_duration:
+                        overlap = max_duration // 2
+                    continue
+
+            yield {
+                "index": chunk_index,
+                "start": current_start_time,
+                "end": chunk_end_time,
+                "name": f"chunk_{chunk_index}.{export_format}",
+                "data": data,
+                "silent": data is None
+            }
+
+            chunk_index += 1
+            if chunk_end_time >= audio_length:
+                break
+            current_start_time = chunk_end_time - overlap
+    finally:
+        if reader is not None:
+            reader.close()
+
+
+def speech_intervals(levels, min_pause, window=PAUSE_WINDOW, threshold=PAUSE_THRESHOLD_DBFS,
+                     padding=PAUSE_PADDING):
+    """
+    Найти участки записи, которые остаются после вырезания длинных пауз
+
+    Args:
+        levels (list): Уровень в dBFS по окнам длиной window секунд
+        min_pause (float): Вырезаются паузы не короче стольких секунд
+        window (float): Длина окна в секундах
+        threshold (float): Окна тише этого уровня считаются паузой
+        padding (float): Сколько секунд паузы оставить у краев речи
+
+    Returns:
+        list: Пары (начало, конец) в секундах по порядку
+    """
+    duration = len(levels) * window
+    intervals = []
+    keep_start = 0.0
+    pause_start = None
+    # None в конце закрывает паузу, которой заканчивается запись
+    for number, level in enumerate(list(levels) + [None]):
+        if level is not None and level < threshold:
+            if pause_start is None:
+                pause_start = number * window
+            continue
+        if pause_start is None:
+            continue
+
+        pause_end = number * window
+        if pause_end - pause_start >= min_pause:
+            # Паузы в начале и в конце записи вырезаются целиком
+            cut_start = pause_start + padding if pause_start > 0 else 0.0
+            cut_end = pause_end - padding if level is not None else pause_end
+            if cut_start > keep_start:
+                intervals.append((keep_start, cut_start))
+            keep_start = cut_end
+        pause_start = None
+
+    if keep_start < duration:
+        intervals.append((keep_start, duration))
+    return intervals
+
+
+def remove_pauses(audio_path, output_path, min_pause, **kwargs):
+    """
+    Записать копию записи без длинных пауз
+
+    Whisper API тарифицирует длительность аудио, поэтому паузы между репликами
+    оплачиваются так же, как речь. 16-битные PCM WAV копируются блоками через mmap
+    без изменения формата, остальные форматы декодируются через pydub.
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+        output_path (str): Путь к WAV файлу без пауз
+        min_pause (float): Вырезаются паузы не короче стольких секунд
+        **kwargs: Параметры speech_intervals (window, threshold, padding)
+
+    Returns:
+        list: Карта времени [(начало в копии, начало в записи, длительность), ...] в секундах
+            или None, если вырезать нечего (или запись целиком тихая) и копия не создавалась
+    """
+    window = kwargs.get("window", PAUSE_WINDOW)
+    reader = open_pcm_wav(audio_path)
+    if reader is None:
+        audio = load_audio(audio_path)
+        duration = len(audio) / 1000.0
+        step = int(window * 1000)
+        levels = [audio[position:position + step].dBFS for position in range(0, len(audio), step)]
+    else:
+        duration = reader.duration
+        levels = [20 * math.log10(rms / 32768.0) if rms else -float("inf")
+                  for rms in reader.rms_profile(window)]
+
+    try:
+        intervals = [(start, min(end, duration)) for start, end in speech_intervals(levels, min_pause, **kwargs)]
+        if not intervals or intervals == [(0.0, duration)]:
+            return None
+
+        time_map = []
+        position = 0.0
+        if reader is None:
+            trimmed = sum((audio[int(start * 1000):int(end * 1000)] for start, end in intervals[1:]),
+                          audio[int(intervals[0][0] * 1000):int(intervals[0][1] * 1000)])
+            trimmed.export(output_path, format="wav")
+        else:
+            with wave.open(output_path, "wb") as wf:
+                wf.setnchannels(reader.channels)
+                wf.setsampwidth(reader.sample_width)
+                wf.setframerate(reader.sample_rate)
+                for start, end in intervals:
+                    block_start = start
+                    while block_start < end:
+                        block_end = min(block_start + COPY_BLOCK_SECONDS, end)
+                        with reader.frames(block_start, block_end) as view:
+                            wf.writeframes(view)
+                        block_start = block_end
+
+        for start, end in intervals:
+            time_map.append((position, start, end - start))
+            position += end - start
+    finally:
+        if reader is not None:
+            reader.close()
+
+    print(f"[INFO] Вырезаны паузы: {duration:.1f} с -> {position:.1f} с ({len(intervals)} участков речи)")
+    return time_map
+
+
+def restore_time(time_map, moment):
+    """
+    Перевести время в копии без пауз во время исходной записи
+
+    Args:
+        time_map (list): Карта времени remove_pauses
+        moment (float): Время в копии, секунд
+
+    Returns:
+        float: Время в исходной записи, секунд
+    """
+    for trimmed_start, original_start, length in reversed(time_map):
+        if moment >= trimmed_start:
+            return original_start + moment - trimmed_start
+    return moment
+
+
+def warm_up_codecs(formats=("wav",), bitrate=None):
+    """
+    Закодировать короткий фрагмент тишины в каждом формате
+
+    Первое кодирование загружает модули преобразования и, для сжатых форматов,
+    исполняемый файл ffmpeg с кодеками; после прогрева первая часть записи
+    кодируется так же быстро, как последующие.
+
+    Args:
+        formats (tuple): Форматы кодирования частей ("wav", "mp3" и т.п.)
+        bitrate (str, optional): Битрейт для сжатых форматов
+    """
+    audio = _convert_for_recognition(AudioSegment.silent(duration=200, frame_rate=44100).set_channels(2))
+    for export_format in formats:
+        audio.export(io.BytesIO(), format=export_format, bitrate=bitrate if export_format != "wav" else None)
+
+
+def prepare_chunks(audio_path, **kwargs):
+    """
+    Подготовить все части файла сразу (функция для запуска в дочернем процессе)
+
+    Args:
+        audio_path (str): Путь к аудиофайлу
+        **kwargs: Параметры iter_audio_chunks
+
+    Returns:
+        list: Список частей в формате iter_audio_chunks
+    """
+    start_time = time.time()
+    chunks = list(iter_audio_chunks(audio_path, **kwargs))
+    elapsed_time = time.time() - start_time
+    print(f"[INFO] [pid {os.getpid()}] Подготовлено {len(chunks)} частей файла {audio_path} за {elapsed_time:.2f} секунд")
+    return chunks
+
+
+class AudioPreprocessor:
+    """Пул процессов для параллельного декодирования и кодирования аудио"""
+
+    def __init__(self, max_workers=None):
+        # По умолчанию используем все ядра процессора
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+
+    def _get_executor(self):
+        """Создать пул процессов при первом обращении"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            print(f"[INFO] Запущен пул предобработки аудио: {self.max_workers} процессов")
+        return self.executor
+
+    def submit(self, audio_path, **kwargs):
+        """
+        Поставить файл в очередь на подготовку частей
+
+        Args:
+            audio_path (str): Путь к аудиофайлу
+            **kwargs: Параметры iter_audio_chunks
+
+        Returns:
+            Future: Будущий результат prepare_chunks
+        """
+        return self._get_executor().submit(prepare_chunks, audio_path, **kwargs)
+
+    def shutdown(self, wait=True):
+        """Остановить пул процессов"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+
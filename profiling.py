@@ -0,0 +1,247 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+import functools
+import threading
+import tracemalloc
+from datetime import datetime
+
+from settings import get_settings
+
+# Сколько кадров стека сохраняет tracemalloc для каждого выделения памяти
+TRACEMALLOC_FRAMES = 10
+
+
+class Profiler:
+    """
+    Профилирование этапов записи, транскрибации и сохранения
+
+    Каждый замер (вызов обернутой функции) сохраняется в папку сеанса
+    profiles/<время запуска>_<pid>/: файл .prof для pstats/snakeviz и текстовая
+    сводка .txt с самыми долгими функциями и крупнейшими выделениями памяти.
+    Общий журнал замеров сеанса - summary.txt.
+
+    cProfile в один момент времени может работать только один: замеры, начатые
+    во время другого (вложенный вызов или параллельный поток), записывают только
+    время и память.
+    """
+
+    def __init__(self, directory=None, top=None, memory=None):
+        """
+        Args:
+            directory (str, optional): Папка для профилей (по умолчанию - настройка profiling.dir)
+            top (int, optional): Сколько строк выводить в сводках (по умолчанию - настройка profiling.top)
+            memory (bool, optional): Замерять выделения памяти через tracemalloc
+                (по умолчанию - настройка profiling.memory)
+        """
+        base_dir = directory or get_settings()["profiling.dir"]
+        self.top_override = top
+        self.memory_override = memory
+        self.session_dir = os.path.join(base_dir, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.cprofile_busy = False
+        self.tracemalloc_users = 0
+        self.tracemalloc_started = False
+        os.makedirs(self.session_dir, exist_ok=True)
+        print(f"[INFO] Профилирование включено, профили сохраняются в {self.session_dir}")
+
+    @property
+    def top(self):
+        return self.top_override or get_settings()["profiling.top"]
+
+    @property
+    def memory(self):
+        if self.memory_override is not None:
+            return self.memory_override
+        return get_settings()["profiling.memory"]
+
+    def _start_tracemalloc(self):
+        with self.lock:
+            self.tracemalloc_users += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self.tracemalloc_started = True
+            elif self.tracemalloc_users == 1:
+                tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+    def _stop_tracemalloc(self, start_snapshot):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            self.tracemalloc_users -= 1
+            # Трассировку, запущенную не профилировщиком, не останавливаем
+            if self.tracemalloc_users == 0 and self.tracemalloc_started:
+                tracemalloc.stop()
+                self.tracemalloc_started = False
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = snapshot.filter_traces(filters).compare_to(start_snapshot.filter_traces(filters), "lineno")
+        return peak, diff[:self.top]
+
+    def run(self, name, func, *args, **kwargs):
+        """
+        Выполнить функцию с замером и сохранить профиль
+
+        Args:
+            name (str): Название этапа (попадает в имя файла)
+            func (callable): Функция
+        """
+        with self.lock:
+            self.counter += 1
+            number = self.counter
+            use_cprofile = not self.cprofile_busy
+            self.cprofile_busy = True
+
+        profile = None
+        if use_cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Уже работает другой профилировщик (например, отладчик)
+                profile = None
+        start_snapshot = self._start_tracemalloc() if self.memory else None
+        start_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        error = None
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            wall = time.perf_counter() - start_time
+            cpu = time.thread_time() - start_cpu
+            if profile is not None:
+                profile.disable()
+            if use_cprofile:
+                with self.lock:
+                    self.cprofile_busy = False
+            memory = self._stop_tracemalloc(start_snapshot) if start_snapshot is not None else None
+            try:
+                self._save(number, name, wall, cpu, profile, memory, error)
+            except OSError as e:
+                print(f"[WARNING] Не удалось сохранить профиль {name}: {e}")
+
+    def _save(self, number, name, wall, cpu, profile, memory, error):
+        """Записать профиль, сводку замера и строку общего журнала"""
+        base_path = os.path.join(self.session_dir, f"{number:04d}_{name}")
+        headline = f"{name}: {wall:.3f} с, CPU потока {cpu:.3f} с"
+        if memory is not None:
+            headline += f", пик памяти {memory[0] / (1024 * 1024):.1f} МБ"
+        if error is not None:
+            headline += f", ошибка: {error!r}"
+
+        lines = [f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {headline}", ""]
+        if profile is not None:
+            profile.dump_stats(base_path + ".prof")
+            lines.append(f"Функции с наибольшим общим временем (top {self.top}):")
+            lines.append(format_stats(base_path + ".prof", self.top))
+        else:
+            lines.append("cProfile не запускался: в это время выполнялся другой замер")
+            lines.append("")
+        if memory is not None:
+            lines.append(f"Крупнейшие выделения памяти за время замера (top {self.top}):")
+            lines.extend(str(stat) for stat in memory[1])
+
+        with open(base_path + ".txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        with self.lock:
+            with open(os.path.join(self.session_dir, "summary.txt"), "a", encoding="utf-8") as f:
+                f.write(f"{lines[0]} [{os.path.basename(base_path)}]\n")
+        print(f"[INFO] Профиль {headline}")
+
+
+def format_stats(path, top=20, sort="cumulative"):
+    """
+    Текстовая сводка сохраненного профиля cProfile
+
+    Args:
+        path (str): Файл .prof
+        top (int): Сколько функций выводить
+        sort (str): Ключ сортировки pstats (cumulative, tottime, calls)
+
+    Returns:
+        str: Таблица функций
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+    return stream.getvalue()
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    """
+    Профилировщик, если профилирование включено настройкой profiling.enabled
+
+    Настройка проверяется при каждом вызове, поэтому профилирование можно
+    включить и выключить правкой файла настроек без перезапуска.
+
+    Returns:
+        Profiler: Профилировщик сеанса или None
+    """
+    global _profiler
+    if not get_settings()["profiling.enabled"]:
+        return None
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = Profiler()
+        return _profiler
+
+
+def profiled(name=None):
+    """
+    Декоратор: замерять вызовы функции, когда профилирование включено
+
+    Args:
+        name (str, optional): Название этапа (по умолчанию - имя функции)
+    """
+    def decorator(func):
+        stage = name or func.__qualname__.replace(".", "_")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = get_profiler()
+            if profiler is None:
+                return func(*args, **kwargs)
+            return profiler.run(stage, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сводка сохраненного профиля")
+    parser.add_argument("path", help="Файл .prof или папка сеанса профилирования")
+    parser.add_argument("--top", type=int, default=20, help="Сколько функций выводить")
+    parser.add_argument("--sort", default="cumulative", help="Сортировка: cumulative, tottime, calls")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        paths = sorted(os.path.join(args.path, name) for name in os.listdir(args.path) if name.endswith(".prof"))
+        if not paths:
+            print(f"[ERROR] В папке {args.path} нет профилей")
+            sys.exit(1)
+        # Профили сеанса суммируются: видно, на что уходит время в целом
+        stream = io.StringIO()
+        stats = pstats.Stats(*paths, stream=stream)
+        stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+        print(f"Профилей: {len(paths)}")
+        print(stream.getvalue())
+    elif os.path.isfile(args.path):
+        print(format_stats(args.path, args.top, args.sort))
+    else:
+        print(f"[ERROR] Не найден {args.path}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,55 @@
 import os
 import wave
+import queue
 import pyaudio
+import audioop
 import threading
 import time
 import array
 import math
 from datetime import datetime
 
+from wav_writer import WavStreamWriter
+from wav_reader import WavReader
+from settings import get_settings
+
+# Сведение дорожек нескольких устройств идет блоками по столько фреймов
+MIX_BLOCK_FRAMES = 64 * 1024
+# Сведенный файл - моно 16 бит
+MIX_SAMPLE_WIDTH = 2
+
 class AudioRecorder:
     def __init__(self, output_directory="recordings"):
         self.output_directory = output_directory
         self.is_recording = False
         self.is_monitoring = False
         self.audio = pyaudio.PyAudio()
-        self.frames = []
         self.stream = None
         self.monitor_stream = None
+        # Параметры открытых потоков: поток с теми же параметрами передается между мониторингом и записью
+        self.stream_params = None
+        self.monitor_params = None
         self.thread = None
         self.monitor_thread = None
         self.current_file = None
         self.callback = None
         self.current_volume = 0
         self.device_index = None
+        # Момент захвата первого отсчета текущей записи (time.monotonic), нужен для выравнивания устройств
+        self.first_frame_time = None
+        
+        self.rollover = True
+        self.on_segment_closed = None
+        self.session_id = None
+        self.segments = []
+        self.segment_bytes = 0
+        
+        # Фреймы пишутся на диск сразу в отдельном потоке: при аварийном завершении
+        # теряются только секунды после последнего обновления заголовка
+        self.writer = None
+        self.disk_queue = None
+        self.disk_thread = None
+        self.disk_error = None
         
         # Создаем директорию для записей, если она не существует
         if not os.path.exists(output_directory):
@@ -30,8 +58,23 @@ class AudioRecorder:
         # Параметры записи аудио
         self.format = pyaudio.paInt16
         self.channels = 1
-        self.rate = 44100
-        self.chunk = 1024
+        self.apply_settings()
+    
+    def apply_settings(self):
+        """
+        Применить профиль записи из настроек
+        
+        Вызывается при создании и перед каждой записью, поэтому измененные настройки
+        действуют с начала следующей записи.
+        """
+        settings = get_settings()
+        self.rate = settings["recording.rate"]
+        self.chunk = settings["recording.chunk"]
+        # Разбиение длинной записи на файлы-сегменты: новый файл каждые N минут или M МБ.
+        # По умолчанию сегмент меньше лимита Whisper API (25 МБ), поэтому его не нужно делить на части
+        self.max_segment_seconds = settings["recording.segment_minutes"] * 60
+        self.max_segment_bytes = int(settings["recording.segment_mb"] * 1024 * 1024)
+        self.checkpoint_seconds = settings["recording.checkpoint_seconds"]
     
     def get_available_devices(self):
         """
@@ -113,12 +156,46 @@ class AudioRecorder:
             self.stop_monitoring()
             self.start_monitoring(self.callback)
     
-    def start_monitoring(self, volume_callback=None):
+    def set_channels(self, channels):
+        """
+        Установить количество каналов записи
+        
+        Args:
+            channels (int): 1 - моно, 2 - стерео (например, менеджер и клиент на разных каналах)
+        """
+        if self.is_recording:
+            raise RuntimeError("Нельзя менять количество каналов во время записи")
+        self.channels = channels
+        print(f"[INFO] Установлено количество каналов записи: {channels}")
+        
+        # Если мониторинг активен, перезапускаем его с новыми параметрами
+        if self.is_monitoring:
+            self.stop_monitoring()
+            self.start_monitoring(self.callback)
+    
+    def _input_params(self):
+        """Параметры открытия входного потока для текущего устройства и профиля записи"""
+        input_params = {
+            'format': self.format,
+            'channels': self.channels,
+            'rate': self.rate,
+            'input': True,
+            'frames_per_buffer': self.chunk
+        }
+        
+        # Добавляем индекс устройства, только если он не None
+        if self.device_index is not None:
+            input_params['input_device_index'] = self.device_index
+        return input_params
+    
+    def start_monitoring(self, volume_callback=None, stream=None):
         """
         Начать мониторинг уровня громкости
         
         Args:
             volume_callback (callable): Функция обратного вызова для отображения уровня громкости
+            stream (pyaudio.Stream, optional): Уже открытый поток с текущими параметрами
+                (переданный после записи), чтобы не открывать устройство заново
         """
         if self.is_monitoring:
             return
@@ -127,16 +204,24 @@ class AudioRecorder:
         self.callback = volume_callback
         
         # Запускаем мониторинг в отдельном потоке
-        self.monitor_thread = threading.Thread(target=self._monitor_thread)
+        self.monitor_thread = threading.Thread(target=self._monitor_thread, args=(stream,))
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
         
         print("[INFO] Мониторинг уровня громкости начат")
     
-    def stop_monitoring(self):
-        """Остановить мониторинг уровня громкости"""
+    def stop_monitoring(self, keep_stream=False):
+        """
+        Остановить мониторинг уровня громкости
+        
+        Args:
+            keep_stream (bool): Не закрывать поток устройства, а вернуть его для записи
+            
+        Returns:
+            pyaudio.Stream: Открытый поток мониторинга, если keep_stream и поток можно передать, иначе None
+        """
         if not self.is_monitoring:
-            return
+            return None
             
         self.is_monitoring = False
         
@@ -144,35 +229,29 @@ class AudioRecorder:
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=2.0)
         
-        # Закрываем поток мониторинга
+        # Закрываем поток мониторинга или передаем его записи, если поток мониторинга завершился
+        stream = None
         if self.monitor_stream:
-            try:
-                self.monitor_stream.stop_stream()
-                self.monitor_stream.close()
-            except Exception as e:
-                print(f"[WARNING] Ошибка при закрытии потока мониторинга: {e}")
+            if keep_stream and not self.monitor_thread.is_alive():
+                stream = self.monitor_stream
+            else:
+                try:
+                    self.monitor_stream.stop_stream()
+                    self.monitor_stream.close()
+                except Exception as e:
+                    print(f"[WARNING] Ошибка при закрытии потока мониторинга: {e}")
             self.monitor_stream = None
         
         print("[INFO] Мониторинг уровня громкости остановлен")
+        return stream
     
-    def _monitor_thread(self):
+    def _monitor_thread(self, stream=None):
         """Функция мониторинга, выполняемая в отдельном потоке"""
         try:
-            # Открываем поток для мониторинга
-            input_params = {
-                'format': self.format,
-                'channels': self.channels,
-                'rate': self.rate,
-                'input': True,
-                'frames_per_buffer': self.chunk
-            }
-            
-            # Добавляем индекс устройства, только если он не None
-            if self.device_index is not None:
-                input_params['input_device_index'] = self.device_index
-            
-            # Открываем поток с нужными параметрами
-            self.monitor_stream = self.audio.open(**input_params)
+            # Открываем поток для мониторинга с нужными параметрами (или продолжаем поток записи)
+            input_params = self._input_params()
+            self.monitor_stream = stream or self.audio.open(**input_params)
+            self.monitor_params = input_params
             
             # Цикл мониторинга
             while self.is_monitoring:
@@ -197,46 +276,63 @@ class AudioRecorder:
             import traceback
             traceback.print_exc()
     
-    def start_recording(self, volume_callback=None):
+    def start_recording(self, volume_callback=None, file_path=None, on_segment_closed=None, rollover=True):
         """
         Начать запись аудио
         
         Args:
             volume_callback (callable): Функция обратного вызова для отображения уровня громкости
+            file_path (str, optional): Путь к файлу записи (по умолчанию - по текущему времени)
+            on_segment_closed (callable, optional): Вызывается из фонового потока с описанием сегмента
+                (см. _close_segment), когда очередной файл-сегмент записан, а запись продолжается
+            rollover (bool): Начинать новый файл при превышении длительности или размера сегмента
         """
         if self.is_recording:
             return
         
-        self.is_recording = True
-        self.frames = []
+        self.apply_settings()
+        self.first_frame_time = None
+        self.rollover = rollover
+        self.on_segment_closed = on_segment_closed
+        self.segments = []
+        self.segment_bytes = 0
+        self.disk_error = None
+        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Сохраняем callback, если он передан
         if volume_callback:
             self.callback = volume_callback
         
         # Формируем имя файла на основе текущего времени
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.current_file = os.path.join(self.output_directory, f"recording_{timestamp}.wav")
+        if file_path:
+            self.current_file = file_path
+        else:
+            self.current_file = os.path.join(self.output_directory, f"recording_{self.session_id}.wav")
         
-        # Если мониторинг активен, останавливаем его
+        # Если мониторинг активен, останавливаем его. Поток мониторинга с теми же параметрами
+        # уже захватывает звук и переходит к записи: открытие устройства не задерживает начало записи
+        input_params = self._input_params()
+        stream = None
         if self.is_monitoring:
-            self.stop_monitoring()
-        
-        # Подготавливаем параметры для потока аудио
-        input_params = {
-            'format': self.format,
-            'channels': self.channels,
-            'rate': self.rate,
-            'input': True,
-            'frames_per_buffer': self.chunk
-        }
+            stream = self.stop_monitoring(keep_stream=self.monitor_params == input_params)
         
-        # Добавляем индекс устройства, только если он не None
-        if self.device_index is not None:
-            input_params['input_device_index'] = self.device_index
+        # Файл первого сегмента создается до открытия устройства, чтобы ошибка диска была видна сразу
+        self.writer = WavStreamWriter(self.current_file, self.channels,
+                                      self.audio.get_sample_size(self.format), self.rate, self.checkpoint_seconds)
+        self.disk_queue = queue.Queue()
+        self.disk_thread = threading.Thread(target=self._disk_writer)
+        self.disk_thread.start()
         
         # Открываем поток аудио для записи
-        self.stream = self.audio.open(**input_params)
+        self.is_recording = True
+        try:
+            self.stream = stream or self.audio.open(**input_params)
+            self.stream_params = input_params
+        except Exception:
+            self.is_recording = False
+            self.disk_queue.put(None)
+            self.disk_thread.join()
+            raise
         
         # Запускаем запись в отдельном потоке
         self.thread = threading.Thread(target=self._record)
@@ -250,7 +346,15 @@ class AudioRecorder:
         while self.is_recording:
             try:
                 data = self.stream.read(self.chunk, exception_on_overflow=False)
-                self.frames.append(data)
+                if self.first_frame_time is None:
+                    # Первый отсчет буфера захвачен на длительность буфера и задержку входа раньше
+                    self.first_frame_time = (time.monotonic() - self.chunk / float(self.rate)
+                                             - self.stream.get_input_latency())
+                self.disk_queue.put(data)
+                self.segment_bytes += len(data)
+                
+                if self.rollover and self._segment_full():
+                    self._close_segment(final=False)
                 
                 # Рассчитываем текущую громкость для визуализации
                 if self.callback:
@@ -260,6 +364,100 @@ class AudioRecorder:
             except Exception as e:
                 print(f"[WARNING] Ошибка при записи: {e}")
     
+    @property
+    def bytes_per_second(self):
+        """Объем несжатого аудио в секунду при текущих параметрах записи"""
+        return self.rate * self.channels * self.audio.get_sample_size(self.format)
+    
+    def _segment_full(self):
+        """Текущий сегмент достиг ограничения по размеру или длительности"""
+        if self.max_segment_bytes and self.segment_bytes >= self.max_segment_bytes:
+            return True
+        return bool(self.max_segment_seconds) and self.segment_bytes / self.bytes_per_second >= self.max_segment_seconds
+    
+    def _segment_path(self, index):
+        """Путь к файлу сегмента с номером index (с 1)"""
+        base_path, extension = os.path.splitext(self.current_file)
+        return f"{base_path}_part{index:03d}{extension}"
+    
+    def _close_segment(self, final):
+        """
+        Закрыть текущий сегмент и начать следующий
+        
+        Сам файл закрывается в потоке записи на диск, когда в него будут записаны
+        все фреймы сегмента, поэтому чтение из устройства не прерывается.
+        
+        Args:
+            final (bool): Сегмент закрывается из-за остановки записи
+            
+        Returns:
+            dict: {"session_id", "index", "path", "start", "duration"} - время в секундах
+                от начала записи
+        """
+        size = self.segment_bytes
+        self.segment_bytes = 0
+        
+        index = len(self.segments) + 1
+        # Если запись ни разу не делилась, сохраняем ее под обычным именем
+        path = self.current_file if final and index == 1 else self._segment_path(index)
+        start = sum(segment["duration"] for segment in self.segments)
+        segment = {
+            "session_id": self.session_id,
+            "index": index,
+            "path": path,
+            "start": start,
+            "duration": size / float(self.bytes_per_second)
+        }
+        self.segments.append(segment)
+        self.disk_queue.put((segment, final))
+        
+        if not final:
+            print(f"[INFO] Сегмент {index} записи {self.session_id} закрыт ({size / (1024 * 1024):.1f} МБ)")
+        return segment
+    
+    def _disk_writer(self):
+        """Поток записи на диск: фреймы дописываются в файл текущего сегмента по мере поступления"""
+        while True:
+            item = self.disk_queue.get()
+            if item is None:
+                break
+            try:
+                if isinstance(item, tuple):
+                    self._finish_segment_file(*item)
+                elif self.writer is not None:
+                    self.writer.write(item)
+            except Exception as e:
+                # Сообщаем об ошибке один раз, а не на каждый буфер
+                if self.disk_error is None:
+                    print(f"[ERROR] Ошибка записи аудио на диск: {e}")
+                self.disk_error = e
+        
+        # Файл следующего сегмента открывается заранее; если запись остановилась до первых фреймов, он не нужен
+        if self.writer is not None:
+            self.writer.close()
+            if not self.writer.data_size:
+                os.remove(self.writer.path)
+            self.writer = None
+    
+    def _finish_segment_file(self, segment, final):
+        """Закрыть файл сегмента, открыть следующий и сообщить о закрытом сегменте"""
+        writer = self.writer
+        self.writer = None
+        writer.close()
+        # Первый сегмент пишется под именем записи и переименовывается, если запись разделилась
+        if writer.path != segment["path"]:
+            os.replace(writer.path, segment["path"])
+        if final:
+            return
+        
+        self.writer = WavStreamWriter(self._segment_path(segment["index"] + 1), self.channels,
+                                      self.audio.get_sample_size(self.format), self.rate, self.checkpoint_seconds)
+        if self.on_segment_closed:
+            try:
+                self.on_segment_closed(segment)
+            except Exception as e:
+                print(f"[WARNING] Ошибка в обработчике сегмента: {e}")
+    
     def _calculate_volume(self, data):
         """
         Рассчитать текущую громкость аудио
@@ -293,7 +491,13 @@ class AudioRecorder:
         return self.current_volume
     
     def stop_recording(self):
-        """Остановить запись и сохранить файл"""
+        """
+        Остановить запись и сохранить файл
+        
+        Returns:
+            str: Путь к последнему сегменту записи (если запись не делилась - к единственному файлу)
+                или None. Все сегменты доступны в self.segments
+        """
         if not self.is_recording:
             return None
         
@@ -306,45 +510,46 @@ class AudioRecorder:
             self.thread.join(timeout=2.0)  # Добавляем таймаут
             print(f"[DEBUG] Поток записи завершен")
         
-        # Закрываем поток
+        # Закрываем поток. Если после записи возобновится мониторинг с теми же параметрами,
+        # поток остается открытым и передается ему
+        monitor_stream = None
         if self.stream:
-            print(f"[DEBUG] Закрытие аудио-потока...")
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
-            except Exception as e:
-                print(f"[WARNING] Ошибка при закрытии аудио-потока: {e}")
+            if self.callback and not self.thread.is_alive() and self.stream_params == self._input_params():
+                monitor_stream = self.stream
+            else:
+                print(f"[DEBUG] Закрытие аудио-потока...")
+                try:
+                    self.stream.stop_stream()
+                    self.stream.close()
+                except Exception as e:
+                    print(f"[WARNING] Ошибка при закрытии аудио-потока: {e}")
             self.stream = None
         
-        # Сохраняем аудио в файл
-        if self.frames:
-            print(f"[DEBUG] Сохранение {len(self.frames)} фреймов в файл {self.current_file}...")
-            try:
-                with wave.open(self.current_file, 'wb') as wf:
-                    wf.setnchannels(self.channels)
-                    wf.setsampwidth(self.audio.get_sample_size(self.format))
-                    wf.setframerate(self.rate)
-                    wf.writeframes(b''.join(self.frames))
-                
-                print(f"[DEBUG] Файл успешно сохранен: {self.current_file}")
-                
-                # Восстанавливаем мониторинг
-                if self.callback:
-                    self.start_monitoring(self.callback)
-                    
-                return self.current_file
-            except Exception as e:
-                print(f"[ERROR] Ошибка при сохранении файла: {e}")
-                import traceback
-                traceback.print_exc()
+        # Закрываем последний сегмент и дожидаемся записи всех фреймов на диск
+        segment = self._close_segment(final=True) if self.segment_bytes else None
+        self.disk_queue.put(None)
+        self.disk_thread.join()
+        
+        if segment:
+            # Восстанавливаем мониторинг
+            if self.callback:
+                self.start_monitoring(self.callback, stream=monitor_stream)
+            
+            if self.disk_error is not None:
+                print(f"[ERROR] Ошибка при сохранении файла: {self.disk_error}")
                 return None
+            print(f"[DEBUG] Файл успешно сохранен: {segment['path']}")
+            return segment["path"]
         else:
-            print(f"[WARNING] Нет фреймов для сохранения")
-            
             # Восстанавливаем мониторинг
             if self.callback:
-                self.start_monitoring(self.callback)
-                
+                self.start_monitoring(self.callback, stream=monitor_stream)
+            
+            if self.segments:
+                # Запись разделилась ровно в момент остановки
+                return self.segments[-1]["path"]
+            
+            print(f"[WARNING] Нет фреймов для сохранения")
             return None
     
     def __del__(self):
@@ -358,4 +563,244 @@ class AudioRecorder:
             self.monitor_stream.close()
             
         if self.audio:
-            self.audio.terminate()
\ No newline at end of file
+            self.audio.terminate()
+
+class _MonoTrack:
+    """
+    Дорожка одного устройства для сведения
+    
+    Сегменты записи читаются по очереди блоками и приводятся к моно 16 бит с частотой
+    сведения, поэтому в памяти одновременно находится только один блок каждой дорожки.
+    """
+    
+    def __init__(self, paths, offset_frames, rate):
+        """
+        Args:
+            paths (list): Пути к сегментам дорожки по порядку
+            offset_frames (int): Сколько фреймов тишины отдать до начала дорожки
+            rate (int): Частота дискретизации сведения
+        """
+        self.paths = list(paths)
+        self.silence = offset_frames
+        self.rate = rate
+        self.reader = None
+        self.position = 0
+        self.resample_state = None
+        self.buffer = bytearray()
+    
+    def _next_block(self):
+        """Следующий блок дорожки в моно с частотой сведения или None в конце дорожки"""
+        while self.reader is None or self.position >= self.reader.frame_count:
+            if self.reader is not None:
+                self.reader.close()
+                self.reader = None
+            if not self.paths:
+                return None
+            self.reader = WavReader(self.paths.pop(0))
+            self.position = 0
+        
+        reader = self.reader
+        end = min(reader.frame_count, self.position + MIX_BLOCK_FRAMES)
+        first = reader.data_offset + self.position * reader.block_align
+        last = reader.data_offset + end * reader.block_align
+        self.position = end
+        with reader.view[first:last] as frames, frames.cast("h") as samples:
+            data = _to_mono(samples, reader.channels)
+        if reader.sample_rate != self.rate:
+            data, self.resample_state = audioop.ratecv(data, MIX_SAMPLE_WIDTH, 1, reader.sample_rate, self.rate,
+                                                       self.resample_state)
+        return data
+    
+    def read(self, frames):
+        """Прочитать ровно frames фреймов; после конца дорожки отдается тишина"""
+        size = frames * MIX_SAMPLE_WIDTH
+        while len(self.buffer) < size:
+            if self.silence:
+                count = min(self.silence, MIX_BLOCK_FRAMES)
+                self.silence -= count
+                self.buffer += bytes(count * MIX_SAMPLE_WIDTH)
+                continue
+            block = self._next_block()
+            if block is None:
+                break
+            self.buffer += block
+        
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data.ljust(size, b"\0")
+    
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def _to_mono(samples, channels):
+    """Свести чередующиеся 16-битные отсчеты каналов в моно (среднее по каналам)"""
+    if channels == 1:
+        return samples.tobytes()
+    mono = None
+    for channel in range(channels):
+        data = audioop.mul(samples[channel::channels].tobytes(), MIX_SAMPLE_WIDTH, 1.0 / channels)
+        mono = data if mono is None else audioop.add(mono, data, MIX_SAMPLE_WIDTH)
+    return mono
+
+
+class MultiDeviceRecorder:
+    """
+    Одновременная запись с нескольких устройств (например, несколько микрофонов или микрофон и линейный вход)
+    
+    Каждое устройство записывается своим AudioRecorder в своем потоке, поэтому медленное
+    устройство не задерживает чтение остальных. После остановки записи известны сдвиги
+    начала записи каждого устройства, по которым дорожки выравниваются при сведении.
+    """
+    
+    def __init__(self, recorders, output_directory="recordings"):
+        """
+        Args:
+            recorders (list): Экземпляры AudioRecorder с уже выбранными устройствами.
+                Первый считается основным: по нему показывается уровень громкости
+            output_directory (str): Папка для записей
+        """
+        if not recorders:
+            raise ValueError("Не выбрано ни одного устройства записи")
+        self.recorders = recorders
+        self.output_directory = output_directory
+        self.is_recording = False
+        self.session_id = None
+        
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+    
+    def start_recording(self, volume_callback=None):
+        """
+        Начать запись со всех устройств
+        
+        Args:
+            volume_callback (callable): Функция обратного вызова для отображения уровня громкости основного устройства
+            
+        Returns:
+            list: Пути к файлам записи по устройствам
+        """
+        if self.is_recording:
+            return None
+        
+        self.is_recording = True
+        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        files = []
+        for number, recorder in enumerate(self.recorders, start=1):
+            file_path = os.path.join(self.output_directory, f"recording_{self.session_id}_dev{number}.wav")
+            # Громкость считается только для основного устройства, чтобы не тратить CPU в потоках остальных
+            files.append(recorder.start_recording(volume_callback if number == 1 else None, file_path=file_path))
+        
+        print(f"[INFO] Начата запись с {len(self.recorders)} устройств, сессия {self.session_id}")
+        return files
+    
+    def stop_recording(self, mix=True):
+        """
+        Остановить запись на всех устройствах
+        
+        Args:
+            mix (bool): Свести дорожки в один файл с учетом сдвигов начала записи
+            
+        Returns:
+            dict: {"files": сегменты дорожек по устройствам - списки [начало сегмента в секундах, путь],
+                "offsets": сдвиги начала дорожек в секундах относительно самой ранней,
+                "mix": части сведенной записи [[начало части в секундах, путь], ...] или None}
+        """
+        if not self.is_recording:
+            return None
+        self.is_recording = False
+        
+        files = []
+        start_times = []
+        for recorder in self.recorders:
+            if recorder.stop_recording():
+                # Сегменты не склеиваются: при сведении они читаются по очереди
+                files.append([[segment["start"], segment["path"]] for segment in recorder.segments])
+                start_times.append(recorder.first_frame_time)
+        
+        if not files:
+            return None
+        
+        reference = min(start_times)
+        offsets = [start - reference for start in start_times]
+        for segments, offset in zip(files, offsets):
+            print(f"[INFO] Дорожка {segments[0][1]} ({len(segments)} сегм.): сдвиг {offset * 1000:.1f} мс")
+        
+        mix_files = None
+        if mix and len(files) > 1:
+            mix_files = self._mix([[path for start, path in segments] for segments in files], offsets)
+        elif files:
+            mix_files = files[0]
+        
+        return {"files": files, "offsets": offsets, "mix": mix_files}
+    
+    def _mix(self, tracks, offsets):
+        """
+        Свести дорожки в моно с учетом сдвигов, не загружая их в память целиком
+        
+        Дорожки читаются блоками по MIX_BLOCK_FRAMES фреймов. Сведенная запись делится на части
+        по тем же ограничениям, что и сегменты основного устройства.
+        
+        Args:
+            tracks (list): Пути к сегментам каждого устройства по порядку
+            offsets (list): Сдвиги начала дорожек в секундах
+            
+        Returns:
+            list: Части сведенной записи [[начало части в секундах, путь], ...]
+        """
+        # Длительность дорожек берется из заголовков, данные на этом шаге не читаются
+        durations = []
+        rate = 0
+        for paths in tracks:
+            duration = 0.0
+            for path in paths:
+                with WavReader(path) as reader:
+                    if not reader.is_pcm16:
+                        raise ValueError(f"Сведение поддерживается только для 16-битного PCM WAV: {path}")
+                    duration += reader.duration
+                    rate = max(rate, reader.sample_rate)
+            durations.append(duration)
+        total_frames = max(int(round((duration + offset) * rate)) for duration, offset in zip(durations, offsets))
+        
+        primary = self.recorders[0]
+        part_frames = total_frames
+        if primary.max_segment_seconds:
+            part_frames = min(part_frames, int(primary.max_segment_seconds * rate))
+        if primary.max_segment_bytes:
+            part_frames = min(part_frames, primary.max_segment_bytes // MIX_SAMPLE_WIDTH)
+        part_frames = max(1, part_frames)
+        part_count = max(1, int(math.ceil(total_frames / float(part_frames))))
+        
+        base_path = os.path.join(self.output_directory, f"recording_{self.session_id}")
+        sources = [_MonoTrack(paths, int(round(offset * rate)), rate) for paths, offset in zip(tracks, offsets)]
+        parts = []
+        try:
+            for number in range(part_count):
+                # Если запись не делится, сохраняем ее под обычным именем
+                mix_path = f"{base_path}.wav" if part_count == 1 else f"{base_path}_part{number + 1:03d}.wav"
+                first = number * part_frames
+                length = min(part_frames, total_frames - first)
+                with wave.open(mix_path, 'wb') as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(MIX_SAMPLE_WIDTH)
+                    wf.setframerate(rate)
+                    written = 0
+                    while written < length:
+                        count = min(MIX_BLOCK_FRAMES, length - written)
+                        block = None
+                        for source in sources:
+                            data = source.read(count)
+                            # Сумма с насыщением, как при наложении дорожек в pydub
+                            block = data if block is None else audioop.add(block, data, MIX_SAMPLE_WIDTH)
+                        wf.writeframes(block)
+                        written += count
+                parts.append([first / float(rate), mix_path])
+        finally:
+            for source in sources:
+                source.close()
+        
+        print(f"[INFO] Дорожки сведены в {len(parts)} файл(ов): {parts[0][1]}")
+        return parts
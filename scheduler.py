@@ -0,0 +1,265 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Начальные оценки до первых измерений: задержка запроса (сек) и время обработки
+# одной секунды аудио (real-time factor). Дальше оценки уточняются по факту
+DEFAULT_PROFILES = {
+    "openai": {"latency": 2.0, "rtf": 0.05, "max_concurrency": 4},
+    "local": {"latency": 0.2, "rtf": 0.3, "max_concurrency": 1}
+}
+
+# Вес нового измерения в скользящем среднем
+EWMA_ALPHA = 0.3
+
+# Задержка и rtf оцениваются раздельно (прямой по точкам "длительность аудио - время ответа"),
+# только когда длительности измеренных файлов достаточно различаются
+MIN_FIT_SAMPLES = 3
+MIN_FIT_VARIANCE = 25.0
+
+# Нижняя граница доли свободного CPU: даже на полностью занятой машине модель продвигается
+MIN_CPU_AVAILABLE = 0.1
+
+# Как часто замерять загрузку CPU, сек. psutil считает загрузку за время с прошлого
+# замера, поэтому замеры чаще раза в секунду - в основном шум
+CPU_SAMPLE_INTERVAL = 1.0
+
+
+def _measure_cpu_available():
+    """Замерить долю свободного CPU: psutil, если установлен, иначе средняя загрузка системы"""
+    if psutil is not None:
+        return max(0.0, 1.0 - psutil.cpu_percent(interval=None) / 100)
+    if hasattr(os, "getloadavg"):
+        return max(0.0, 1.0 - os.getloadavg()[0] / (os.cpu_count() or 1))
+    return None
+
+
+_cpu_lock = threading.Lock()
+# (время замера, доля свободного CPU). Первый вызов psutil.cpu_percent только начинает
+# отсчет и возвращает 0, поэтому до первого настоящего замера CPU считается свободным
+_cpu_sample = (time.monotonic(), _measure_cpu_available())
+
+
+def cpu_available():
+    """
+    Доля свободного процессорного времени на машине
+
+    Значение замеряется не чаще раза в CPU_SAMPLE_INTERVAL секунд, между замерами
+    возвращается последнее.
+
+    Returns:
+        float: От 0 до 1 или None, если загрузку измерить нельзя
+    """
+    global _cpu_sample
+    with _cpu_lock:
+        now = time.monotonic()
+        if now - _cpu_sample[0] >= CPU_SAMPLE_INTERVAL:
+            _cpu_sample = (now, _measure_cpu_available())
+        return _cpu_sample[1]
+
+
+def cpu_slowdown():
+    """Во сколько раз локальное распознавание медленнее из-за CPU, занятого другими программами"""
+    available = cpu_available()
+    if available is None:
+        return 1.0
+    return 1.0 / max(available, MIN_CPU_AVAILABLE)
+
+
+class BackendStats:
+    """Измеренная производительность и текущая загрузка одного движка"""
+
+    def __init__(self, name, latency, rtf, max_concurrency):
+        self.name = name
+        self.latency = latency
+        self.rtf = rtf
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        # Оценка оставшейся работы по запросам, которые сейчас выполняются или ждут очереди
+        self.pending_seconds = 0.0
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Скользящие средние для оценки задержки и rtf: x - длительность аудио, y - время ответа
+        self.samples = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.mean_xx = 0.0
+        self.mean_xy = 0.0
+
+    def service_time(self, audio_seconds):
+        """
+        Оценка времени обработки одного файла без учета очереди
+
+        Для локальной модели учитывается текущая загрузка CPU другими программами. Пока
+        модель сама распознает, загрузку создает она, а ожидание уже учтено очередью.
+        """
+        estimate = self.latency + self.rtf * audio_seconds
+        if self.name == "local" and not self.in_flight:
+            estimate *= cpu_slowdown()
+        return estimate
+
+    def estimated_finish(self, audio_seconds):
+        """Оценка времени до готовности результата с учетом уже занятых слотов"""
+        wait = 0.0
+        if self.in_flight >= self.max_concurrency:
+            wait = self.pending_seconds / self.max_concurrency
+        return wait + self.service_time(audio_seconds)
+
+    def record(self, audio_seconds, elapsed):
+        """
+        Уточнить оценки задержки и скорости по результату запроса
+
+        Args:
+            audio_seconds (float): Длительность аудио
+            elapsed (float): Время обработки, приведенное к свободному CPU
+        """
+        if audio_seconds <= 0:
+            return
+        if self.samples == 0:
+            self.mean_x, self.mean_y = audio_seconds, elapsed
+            self.mean_xx, self.mean_xy = audio_seconds ** 2, audio_seconds * elapsed
+        else:
+            self.mean_x = (1 - EWMA_ALPHA) * self.mean_x + EWMA_ALPHA * audio_seconds
+            self.mean_y = (1 - EWMA_ALPHA) * self.mean_y + EWMA_ALPHA * elapsed
+            self.mean_xx = (1 - EWMA_ALPHA) * self.mean_xx + EWMA_ALPHA * audio_seconds ** 2
+            self.mean_xy = (1 - EWMA_ALPHA) * self.mean_xy + EWMA_ALPHA * audio_seconds * elapsed
+        self.samples += 1
+
+        variance = self.mean_xx - self.mean_x ** 2
+        if self.samples >= MIN_FIT_SAMPLES and variance > MIN_FIT_VARIANCE:
+            # Наклон прямой - rtf, пересечение с нулем - задержка запроса
+            self.rtf = max(0.0, (self.mean_xy - self.mean_x * self.mean_y) / variance)
+            self.latency = max(0.0, self.mean_y - self.rtf * self.mean_x)
+        else:
+            # Файлы одной длины (например, части по 5 минут): разделить задержку и rtf нельзя,
+            # поэтому обе оценки масштабируются так, чтобы прогноз для такой длины сходился с фактом
+            predicted = self.latency + self.rtf * audio_seconds
+            if predicted > 0:
+                factor = (1 - EWMA_ALPHA) + EWMA_ALPHA * elapsed / predicted
+                self.latency *= factor
+                self.rtf *= factor
+
+
+class TranscriptionRouter:
+    """
+    Выбор движка распознавания для каждого файла или части
+
+    Каждая задача отправляется туда, где она, по текущим оценкам, будет готова раньше:
+    короткие записи при свободном CPU обрабатываются локально, а при длинной очереди
+    работа расходится по параллельным запросам к API. Число одновременных запросов
+    к каждому движку ограничено, расход минут API можно ограничить лимитом в час.
+    """
+
+    def __init__(self, backends, profiles=None, api_seconds_per_hour=None):
+        """
+        Args:
+            backends (list): Доступные движки ("openai", "local")
+            profiles (dict, optional): Начальные оценки и лимиты параллельности по движкам
+            api_seconds_per_hour (float, optional): Максимум секунд аудио, отправляемых в API за час
+        """
+        profiles = profiles or {}
+        self.stats = {}
+        for name in backends:
+            profile = dict(DEFAULT_PROFILES.get(name, DEFAULT_PROFILES["openai"]))
+            profile.update(profiles.get(name, {}))
+            if name == "local":
+                # LocalWhisperBackend выполняет распознавания по одному (inference_lock), а одна
+                # модель и так использует все ядра: дополнительные слоты только исказили бы оценки
+                profile["max_concurrency"] = 1
+            self.stats[name] = BackendStats(name, profile["latency"], profile["rtf"], profile["max_concurrency"])
+
+        self.api_seconds_per_hour = api_seconds_per_hour
+        self.api_usage = []  # (время отправки, секунды аудио) за последний час
+        self.lock = threading.Lock()
+
+        if not self.stats:
+            raise ValueError("Нет доступных движков распознавания")
+
+    def _api_seconds_last_hour(self):
+        """Сколько секунд аудио отправлено в API за последний час"""
+        border = time.time() - 3600
+        self.api_usage = [(moment, seconds) for moment, seconds in self.api_usage if moment >= border]
+        return sum(seconds for moment, seconds in self.api_usage)
+
+    def _allowed(self, name, audio_seconds):
+        """Проверить лимиты расхода для движка"""
+        if name == "openai" and self.api_seconds_per_hour is not None:
+            return self._api_seconds_last_hour() + audio_seconds <= self.api_seconds_per_hour
+        return True
+
+    def choose(self, audio_seconds):
+        """
+        Выбрать движок для задачи и зарезервировать под нее место в очереди
+
+        Args:
+            audio_seconds (float): Длительность аудио в секундах
+
+        Returns:
+            str: Имя выбранного движка
+        """
+        with self.lock:
+            candidates = [stats for name, stats in self.stats.items() if self._allowed(name, audio_seconds)]
+            if not candidates:
+                # Лимит API исчерпан, а других движков нет - задача подождет своей очереди в API
+                candidates = list(self.stats.values())
+
+            best = min(candidates, key=lambda stats: stats.estimated_finish(audio_seconds))
+            best.in_flight += 1
+            best.pending_seconds += best.service_time(audio_seconds)
+            if best.name == "openai":
+                self.api_usage.append((time.time(), audio_seconds))
+            return best.name
+
+    def _release(self, name, audio_seconds, expected_seconds, elapsed, success):
+        with self.lock:
+            stats = self.stats[name]
+            stats.in_flight -= 1
+            stats.pending_seconds = max(0.0, stats.pending_seconds - expected_seconds)
+            if success:
+                stats.record(audio_seconds, elapsed)
+
+    @contextmanager
+    def dispatch(self, audio_seconds):
+        """
+        Выбрать движок и занять слот на время выполнения запроса
+
+        Пример:
+            with router.dispatch(30.0) as backend:
+                result = engines[backend].transcribe(...)
+
+        Args:
+            audio_seconds (float): Длительность аудио в секундах
+
+        Yields:
+            str: Имя выбранного движка
+        """
+        name = self.choose(audio_seconds)
+        stats = self.stats[name]
+        expected_seconds = stats.service_time(audio_seconds)
+
+        # Ждем свободного слота, если движок уже загружен на максимум
+        stats.semaphore.acquire()
+        # Время на занятом другими программами CPU приводится к свободному, чтобы не искажать rtf
+        cpu_factor = cpu_slowdown() if name == "local" else 1.0
+        start_time = time.time()
+        success = False
+        try:
+            yield name
+            success = True
+        finally:
+            stats.semaphore.release()
+            self._release(name, audio_seconds, expected_seconds, (time.time() - start_time) / cpu_factor, success)
+
+    def describe(self):
+        """Текущие оценки по движкам для журнала"""
+        with self.lock:
+            return {
+                name: {"latency": round(stats.latency, 2), "rtf": round(stats.rtf, 3), "in_flight": stats.in_flight,
+                       "pending_seconds": round(stats.pending_seconds, 1)}
+                for name, stats in self.stats.items()
+            }
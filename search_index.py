@@ -0,0 +1,233 @@
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import threading
+
+from csv_tail import CSVTail
+
+# Окончания, которые отбрасываются при поиске, чтобы находить разные формы слова.
+# Это не полноценный стеммер: оставшаяся основа ищется как префикс ("договор*")
+RUSSIAN_ENDINGS = (
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ешь", "ете", "ите",
+    "ах", "ях", "ов", "ев", "ей", "ой", "ий", "ый", "ая", "яя", "ое", "ее", "ие", "ые",
+    "ам", "ям", "ом", "ем", "ую", "юю", "ть", "ет", "ут", "ют", "ит", "ат", "ят",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й"
+)
+KAZAKH_ENDINGS = (
+    "лар", "лер", "дар", "дер", "тар", "тер", "ның", "нің", "дың", "дің", "тың", "тің",
+    "нан", "нен", "дан", "ден", "тан", "тен", "мен", "бен", "пен",
+    "ға", "ге", "қа", "ке", "да", "де", "та", "те"
+)
+ENDINGS = sorted(set(RUSSIAN_ENDINGS + KAZAKH_ENDINGS), key=len, reverse=True)
+
+# Минимальная длина основы после отбрасывания окончания
+MIN_STEM_LENGTH = 3
+
+# Сколько строк вставлять в индекс за одну операцию при перестроении
+INSERT_BATCH_SIZE = 1000
+
+# Колонки CSV, которые попадают в индекс
+INDEXED_COLUMNS = ("Имя менеджера", "Дата", "ID", "Резюме")
+
+# Версия формата индекса: индекс, построенный другой версией, перестраивается при синхронизации
+INDEX_VERSION = 2
+
+
+def normalize_text(text):
+    """
+    Привести текст к виду, в котором он хранится в индексе и ищется
+
+    Токенизатор unicode61 не приравнивает ё к е, поэтому замена делается до индексации
+    и в запросе: "ёлка" и "елка" находят одни и те же записи.
+    """
+    return text.replace("ё", "е").replace("Ё", "Е")
+
+
+def stem_token(token):
+    """
+    Отбросить типичное русское или казахское окончание
+
+    Args:
+        token (str): Слово в нижнем регистре
+
+    Returns:
+        str: Основа слова
+    """
+    for ending in ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def build_match_query(query):
+    """
+    Преобразовать пользовательский запрос в выражение MATCH для FTS5
+
+    Все слова запроса должны встретиться в записи, каждое ищется по основе как префикс.
+
+    Args:
+        query (str): Текст запроса
+
+    Returns:
+        str: Выражение для MATCH или пустая строка, если в запросе нет слов
+    """
+    tokens = re.findall(r"\w+", normalize_text(query.lower()))
+    terms = [f'"{stem_token(token)}"*' for token in tokens]
+    return " AND ".join(terms)
+
+
+class TranscriptIndex:
+    """Инкрементальный полнотекстовый индекс CSV файла с резюме на SQLite FTS5"""
+
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or os.path.splitext(csv_path)[0] + ".search.sqlite"
+        self.lock = threading.Lock()
+
+        # Соединение используется из потока интерфейса и фоновых потоков, доступ защищен блокировкой
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """Создать таблицы индекса, если их еще нет"""
+        with self.connection:
+            # unicode61 считает буквами всю кириллицу, включая казахские ә, ғ, қ, ң, ө, ұ, ү, һ, і;
+            # ё он от е не отличает только после normalize_text, которая применяется к значениям и запросу
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5("
+                "manager, date UNINDEXED, conversation_id, summary, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+            )
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False))
+        )
+
+    def _read_csv_header(self):
+        """Прочитать строку заголовков CSV файла"""
+        with open(self.csv_path, "r", newline="", encoding="utf-8-sig") as csvfile:
+            return next(csv.reader(csvfile), None)
+
+    def sync(self):
+        """
+        Добавить в индекс строки, дописанные в CSV с прошлой синхронизации
+
+        Если файл был заменен или укорочен, индекс перестраивается полностью.
+
+        Returns:
+            int: Количество добавленных строк
+        """
+        with self.lock:
+            if not os.path.isfile(self.csv_path):
+                return 0
+
+            start_time = time.time()
+            file_size = os.path.getsize(self.csv_path)
+            offset = self._get_meta("offset", 0)
+            headers = self._get_meta("headers")
+
+            if offset > file_size or (offset and headers != self._read_csv_header()):
+                print(f"[INFO] CSV файл {self.csv_path} изменился, индекс поиска будет перестроен")
+                offset = 0
+            elif offset and self._get_meta("version") != INDEX_VERSION:
+                print(f"[INFO] Индекс поиска {self.index_path} построен старой версией и будет перестроен")
+                offset = 0
+
+            if offset == file_size:
+                return 0
+
+            added = self._index_from_offset(offset, headers)
+            elapsed_time = time.time() - start_time
+            if added:
+                print(f"[INFO] В индекс поиска добавлено строк: {added} за {elapsed_time:.2f} секунд")
+            return added
+
+    def _index_from_offset(self, offset, headers):
+        """Прочитать CSV начиная с байта offset и добавить строки в индекс"""
+        tail = CSVTail(self.csv_path, offset)
+
+        with self.connection:
+            if offset == 0:
+                self.connection.execute("DELETE FROM entries")
+                row_number = 0
+            else:
+                row_number = self._get_meta("rows", 0)
+
+            positions = None
+            batch = []
+            added = 0
+            for row in tail:
+                if positions is None:
+                    # При чтении с начала файла заголовки становятся известны после первой строки
+                    headers = tail.headers if offset == 0 else headers
+                    positions = {column: headers.index(column) if headers and column in headers else None
+                                 for column in INDEXED_COLUMNS}
+                row_number += 1
+                values = [normalize_text(row[positions[column]])
+                          if positions[column] is not None and positions[column] < len(row)
+                          else "" for column in INDEXED_COLUMNS]
+                batch.append([row_number] + values)
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    self._insert_rows(batch)
+                    added += len(batch)
+                    batch = []
+            if batch:
+                self._insert_rows(batch)
+                added += len(batch)
+
+            if offset == 0:
+                headers = tail.headers
+            self._set_meta("offset", tail.end_offset)
+            self._set_meta("rows", row_number)
+            self._set_meta("headers", headers)
+            self._set_meta("version", INDEX_VERSION)
+        return added
+
+    def _insert_rows(self, rows):
+        self.connection.executemany(
+            "INSERT INTO entries (rowid, manager, date, conversation_id, summary) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def search(self, query, limit=50):
+        """
+        Найти записи, содержащие все слова запроса
+
+        Args:
+            query (str): Текст запроса
+            limit (int): Максимальное количество результатов
+
+        Returns:
+            list: Словари с ключами row (номер строки данных в CSV, с 1), manager, date,
+                conversation_id и snippet (фрагмент резюме с найденными словами в [скобках])
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT rowid, manager, date, conversation_id, snippet(entries, 3, '[', ']', '…', 16) "
+                "FROM entries WHERE entries MATCH ? ORDER BY bm25(entries) LIMIT ?",
+                (match_query, limit)
+            ).fetchall()
+
+        return [
+            {"row": row[0], "manager": row[1], "date": row[2], "conversation_id": row[3], "snippet": row[4]}
+            for row in rows
+        ]
+
+    def close(self):
+        """Закрыть соединение с индексом"""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,453 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from dotenv import load_dotenv
+
+from transcriber import WhisperTranscriber
+from csv_handler import CSVHandler
+from subtitles import write_segments
+from storage import RecordingStore, StorageMaintenance
+from settings import get_settings, add_arguments, configure_from_args
+
+# Размер блока при приеме загружаемого файла
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# Максимальный размер JSON тела запроса: в нем передаются только параметры задачи
+MAX_JSON_BODY_BYTES = 64 * 1024
+
+# Сколько завершенных задач хранить в памяти для запросов статуса
+MAX_FINISHED_JOBS = 1000
+
+# Поля задачи, которые можно передать в параметрах запроса или в JSON
+JOB_FIELDS = ("language", "backend", "manager", "date", "conversation_id", "timestamps")
+
+
+class RequestTooLarge(ValueError):
+    """Тело запроса больше допустимого размера"""
+
+
+class TranscriptionService:
+    """
+    Очередь задач транскрибации с ограниченным числом одновременно обрабатываемых файлов
+
+    Результат каждой задачи можно сразу записать в CSV: для этого в задаче указываются
+    имя менеджера и ID переговора.
+    """
+
+    def __init__(self, transcriber, csv_path=None, upload_dir="uploads", workers=2):
+        """
+        Args:
+            transcriber (WhisperTranscriber): Транскрибатор
+            csv_path (str, optional): CSV файл для записи результатов (создается при необходимости)
+            upload_dir (str): Папка для загруженных файлов
+            workers (int): Сколько файлов обрабатывать одновременно
+        """
+        self.transcriber = transcriber
+        self.upload_dir = upload_dir
+        self.jobs = {}
+        self.finished = []
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        os.makedirs(upload_dir, exist_ok=True)
+        # Загруженные записи, сохраненные в CSV, архивируются в фоне
+        self.store = RecordingStore(upload_dir)
+        self.maintenance = StorageMaintenance(self.store).start()
+
+        self.csv_handler = None
+        if csv_path:
+            self.csv_handler = CSVHandler()
+            if os.path.exists(csv_path):
+                self.csv_handler.set_file_path(csv_path)
+            else:
+                self.csv_handler.create_new_file(csv_path)
+
+        self.workers = []
+        for number in range(workers):
+            worker = threading.Thread(target=self._worker, name=f"transcription-worker-{number + 1}")
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, audio_path, options=None, uploaded=False):
+        """
+        Поставить файл в очередь
+
+        Args:
+            audio_path (str): Путь к аудиофайлу
+            options (dict, optional): Параметры задачи (см. JOB_FIELDS)
+            uploaded (bool): Файл загружен через сервер (а не указан путем на диске)
+
+        Returns:
+            dict: Состояние созданной задачи
+        """
+        options = options or {}
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "audio_path": audio_path,
+            "uploaded": uploaded,
+            "options": {key: options[key] for key in JOB_FIELDS if options.get(key) not in (None, "")},
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "text": None,
+            "segments": [],
+            "error": None,
+            "usage": None,
+            "csv_saved": False
+        }
+        with self.lock:
+            self.jobs[job["id"]] = job
+        self.queue.put(job["id"])
+        print(f"[INFO] Задача {job['id']} поставлена в очередь: {audio_path}")
+        return self.describe(job["id"])
+
+    def describe(self, job_id, with_result=True):
+        """Состояние задачи для ответа клиенту или None, если задача не найдена"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            result = {key: value for key, value in job.items() if key != "audio_path"}
+            result["position"] = self._position(job_id) if job["status"] == "queued" else 0
+        if not with_result:
+            result.pop("text")
+            result.pop("segments")
+        return result
+
+    def _position(self, job_id):
+        """Место задачи в очереди (с 1)"""
+        queued = [job for job in self.jobs.values() if job["status"] == "queued"]
+        queued.sort(key=lambda job: job["created"])
+        return next((number for number, job in enumerate(queued, start=1) if job["id"] == job_id), 0)
+
+    def list_jobs(self):
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.describe(job_id, with_result=False) for job_id in job_ids]
+
+    def stats(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": len(self.workers), "jobs": counts,
+                "usage_today": self.transcriber.usage.daily_summary(days=0)}
+
+    def _worker(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                # Измененный файл настроек применяется с очередной задачи, без перезапуска сервера
+                get_settings().reload_if_changed()
+                self._process(job_id)
+            finally:
+                self.queue.task_done()
+
+    def _process(self, job_id):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started"] = time.time()
+        options = job["options"]
+
+        try:
+            result = self.transcriber.transcribe_audio_detailed(
+                job["audio_path"], options.get("language"), with_segments=True, backend=options.get("backend"),
+                manager=options.get("manager")
+            )
+            csv_saved = False
+            if not result["error"] and self.csv_handler and options.get("manager") and options.get("conversation_id"):
+                csv_saved = self._save_to_csv(job, result)
+            with self.lock:
+                job["csv_saved"] = csv_saved
+                job["text"] = result["text"]
+                job["segments"] = result["segments"]
+                job["usage"] = result.get("usage")
+                job["error"] = result["error"]
+                job["status"] = "error" if result["error"] else "done"
+        except Exception as e:
+            print(f"[ERROR] Ошибка при обработке задачи {job_id}: {e}")
+            with self.lock:
+                job["error"] = str(e)
+                job["status"] = "error"
+
+        # Загруженный файл без записи в CSV никуда не попадает (архив хранит только записанные),
+        # поэтому удаляем его, чтобы папка загрузок не росла
+        if job["uploaded"] and not job["csv_saved"]:
+            self._remove_upload(job["audio_path"])
+
+        with self.lock:
+            job["finished"] = time.time()
+            self.finished.append(job_id)
+            # Старые завершенные задачи удаляем, чтобы память сервера не росла бесконечно
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self.finished.pop(0), None)
+        print(f"[INFO] Задача {job_id} завершена за {job['finished'] - job['started']:.2f} секунд")
+
+    def _remove_upload(self, audio_path):
+        """Удалить загруженный файл, который не нужно хранить"""
+        try:
+            os.remove(audio_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[WARNING] Не удалось удалить загруженный файл {audio_path}: {e}")
+
+    def _save_to_csv(self, job, result):
+        """Записать результат задачи в CSV"""
+        options = job["options"]
+        timestamps_file = ""
+        if options.get("timestamps", "1") not in ("0", "false", False) and result["segments"]:
+            base_path = os.path.splitext(os.path.abspath(job["audio_path"]))[0]
+            timestamps_file = write_segments(result["segments"], base_path, formats=("srt", "jsonl"))["srt"]
+
+        date = options.get("date") or datetime.now().strftime("%Y-%m-%d")
+        saved = self.csv_handler.add_entry(options["manager"], date, options["conversation_id"],
+                                           result["text"], timestamps_file, usage=result.get("usage"))
+        if saved:
+            self.store.register([job["audio_path"]], options["conversation_id"], options["manager"])
+        return saved
+
+
+class TranscriptionRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP интерфейс к очереди транскрибации
+
+    POST /jobs                 - тело запроса: аудиофайл (параметры задачи - в строке запроса,
+                                 расширение файла - в параметре filename) или JSON {"path": ..., ...}
+    GET  /jobs                 - список задач
+    GET  /jobs/<id>            - состояние и результат задачи
+    GET  /health               - состояние сервера
+    """
+
+    server_version = "TranscriptionServer/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, dict(self.service.stats(), status="ok"))
+        elif path == "/jobs":
+            self._send_json(200, {"jobs": self.service.list_jobs()})
+        elif path.startswith("/jobs/"):
+            job = self.service.describe(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "Задача не найдена"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "Неизвестный адрес"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Неизвестный адрес"})
+            return
+
+        options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        content_type = self.headers.get("Content-Type", "")
+
+        try:
+            if content_type.startswith("application/json"):
+                request = json.loads(self._read_body_bytes().decode("utf-8"))
+                if not isinstance(request, dict):
+                    self._send_json(400, {"error": "Ожидается JSON объект с параметрами задачи"})
+                    return
+                options.update(request)
+                if not self.server.allow_paths:
+                    self._send_json(403, {"error": "Передача путей к файлам отключена, загрузите файл"})
+                    return
+                audio_path = request.get("path")
+                if not audio_path or not os.path.isfile(audio_path):
+                    self._send_json(400, {"error": f"Файл не найден: {audio_path}"})
+                    return
+                job = self.service.submit(audio_path, options)
+            else:
+                audio_path = self._receive_upload(options.get("filename", "upload.wav"))
+                job = self.service.submit(audio_path, options, uploaded=True)
+        except RequestTooLarge as e:
+            # Непрочитанный остаток тела нельзя принять за следующий запрос - соединение закрывается
+            self.close_connection = True
+            self._send_json(413, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        self._send_json(202, job)
+
+    def _read_body_bytes(self, max_bytes=MAX_JSON_BODY_BYTES):
+        """
+        Прочитать небольшое тело запроса (JSON) целиком
+
+        Raises:
+            RequestTooLarge: Тело больше max_bytes; заявленный Content-Length проверяется до чтения
+        """
+        error = f"Тело запроса больше допустимого размера ({max_bytes // 1024} КБ)"
+        length = self.headers.get("Content-Length")
+        if length is not None and int(length) > max_bytes:
+            raise RequestTooLarge(error)
+
+        blocks = []
+        received = 0
+        for block in self._iter_body():
+            received += len(block)
+            if received > max_bytes:
+                raise RequestTooLarge(error)
+            blocks.append(block)
+        return b"".join(blocks)
+
+    def _iter_body(self):
+        """
+        Читать тело запроса блоками, не накапливая его в памяти
+
+        Поддерживаются Content-Length и Transfer-Encoding: chunked.
+        """
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size_line = self.rfile.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Пропускаем завершающие заголовки до пустой строки
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                while size > 0:
+                    block = self.rfile.read(min(size, UPLOAD_BLOCK_SIZE))
+                    if not block:
+                        raise ValueError("Соединение закрыто до окончания загрузки")
+                    size -= len(block)
+                    yield block
+                self.rfile.readline()
+            return
+
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise ValueError("Не указан размер тела запроса (Content-Length или chunked)")
+        remaining = int(length)
+        while remaining > 0:
+            block = self.rfile.read(min(remaining, UPLOAD_BLOCK_SIZE))
+            if not block:
+                raise ValueError("Соединение закрыто до окончания загрузки")
+            remaining -= len(block)
+            yield block
+
+    def _receive_upload(self, filename):
+        """
+        Сохранить загружаемый файл на диск по мере поступления данных
+
+        Returns:
+            str: Путь к сохраненному файлу
+        """
+        extension = os.path.splitext(os.path.basename(filename))[1] or ".wav"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        audio_path = os.path.join(self.service.upload_dir, f"upload_{timestamp}_{uuid.uuid4().hex[:8]}{extension}")
+        max_bytes = self.server.max_upload_bytes
+
+        received = 0
+        try:
+            with open(audio_path, "wb") as f:
+                for block in self._iter_body():
+                    received += len(block)
+                    if max_bytes and received > max_bytes:
+                        raise RequestTooLarge(f"Файл больше допустимого размера ({max_bytes // (1024 * 1024)} МБ)")
+                    f.write(block)
+        except Exception:
+            os.remove(audio_path)
+            raise
+
+        if not received:
+            os.remove(audio_path)
+            raise ValueError("Пустое тело запроса")
+
+        print(f"[INFO] Получен файл {audio_path} ({received / (1024 * 1024):.2f} МБ)")
+        return audio_path
+
+    def log_message(self, format, *args):
+        print(f"[INFO] {self.address_string()} {format % args}")
+
+
+def create_server(host="127.0.0.1", port=8765, csv_path=None, workers=None, upload_dir="uploads",
+                  max_upload_mb=2048, backend=None, allow_paths=None):
+    """
+    Создать HTTP сервер транскрибации
+
+    Args:
+        workers (int, optional): Сколько файлов транскрибировать одновременно (по умолчанию - настройка server.workers)
+        allow_paths (bool, optional): Разрешить задачи с путем к файлу на диске сервера.
+            По умолчанию разрешено, только если сервер слушает локальный адрес
+
+    Returns:
+        ThreadingHTTPServer: Сервер с атрибутом service (TranscriptionService)
+    """
+    transcriber = WhisperTranscriber(default_backend=backend)
+    server = ThreadingHTTPServer((host, port), TranscriptionRequestHandler)
+    server.service = TranscriptionService(transcriber, csv_path=csv_path, upload_dir=upload_dir,
+                                          workers=workers or get_settings()["server.workers"])
+    server.max_upload_bytes = int(max_upload_mb * 1024 * 1024)
+    server.allow_paths = host in ("127.0.0.1", "localhost") if allow_paths is None else allow_paths
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер транскрибации записей без графического интерфейса")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"),
+                        help="Адрес для входящих подключений (0.0.0.0 - для всей сети)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8765")))
+    parser.add_argument("--csv", help="CSV файл для записи результатов")
+    parser.add_argument("--workers", type=int, help="Сколько файлов транскрибировать одновременно")
+    parser.add_argument("--upload-dir", default="uploads", help="Папка для загруженных файлов")
+    parser.add_argument("--max-upload-mb", type=float, default=float(os.getenv("SERVER_MAX_UPLOAD_MB", "2048")))
+    parser.add_argument("--backend", help="Движок распознавания: openai, local или auto")
+    parser.add_argument("--allow-paths", action="store_true", default=None,
+                        help="Принимать пути к файлам на диске сервера и при доступе из сети")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        configure_from_args(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    server = create_server(args.host, args.port, csv_path=args.csv, workers=args.workers,
+                           upload_dir=args.upload_dir, max_upload_mb=args.max_upload_mb, backend=args.backend,
+                           allow_paths=args.allow_paths)
+    print(f"[INFO] Сервер транскрибации запущен на http://{args.host}:{args.port}")
+    # Соединение с API и кодеки готовятся в фоне, до первой задачи
+    threading.Thread(target=server.service.transcriber.warm_up, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Остановка сервера...")
+    finally:
+        server.server_close()
+        server.service.maintenance.stop()
+        server.service.store.close()
+        if server.service.csv_handler:
+            server.service.csv_handler.end_batch()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
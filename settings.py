@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import argparse
+import threading
+
+# Описание настроек: ключ -> (тип, значение по умолчанию, переменная окружения, проверка, описание).
+# Проверка - кортеж допустимых значений, пара (минимум, максимум) или None.
+# Ключи из RESTART_REQUIRED применяются только при следующем запуске
+SETTINGS = {
+    # Профиль записи
+    "recording.rate": (int, 44100, "RECORDING_RATE", (8000, 192000), "Частота дискретизации записи, Гц"),
+    "recording.chunk": (int, 1024, "RECORDING_CHUNK", (64, 65536), "Размер буфера чтения с устройства, фреймов"),
+    "recording.segment_minutes": (float, 30.0, "RECORDING_SEGMENT_MINUTES", (0, 24 * 60),
+                                  "Длительность файла-сегмента длинной записи, минут (0 - без ограничения)"),
+    "recording.segment_mb": (float, 24.0, "RECORDING_SEGMENT_MB", (0, 1024 * 1024),
+                             "Размер файла-сегмента, МБ (0 - без ограничения)"),
+    "recording.checkpoint_seconds": (float, 5.0, "RECORDING_CHECKPOINT_SECONDS", (0.5, 600),
+                                     "Интервал обновления заголовка WAV и сброса на диск, секунд"),
+
+    # Движок распознавания
+    "transcription.backend": (str, "openai", "WHISPER_BACKEND", ("openai", "local", "auto"),
+                              "Движок распознавания по умолчанию"),
+    "transcription.model": (str, "whisper-1", "WHISPER_MODEL", None, "Модель Whisper API"),
+    "transcription.local_model": (str, "small", "WHISPER_LOCAL_MODEL", None, "Размер локальной модели faster-whisper"),
+    "transcription.local_compute_type": (str, "int8", "WHISPER_LOCAL_COMPUTE_TYPE", None,
+                                         "Тип вычислений локальной модели"),
+    "transcription.local_threads": (int, 0, "WHISPER_LOCAL_THREADS", (0, 256),
+                                    "Потоков CPU для локальной модели (0 - по умолчанию)"),
+
+    # Разбиение на части
+    "transcription.max_file_mb": (float, 25.0, "WHISPER_MAX_FILE_MB", (1, 25),
+                                  "Файлы больше этого размера отправляются в API по частям, МБ"),
+    "transcription.chunk_minutes": (float, 5.0, "WHISPER_CHUNK_MINUTES", (0.5, 60), "Длительность части, минут"),
+    "transcription.chunk_overlap_seconds": (float, 3.0, "WHISPER_CHUNK_OVERLAP_SECONDS", (0, 30),
+                                            "Перекрытие соседних частей, секунд"),
+    "transcription.economy_bitrate": (str, "32k", "WHISPER_ECONOMY_BITRATE", None,
+                                      "Битрейт MP3 в экономном режиме"),
+    "transcription.economy_min_pause_seconds": (float, 2.0, "WHISPER_ECONOMY_MIN_PAUSE_SECONDS", (0.5, 60),
+                                                "Паузы не короче этого вырезаются в экономном режиме, секунд"),
+
+    # Параллельность
+    "transcription.upload_workers": (int, 4, "WHISPER_UPLOAD_WORKERS", (1, 64),
+                                     "Одновременных запросов при пакетной обработке"),
+    "transcription.preprocess_workers": (int, 0, "WHISPER_PREPROCESS_WORKERS", (0, 256),
+                                         "Процессов подготовки аудио (0 - все ядра)"),
+    "server.workers": (int, 2, "SERVER_WORKERS", (1, 64), "Файлов, одновременно обрабатываемых сервером"),
+
+    # Расход и бюджет API
+    "budget.price_per_minute": (float, 0.006, "WHISPER_PRICE_PER_MINUTE", (0, 10),
+                                "Цена минуты аудио в Whisper API, $"),
+    "budget.economy_fraction": (float, 0.8, "WHISPER_BUDGET_ECONOMY_FRACTION", (0.05, 1),
+                                "Доля бюджета, после которой включается экономный режим"),
+    "budget.max_wait_seconds": (float, 600.0, "WHISPER_BUDGET_MAX_WAIT_SECONDS", (0, 24 * 3600),
+                                "Сколько ждать освобождения исчерпанного бюджета, секунд"),
+    "budget.api_seconds_per_hour": (float, 0.0, "WHISPER_API_SECONDS_PER_HOUR", (0, 10 ** 7),
+                                    "Секунд аудио в час, отправляемых в API в режиме auto (0 - без ограничения)"),
+
+    # Кеш результатов
+    "cache.enabled": (bool, True, "WHISPER_DEDUP", None, "Не распознавать повторно уже распознанные записи"),
+    "cache.path": (str, "transcript_cache.sqlite", "WHISPER_CACHE_PATH", None, "Файл кеша результатов"),
+    "cache.max_entries": (int, 0, "WHISPER_CACHE_MAX_ENTRIES", (0, 10 ** 9),
+                          "Максимум результатов в кеше (0 - без ограничения)"),
+
+    # Архив записей
+    "storage.codec": (str, "flac", "STORAGE_CODEC", ("flac", "opus"), "Кодек архива записей"),
+    "storage.retention_days": (int, 0, "STORAGE_RETENTION_DAYS", (0, 100000),
+                               "Срок хранения архивных записей, дней (0 - бессрочно)"),
+    "storage.maintenance_interval": (float, 3600.0, "STORAGE_MAINTENANCE_INTERVAL", (60, 7 * 24 * 3600),
+                                     "Интервал фонового архивирования, секунд"),
+
+    # Профилирование
+    "profiling.enabled": (bool, False, "APP_PROFILE", None,
+                          "Профилировать запись, транскрибацию и сохранение (cProfile, tracemalloc)"),
+    "profiling.dir": (str, "profiles", "APP_PROFILE_DIR", None, "Папка для профилей"),
+    "profiling.top": (int, 20, "APP_PROFILE_TOP", (1, 1000), "Строк в сводках профилей"),
+    "profiling.memory": (bool, True, "APP_PROFILE_MEMORY", None,
+                         "Замерять выделения памяти (замедляет работу во время замера)")
+}
+
+RESTART_REQUIRED = ("transcription.local_model", "transcription.local_compute_type", "transcription.local_threads",
+                    "cache.enabled", "cache.path", "server.workers", "profiling.dir")
+
+# Значения логических настроек в файле, окружении и командной строке
+TRUE_VALUES = ("1", "true", "yes", "on", "да")
+FALSE_VALUES = ("0", "false", "no", "off", "нет")
+
+
+def convert(key, value):
+    """
+    Привести значение настройки к ее типу и проверить ограничения
+
+    Raises:
+        ValueError: Значение не подходит для настройки
+    """
+    value_type, default, env_name, check, description = SETTINGS[key]
+    if value_type is bool:
+        if isinstance(value, bool):
+            result = value
+        elif str(value).strip().lower() in TRUE_VALUES:
+            result = True
+        elif str(value).strip().lower() in FALSE_VALUES:
+            result = False
+        else:
+            raise ValueError(f"{key}: ожидается логическое значение, получено {value!r}")
+    else:
+        try:
+            result = value_type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key}: ожидается {value_type.__name__}, получено {value!r}")
+
+    if isinstance(check, tuple) and check and isinstance(check[0], str):
+        if result not in check:
+            raise ValueError(f"{key}: допустимые значения - {', '.join(check)}, получено {result!r}")
+    elif check is not None:
+        minimum, maximum = check
+        if not minimum <= result <= maximum:
+            raise ValueError(f"{key}: значение {result} вне диапазона {minimum}..{maximum}")
+    return result
+
+
+def flatten(data, prefix=""):
+    """Развернуть вложенные разделы файла настроек в ключи вида "раздел.имя" """
+    result = {}
+    for name, value in data.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict):
+            result.update(flatten(value, key + "."))
+        else:
+            result[key] = value
+    return result
+
+
+def parse_overrides(items):
+    """
+    Разобрать настройки командной строки вида ключ=значение
+
+    Returns:
+        dict: Ключ -> строковое значение
+    """
+    overrides = {}
+    for item in items or []:
+        key, separator, value = item.partition("=")
+        if not separator:
+            raise ValueError(f"Настройка командной строки должна иметь вид ключ=значение: {item!r}")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+
+class Settings:
+    """
+    Настройки приложения из файла, переменных окружения и командной строки
+
+    Значения берутся по приоритету: командная строка, переменные окружения, файл
+    настроек (JSON с разделами recording, transcription, server, budget, cache, storage),
+    значения по умолчанию. Все значения проверяются при загрузке; ошибка в любом
+    значении не дает применить настройки. Файл можно изменить во время работы -
+    reload_if_changed перечитает его и сообщит подписчикам об измененных ключах.
+    """
+
+    def __init__(self, path=None, overrides=None):
+        """
+        Args:
+            path (str, optional): Файл настроек (по умолчанию - переменная APP_SETTINGS или settings.json)
+            overrides (dict, optional): Настройки командной строки
+
+        Raises:
+            ValueError: В настройках есть ошибки
+        """
+        self.path = path or os.getenv("APP_SETTINGS", "settings.json")
+        self.overrides = dict(overrides or {})
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.file_mtime = None
+        self.values = self._load()
+
+    def _file_values(self):
+        if not os.path.exists(self.path):
+            self.file_mtime = None
+            return {}
+        self.file_mtime = os.path.getmtime(self.path)
+        try:
+            with open(self.path, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Файл настроек {self.path} содержит ошибку: {e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"Файл настроек {self.path} должен содержать объект JSON")
+        return flatten(data)
+
+    def _load(self):
+        """Собрать и проверить значения из всех источников"""
+        sources = [("файл", self._file_values()), ("командная строка", self.overrides)]
+        errors = []
+        for source, values in sources:
+            for key in values:
+                if key not in SETTINGS:
+                    errors.append(f"{key}: неизвестная настройка ({source})")
+
+        result = {}
+        for key, (value_type, default, env_name, check, description) in SETTINGS.items():
+            value = default
+            if key in sources[0][1]:
+                value = sources[0][1][key]
+            if env_name and os.getenv(env_name) not in (None, ""):
+                value = os.getenv(env_name)
+            if key in self.overrides:
+                value = self.overrides[key]
+            try:
+                result[key] = convert(key, value)
+            except ValueError as e:
+                errors.append(str(e))
+
+        if errors:
+            raise ValueError("Ошибки в настройках:\n" + "\n".join(errors))
+        return result
+
+    def get(self, key):
+        """Текущее значение настройки"""
+        with self.lock:
+            return self.values[key]
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def subscribe(self, callback):
+        """
+        Подписаться на изменение настроек
+
+        Args:
+            callback (callable): Вызывается со множеством измененных ключей после перезагрузки
+        """
+        self.subscribers.append(callback)
+
+    def reload(self):
+        """
+        Перечитать настройки; при ошибке остаются прежние значения
+
+        Returns:
+            bool: True, если настройки изменились и применены
+        """
+        try:
+            values = self._load()
+        except ValueError as e:
+            print(f"[ERROR] Настройки не применены: {e}")
+            return False
+
+        with self.lock:
+            changed = {key for key in values if values[key] != self.values[key]}
+            self.values = values
+        if not changed:
+            return False
+
+        for key in sorted(changed):
+            note = " (вступит в силу после перезапуска)" if key in RESTART_REQUIRED else ""
+            print(f"[INFO] Настройка {key} = {values[key]!r}{note}")
+        for callback in self.subscribers:
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"[WARNING] Ошибка при применении настроек: {e}")
+        return True
+
+    def reload_if_changed(self):
+        """Перечитать настройки, если файл изменился с последней загрузки"""
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime == self.file_mtime:
+            return False
+        return self.reload()
+
+    def describe(self):
+        """Текущие значения с описаниями для вывода в консоль"""
+        lines = []
+        for key, (value_type, default, env_name, check, description) in SETTINGS.items():
+            marker = "" if self.values[key] == default else " *"
+            lines.append(f"{key} = {self.values[key]!r}{marker}  # {description} [{env_name}]")
+        return "\n".join(lines)
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def configure(path=None, overrides=None):
+    """
+    Загрузить настройки при запуске приложения
+
+    Raises:
+        ValueError: В настройках есть ошибки
+    """
+    global _current
+    settings = Settings(path, overrides)
+    with _current_lock:
+        _current = settings
+    return settings
+
+
+def get_settings():
+    """Текущие настройки (при первом обращении загружаются из файла и окружения)"""
+    global _current
+    with _current_lock:
+        if _current is None:
+            _current = Settings()
+        return _current
+
+
+def add_arguments(parser):
+    """Добавить в argparse параметры --settings, --set и --profile"""
+    parser.add_argument("--settings", help="Файл настроек JSON (по умолчанию settings.json или APP_SETTINGS)")
+    parser.add_argument("--set", action="append", metavar="КЛЮЧ=ЗНАЧЕНИЕ",
+                        help="Переопределить настройку, например --set recording.rate=16000")
+    parser.add_argument("--profile", action="store_true",
+                        help="Включить профилирование (то же, что --set profiling.enabled=true)")
+
+
+def configure_from_args(args):
+    """Загрузить настройки по параметрам, добавленным add_arguments"""
+    overrides = parse_overrides(args.set)
+    if args.profile:
+        overrides["profiling.enabled"] = "true"
+    return configure(args.settings, overrides)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка и вывод настроек приложения")
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        settings = configure_from_args(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    print(settings.describe())
+
+
+if __name__ == "__main__":
+    main()
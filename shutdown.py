@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+
+class ShutdownCoordinator:
+    """
+    Учет незавершенной работы и упорядоченное завершение приложения
+
+    Каждая запись, которая еще не распознана или чей результат не сохранен в CSV,
+    хранится как задача в JSON файле. Файл обновляется при каждом изменении задачи,
+    поэтому после закрытия приложения (или аварийного завершения) задачи можно
+    продолжить при следующем запуске.
+
+    Завершение работы выполняется в фоновом потоке: окно остается отзывчивым,
+    пока дописывается WAV и завершаются уже отправленные запросы.
+    """
+
+    def __init__(self, state_path="pending_jobs.json", grace_seconds=None, cancel_event=None):
+        """
+        Args:
+            state_path (str): Файл с незавершенными задачами
+            grace_seconds (float, optional): Сколько ждать завершения начатой работы при выходе
+                (по умолчанию - переменная APP_SHUTDOWN_GRACE_SECONDS или 20 секунд)
+            cancel_event (threading.Event, optional): Событие, по которому длительные операции
+                прекращают работу в ближайшей контрольной точке
+        """
+        self.state_path = state_path
+        if grace_seconds is None:
+            grace_seconds = float(os.getenv("APP_SHUTDOWN_GRACE_SECONDS", "20"))
+        self.grace_seconds = grace_seconds
+        self.cancel_event = cancel_event or threading.Event()
+        self.lock = threading.Lock()
+        self.deadline = None
+        self.thread = None
+        self.jobs = self._load()
+
+        if self.jobs:
+            print(f"[INFO] Найдено незавершенных задач с прошлого запуска: {len(self.jobs)}")
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Не удалось прочитать файл задач {self.state_path}: {e}")
+            return {}
+
+    def _save(self):
+        # Пишем через временный файл, чтобы сбой не оставил поврежденное состояние
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def add_job(self, kind, **payload):
+        """
+        Зарегистрировать незавершенную задачу
+
+        Args:
+            kind (str): Тип задачи: "transcription" - запись ждет распознавания,
+                "transcript" - результат распознан, но не сохранен в CSV
+            **payload: Данные, необходимые для продолжения задачи
+
+        Returns:
+            str: Идентификатор задачи
+        """
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = dict(payload, kind=kind, created=time.time())
+            self._save()
+        return job_id
+
+    def update_job(self, job_id, **payload):
+        """Обновить данные задачи (например, сменить тип после распознавания)"""
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(payload)
+                self._save()
+
+    def finish_job(self, job_id):
+        """Удалить выполненную задачу"""
+        with self.lock:
+            if self.jobs.pop(job_id, None) is not None:
+                self._save()
+
+    def pending_jobs(self, kind=None):
+        """
+        Незавершенные задачи в порядке создания
+
+        Returns:
+            list: Кортежи (идентификатор, данные задачи)
+        """
+        with self.lock:
+            jobs = [(job_id, dict(job)) for job_id, job in self.jobs.items()
+                    if kind is None or job["kind"] == kind]
+        return sorted(jobs, key=lambda item: item[1]["created"])
+
+    @property
+    def is_shutting_down(self):
+        return self.cancel_event.is_set()
+
+    def remaining(self):
+        """Сколько секунд осталось до окончания ожидания при выходе"""
+        if self.deadline is None:
+            return self.grace_seconds
+        return max(0.0, self.deadline - time.time())
+
+    def shutdown(self, steps, on_progress=None, on_done=None):
+        """
+        Завершить работу в фоновом потоке
+
+        Сначала выставляется событие отмены, чтобы длительные операции не начинали
+        новую работу, затем по очереди выполняются шаги. Ошибка одного шага не
+        мешает выполнению остальных.
+
+        Args:
+            steps (list): Пары (описание для пользователя, функция без аргументов)
+            on_progress (callable, optional): Вызывается с описанием каждого шага
+            on_done (callable, optional): Вызывается после выполнения всех шагов
+        """
+        if self.thread is not None:
+            return
+
+        self.cancel_event.set()
+        self.deadline = time.time() + self.grace_seconds
+        self.thread = threading.Thread(target=self._run_steps, args=(steps, on_progress, on_done))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run_steps(self, steps, on_progress, on_done):
+        start_time = time.time()
+        for description, step in steps:
+            print(f"[INFO] Завершение работы: {description}")
+            if on_progress:
+                on_progress(description)
+            try:
+                step()
+            except Exception as e:
+                print(f"[ERROR] Ошибка при завершении работы ({description}): {e}")
+                import traceback
+                traceback.print_exc()
+
+        with self.lock:
+            if self.jobs:
+                print(f"[INFO] Незавершенные задачи сохранены в {self.state_path}: {len(self.jobs)}")
+
+        print(f"[INFO] Завершение работы выполнено за {time.time() - start_time:.2f} секунд")
+        if on_done:
+            on_done()
@@ -0,0 +1,388 @@
+import os
+import re
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta
+
+from settings import get_settings, add_arguments, configure_from_args
+
+# Кодеки для архивного хранения: FLAC - без потерь, Opus - компактнее для речи
+CODECS = {
+    "flac": {"extension": ".flac", "args": ["-c:a", "flac", "-compression_level", "8"]},
+    "opus": {"extension": ".opus", "args": ["-c:a", "libopus", "-b:a", "24k", "-application", "voip"]}
+}
+
+# Суффиксы файлов одной записи: сегменты, устройства и каналы
+SESSION_SUFFIX_PATTERN = re.compile(r"(_part\d+|_dev\d+|_ch\d+)+$")
+
+# Время записи в имени файла recording_YYYYMMDD_HHMMSS
+TIMESTAMP_PATTERN = re.compile(r"(\d{8}_\d{6})")
+
+# Файлы моложе этого возраста (в секундах) не трогаем: они могут еще записываться или обрабатываться
+MIN_AGE_SECONDS = 3600
+
+
+def session_of(file_name):
+    """
+    Ключ записи, к которой относится файл
+
+    Сегменты, дорожки устройств и каналы одной записи (recording_X_part001.wav,
+    recording_X_dev2.wav, recording_X_ch1.wav) получают общий ключ recording_X.
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return SESSION_SUFFIX_PATTERN.sub("", stem)
+
+
+def recorded_at(path):
+    """Время записи по имени файла или, если его там нет, по времени изменения"""
+    match = TIMESTAMP_PATTERN.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+def _low_priority(command):
+    """
+    Команда и параметры запуска ffmpeg с пониженным приоритетом, чтобы не мешать записи
+
+    preexec_fn не используется: в процессе работают потоки записи и транскрибации,
+    а функция между fork и exec может заблокировать дочерний процесс.
+
+    Returns:
+        tuple: (команда, параметры subprocess.run)
+    """
+    if sys.platform == "win32":
+        return command, {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    if shutil.which("nice"):
+        return ["nice", "-n", "10"] + command, {}
+    return command, {}
+
+
+def transcode(source_path, target_path, codec="flac"):
+    """
+    Перекодировать аудиофайл через ffmpeg без загрузки в память
+
+    Файл сначала пишется во временный, затем переименовывается, поэтому при сбое
+    не остается оборванного архива.
+
+    Args:
+        source_path (str): Исходный файл
+        target_path (str): Итоговый файл
+        codec (str): Ключ из CODECS
+    """
+    temp_path = target_path + ".tmp"
+    command = ["ffmpeg", "-nostdin", "-y", "-loglevel", "error", "-i", source_path]
+    command += CODECS[codec]["args"] + ["-f", "flac" if codec == "flac" else "ogg", temp_path]
+    command, options = _low_priority(command)
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **options)
+        if os.path.getsize(temp_path) == 0:
+            raise RuntimeError(f"ffmpeg создал пустой файл {temp_path}")
+        os.replace(temp_path, target_path)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Ошибка ffmpeg: {e.stderr.decode(errors='replace').strip()}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class RecordingStore:
+    """
+    Архив записей с индексом по ID переговора
+
+    Новые записи лежат в корне папки recordings/. После сохранения результата в CSV
+    запись регистрируется в индексе, а фоновое обслуживание перекодирует ее в FLAC
+    или Opus и переносит в подпапку по дате (recordings/ГГГГ/ММ/ДД/). Индекс в SQLite
+    позволяет найти файлы переговора без обхода каталогов.
+    """
+
+    def __init__(self, recordings_dir="recordings", codec=None, retention_days=None, index_path=None):
+        """
+        Args:
+            recordings_dir (str): Папка с записями
+            codec (str, optional): "flac" или "opus" (по умолчанию - настройка storage.codec)
+            retention_days (int, optional): Через сколько дней удалять архивные записи
+                (по умолчанию - настройка storage.retention_days, 0 - хранить всегда)
+            index_path (str, optional): Файл индекса (по умолчанию recordings/recordings.sqlite)
+        """
+        self.recordings_dir = recordings_dir
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"Неизвестный кодек архива: {codec}. Допустимые: {', '.join(CODECS)}")
+        # Явно переданные значения имеют приоритет над настройками, которые можно менять во время работы
+        self.codec_override = codec
+        self.retention_override = retention_days
+        os.makedirs(recordings_dir, exist_ok=True)
+
+        self.index_path = index_path or os.path.join(recordings_dir, "recordings.sqlite")
+        self.lock = threading.Lock()
+        # Индекс используется из потока интерфейса и фонового обслуживания, доступ защищен блокировкой
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session TEXT PRIMARY KEY, conversation_id TEXT, manager TEXT, transcribed_at REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS sessions_conversation ON sessions (conversation_id)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "name TEXT PRIMARY KEY, session TEXT, path TEXT, recorded_at REAL, size INTEGER, "
+                "original_size INTEGER, compacted_at REAL, deleted_at REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS files_session ON files (session)")
+
+    @property
+    def codec(self):
+        return self.codec_override or get_settings()["storage.codec"]
+
+    @property
+    def retention_days(self):
+        if self.retention_override is not None:
+            return self.retention_override
+        return get_settings()["storage.retention_days"]
+
+    def register(self, audio_files, conversation_id, manager=""):
+        """
+        Отметить записи как распознанные и сохраненные, чтобы их можно было архивировать
+
+        Достаточно передать любой файл записи: сегменты, дорожки и каналы той же записи
+        определяются по имени.
+
+        Args:
+            audio_files (list): Пути к файлам записи
+            conversation_id (str): ID переговора
+            manager (str): Имя менеджера
+        """
+        sessions = {session_of(path) for path in audio_files if path}
+        now = time.time()
+        with self.lock, self.connection:
+            for session in sessions:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO sessions (session, conversation_id, manager, transcribed_at) "
+                    "VALUES (?, ?, ?, ?)", (session, conversation_id, manager, now)
+                )
+
+    def find(self, conversation_id):
+        """
+        Найти файлы записей переговора
+
+        Args:
+            conversation_id (str): ID переговора
+
+        Returns:
+            list: Пути к существующим файлам (архивным и еще не перенесенным)
+        """
+        with self.lock:
+            sessions = [row[0] for row in self.connection.execute(
+                "SELECT session FROM sessions WHERE conversation_id = ?", (conversation_id,)
+            )]
+            paths = []
+            for session in sessions:
+                archived = [row[0] for row in self.connection.execute(
+                    "SELECT path FROM files WHERE session = ? AND deleted_at IS NULL ORDER BY name", (session,)
+                )]
+                paths.extend(archived)
+                if not archived:
+                    # Запись еще не архивирована и лежит в корне папки
+                    paths.extend(self._loose_files(session))
+        return [path for path in paths if os.path.exists(path)]
+
+    def _loose_files(self, session):
+        """Файлы записи в корне папки recordings"""
+        result = []
+        with os.scandir(self.recordings_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".wav") and session_of(entry.name) == session:
+                    result.append(entry.path)
+        return sorted(result)
+
+    def _shard_dir(self, moment):
+        return os.path.join(self.recordings_dir, moment.strftime("%Y"), moment.strftime("%m"), moment.strftime("%d"))
+
+    def _registered_sessions(self):
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT session FROM sessions")}
+
+    def compact(self, stop_event=None, min_age=MIN_AGE_SECONDS):
+        """
+        Перекодировать и перенести по датам распознанные записи из корня папки
+
+        Args:
+            stop_event (threading.Event, optional): Прервать работу между файлами
+            min_age (float): Минимальный возраст файла в секундах
+
+        Returns:
+            dict: {"files": число архивированных файлов, "saved_bytes": освобожденное место}
+        """
+        sessions = self._registered_sessions()
+        now = time.time()
+        candidates = []
+        with os.scandir(self.recordings_dir) as entries:
+            for entry in entries:
+                if (entry.is_file() and entry.name.endswith(".wav") and session_of(entry.name) in sessions
+                        and now - entry.stat().st_mtime >= min_age):
+                    candidates.append(entry.path)
+
+        archived = 0
+        saved_bytes = 0
+        for source_path in sorted(candidates):
+            if stop_event is not None and stop_event.is_set():
+                break
+            try:
+                saved_bytes += self._compact_file(source_path)
+                archived += 1
+            except Exception as e:
+                print(f"[WARNING] Не удалось архивировать {source_path}: {e}")
+
+        if archived:
+            print(f"[INFO] Архивировано записей: {archived}, освобождено {saved_bytes / (1024 * 1024):.1f} МБ")
+        return {"files": archived, "saved_bytes": saved_bytes}
+
+    def _compact_file(self, source_path):
+        """Архивировать один файл, вернуть освобожденное место в байтах"""
+        moment = recorded_at(source_path)
+        target_dir = self._shard_dir(moment)
+        os.makedirs(target_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        codec = self.codec
+        target_path = os.path.join(target_dir, name + CODECS[codec]["extension"])
+
+        original_size = os.path.getsize(source_path)
+        transcode(source_path, target_path, codec)
+        size = os.path.getsize(target_path)
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files "
+                "(name, session, path, recorded_at, size, original_size, compacted_at, deleted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULL)",
+                (name, session_of(name), target_path, moment.timestamp(), size, original_size, time.time())
+            )
+        # Исходный файл удаляем только после записи архива и индекса
+        os.remove(source_path)
+        return original_size - size
+
+    def apply_retention(self, stop_event=None):
+        """
+        Удалить архивные записи старше срока хранения
+
+        Returns:
+            int: Количество удаленных файлов
+        """
+        retention_days = self.retention_days
+        if not retention_days:
+            return 0
+        border = (datetime.now() - timedelta(days=retention_days)).timestamp()
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, path FROM files WHERE deleted_at IS NULL AND recorded_at < ?", (border,)
+            ).fetchall()
+
+        deleted = 0
+        for name, path in rows:
+            if stop_event is not None and stop_event.is_set():
+                break
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                with self.lock, self.connection:
+                    self.connection.execute("UPDATE files SET deleted_at = ? WHERE name = ?", (time.time(), name))
+                deleted += 1
+            except OSError as e:
+                print(f"[WARNING] Не удалось удалить {path}: {e}")
+
+        if deleted:
+            print(f"[INFO] По сроку хранения ({retention_days} дн.) удалено записей: {deleted}")
+        return deleted
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class StorageMaintenance:
+    """Периодическое архивирование и удаление старых записей в фоновом потоке"""
+
+    def __init__(self, store, interval=None):
+        """
+        Args:
+            store (RecordingStore): Архив записей
+            interval (float, optional): Пауза между запусками в секундах
+                (по умолчанию - настройка storage.maintenance_interval)
+        """
+        self.store = store
+        self.interval_override = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def interval(self):
+        return self.interval_override or get_settings()["storage.maintenance_interval"]
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        self.thread = threading.Thread(target=self._run, name="storage-maintenance")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def _run(self):
+        # Первый запуск откладываем, чтобы не конкурировать с загрузкой приложения
+        delay = min(60.0, self.interval)
+        while not self.stop_event.wait(delay):
+            self.run_once()
+            delay = self.interval
+
+    def run_once(self):
+        """Выполнить одно обслуживание: архивирование и удаление по сроку хранения"""
+        try:
+            self.store.compact(stop_event=self.stop_event)
+            self.store.apply_retention(stop_event=self.stop_event)
+        except Exception as e:
+            print(f"[ERROR] Ошибка обслуживания папки записей: {e}")
+
+    def stop(self, timeout=None):
+        """Остановить обслуживание после обработки текущего файла"""
+        self.stop_event.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архивирование и поиск записей переговоров")
+    parser.add_argument("--dir", default="recordings", help="Папка с записями")
+    parser.add_argument("--codec", choices=sorted(CODECS), help="Кодек архива")
+    parser.add_argument("--retention-days", type=int, help="Удалять архивные записи старше N дней")
+    parser.add_argument("--find", metavar="ID", help="Показать файлы переговора с указанным ID")
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        configure_from_args(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    store = RecordingStore(args.dir, codec=args.codec, retention_days=args.retention_days)
+    try:
+        if args.find:
+            for path in store.find(args.find):
+                print(path)
+            return
+        store.compact()
+        store.apply_retention()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
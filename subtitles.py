@@ -0,0 +1,98 @@
+import os
+import json
+
+# Поддерживаемые форматы файлов с таймкодами
+SUPPORTED_FORMATS = ("srt", "vtt", "jsonl")
+
+
+def format_timestamp(seconds, separator=","):
+    """
+    Отформатировать время в виде ЧЧ:ММ:СС,ммм
+
+    Args:
+        seconds (float): Время от начала записи в секундах
+        separator (str): Разделитель миллисекунд ("," для SRT, "." для VTT)
+
+    Returns:
+        str: Отформатированное время
+    """
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+
+def _segment_text(segment):
+    """Текст сегмента с подписью говорящего, если она есть"""
+    text = segment["text"].strip()
+    if segment.get("speaker"):
+        return f"{segment['speaker']}: {text}"
+    return text
+
+
+def write_srt(segments, file_path):
+    """Записать сегменты в формате SRT"""
+    with open(file_path, "w", encoding="utf-8") as f:
+        for number, segment in enumerate(segments, start=1):
+            f.write(f"{number}\n")
+            f.write(f"{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}\n")
+            f.write(f"{_segment_text(segment)}\n\n")
+    return file_path
+
+
+def write_vtt(segments, file_path):
+    """Записать сегменты в формате WebVTT"""
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n")
+        for segment in segments:
+            f.write(f"{format_timestamp(segment['start'], '.')} --> {format_timestamp(segment['end'], '.')}\n")
+            f.write(f"{_segment_text(segment)}\n\n")
+    return file_path
+
+
+def write_jsonl(segments, file_path):
+    """Записать сегменты в формате JSON Lines (одна строка на сегмент)"""
+    with open(file_path, "w", encoding="utf-8") as f:
+        for segment in segments:
+            record = {
+                "start": round(segment["start"], 3),
+                "end": round(segment["end"], 3),
+                "text": segment["text"].strip()
+            }
+            if segment.get("speaker"):
+                record["speaker"] = segment["speaker"]
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return file_path
+
+
+WRITERS = {
+    "srt": write_srt,
+    "vtt": write_vtt,
+    "jsonl": write_jsonl
+}
+
+
+def write_segments(segments, base_path, formats=("srt", "jsonl")):
+    """
+    Сохранить сегменты с таймкодами рядом с аудиофайлом
+
+    Args:
+        segments (list): Сегменты вида {"start": сек, "end": сек, "text": str}
+        base_path (str): Путь к файлу без расширения (например, путь к записи без .wav)
+        formats (tuple): Форматы для сохранения из SUPPORTED_FORMATS
+
+    Returns:
+        dict: Формат -> путь к сохраненному файлу
+    """
+    directory = os.path.dirname(base_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    paths = {}
+    for fmt in formats:
+        if fmt not in WRITERS:
+            raise ValueError(f"Неподдерживаемый формат таймкодов: {fmt}")
+        paths[fmt] = WRITERS[fmt](segments, f"{base_path}.{fmt}")
+        print(f"[INFO] Таймкоды сохранены в {paths[fmt]}")
+    return paths
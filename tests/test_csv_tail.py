@@ -0,0 +1,73 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from csv_tail import CSVTail
+
+
+class CSVTailTest(unittest.TestCase):
+    """Чтение строк CSV от сохраненного смещения"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, "results.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _append(self, data):
+        with open(self.csv_path, "ab") as f:
+            f.write(data.encode("utf-8"))
+
+    def _read(self, offset):
+        tail = CSVTail(self.csv_path, offset)
+        return list(tail), tail
+
+    def test_headers_and_bom(self):
+        self._append("\ufeffИмя,ID\r\nИванов,1\r\n")
+        rows, tail = self._read(0)
+        self.assertEqual(tail.headers, ["Имя", "ID"])
+        self.assertEqual(rows, [["Иванов", "1"]])
+        self.assertEqual(tail.end_offset, os.path.getsize(self.csv_path))
+
+    def test_incremental_read(self):
+        self._append("Имя,ID\r\nИванов,1\r\n")
+        _, tail = self._read(0)
+        self._append("Петров,2\r\n")
+        rows, next_tail = self._read(tail.end_offset)
+        self.assertEqual(rows, [["Петров", "2"]])
+        self.assertIsNone(next_tail.headers)
+
+    def test_partial_row_is_read_after_completion(self):
+        self._append("Имя,ID\r\nИванов,1\r\nПетр")
+        rows, tail = self._read(0)
+        self.assertEqual(rows, [["Иванов", "1"]])
+        self.assertEqual(tail.end_offset, len("Имя,ID\r\nИванов,1\r\n".encode("utf-8")))
+
+        self._append("ов,2\r\n")
+        rows, tail = self._read(tail.end_offset)
+        self.assertEqual(rows, [["Петров", "2"]])
+        self.assertEqual(tail.end_offset, os.path.getsize(self.csv_path))
+
+    def test_line_break_inside_quotes(self):
+        self._append('Имя,Резюме\r\nИванов,"первая строка\r\n')
+        rows, tail = self._read(0)
+        self.assertEqual(rows, [])
+
+        self._append('вторая ""строка""",\r\n')
+        rows, tail = self._read(tail.end_offset)
+        self.assertEqual(rows, [["Иванов", 'первая строка\r\nвторая "строка"', ""]])
+        self.assertEqual(tail.end_offset, os.path.getsize(self.csv_path))
+
+    def test_partial_header(self):
+        self._append("Имя,I")
+        rows, tail = self._read(0)
+        self.assertEqual((rows, tail.headers, tail.end_offset), ([], None, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
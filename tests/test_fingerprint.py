@@ -0,0 +1,98 @@
+import os
+import sys
+import wave
+import shutil
+import struct
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fingerprint import audio_fingerprint, TranscriptCache
+
+SAMPLES = struct.pack("<8h", 0, 1200, -1200, 3000, -3000, 150, -150, 0) * 500
+
+
+def write_wav(path, data=SAMPLES, sample_rate=16000):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(data)
+
+
+def write_wav_with_list(path, data=SAMPLES, sample_rate=16000):
+    """Записать WAV со служебным блоком LIST между fmt и data"""
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    info = b"INFOISFT" + struct.pack("<I", 6) + b"editor"
+    chunks = (b"fmt " + struct.pack("<I", len(fmt)) + fmt
+              + b"LIST" + struct.pack("<I", len(info)) + info
+              + b"data" + struct.pack("<I", len(data)) + data)
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks)
+
+
+class AudioFingerprintTest(unittest.TestCase):
+    """Отпечаток зависит только от формата и отсчетов аудио"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_same_audio_under_other_name(self):
+        write_wav(self._path("call.wav"))
+        write_wav(self._path("copy.wav"))
+        self.assertEqual(audio_fingerprint(self._path("call.wav")), audio_fingerprint(self._path("copy.wav")))
+
+    def test_header_chunks_are_ignored(self):
+        write_wav(self._path("call.wav"))
+        write_wav_with_list(self._path("edited.wav"))
+        self.assertEqual(audio_fingerprint(self._path("call.wav")), audio_fingerprint(self._path("edited.wav")))
+
+    def test_samples_and_format_change_fingerprint(self):
+        write_wav(self._path("call.wav"))
+        write_wav(self._path("other.wav"), data=SAMPLES[:-2] + b"\x01\x00")
+        write_wav(self._path("fast.wav"), sample_rate=8000)
+        fingerprints = {audio_fingerprint(self._path(name)) for name in ("call.wav", "other.wav", "fast.wav")}
+        self.assertEqual(len(fingerprints), 3)
+
+    def test_other_formats_are_hashed_whole(self):
+        with open(self._path("call.mp3"), "wb") as f:
+            f.write(b"ID3" + bytes(100))
+        fingerprint = audio_fingerprint(self._path("call.mp3"))
+        self.assertEqual(fingerprint, audio_fingerprint(self._path("call.mp3")))
+        with open(self._path("call.mp3"), "ab") as f:
+            f.write(b"\x00")
+        self.assertNotEqual(fingerprint, audio_fingerprint(self._path("call.mp3")))
+
+
+class TranscriptCacheTest(unittest.TestCase):
+    """Сохраненный результат находится по отпечатку записи"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = TranscriptCache(os.path.join(self.directory, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_renamed_file_hits_cache(self):
+        first = os.path.join(self.directory, "call.wav")
+        second = os.path.join(self.directory, "renamed.wav")
+        write_wav(first)
+        write_wav_with_list(second)
+        result = {"text": "добрый день", "segments": [{"start": 0.0, "end": 1.0, "text": "добрый день"}],
+                  "error": None}
+        self.cache.store(self.cache.fingerprint(first), result, language="ru")
+        self.assertEqual(self.cache.lookup(self.cache.fingerprint(second), language="ru"), result)
+        self.assertIsNone(self.cache.lookup(self.cache.fingerprint(second), language="en"))
+
+
+if __name__ == "__main__":
+    unittest.main()
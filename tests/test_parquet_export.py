@@ -0,0 +1,89 @@
+import os
+import csv
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parquet_export import ParquetExporter, STATE_FILE, pq
+
+HEADERS = ["Имя менеджера", "Дата", "ID", "Резюме", "Таймкоды",
+           "Оплачено, сек", "Запросов", "Отправлено, байт", "Стоимость, $"]
+
+
+@unittest.skipIf(pq is None, "pyarrow не установлен")
+class ParquetExporterSyncTest(unittest.TestCase):
+    """Инкрементальный экспорт CSV в Parquet"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, "results.csv")
+        self.dataset_dir = os.path.join(self.directory, "export")
+        self._write_rows([HEADERS,
+                          ["Иванов", "2024-05-02", "1", "Обсудили договор", "", "120", "2", "480000", "0.0120"],
+                          ["Петров", "2024-06-10", "2", "Согласовали сроки", "", "", "", "", ""]])
+        self.exporter = ParquetExporter(self.csv_path, self.dataset_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_rows(self, rows, mode="w"):
+        with open(self.csv_path, mode, newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+
+    def _read(self):
+        table = pq.read_table(self.dataset_dir, partitioning="hive")
+        return sorted(table.to_pylist(), key=lambda row: row["row"])
+
+    def _state(self):
+        with open(os.path.join(self.dataset_dir, STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_incremental_sync(self):
+        self.assertEqual(self.exporter.sync(), 2)
+        self.assertEqual(self._state()["offset"], os.path.getsize(self.csv_path))
+        self.assertEqual(self.exporter.sync(), 0)
+
+        self._write_rows([["Иванов", "2024-06-11", "3", "Подписали договор", "", "60", "1", "240000", "0.0060"]],
+                         mode="a")
+        self.assertEqual(self.exporter.sync(), 1)
+        rows = self._read()
+        self.assertEqual([row["row"] for row in rows], [1, 2, 3])
+        self.assertEqual([row["conversation_id"] for row in rows], ["1", "2", "3"])
+        self.assertEqual(self._state()["rows"], 3)
+
+    def test_partial_row_waits_for_completion(self):
+        self.exporter.sync()
+        offset = self._state()["offset"]
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+            f.write("Сидоров,2024-06-12,4,Перенесли встр")
+        self.assertEqual(self.exporter.sync(), 0)
+        self.assertEqual(self._state()["offset"], offset)
+
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+            f.write("ечу,,,,,\r\n")
+        self.assertEqual(self.exporter.sync(), 1)
+        self.assertEqual(self._read()[-1]["summary"], "Перенесли встречу")
+
+    def test_usage_columns_are_numeric(self):
+        self.exporter.sync()
+        first, second = self._read()
+        self.assertEqual((first["billed_seconds"], first["requests"], first["bytes_uploaded"], first["cost_usd"]),
+                         (120.0, 2, 480000, 0.012))
+        self.assertEqual((second["billed_seconds"], second["requests"], second["cost_usd"]), (None, None, None))
+
+    def test_old_dataset_is_exported_again(self):
+        self.exporter.sync()
+        state = self._state()
+        del state["version"]
+        with open(os.path.join(self.dataset_dir, STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        self.assertEqual(self.exporter.sync(), 2)
+        self.assertEqual(len(self._read()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import os
+import sys
+import math
+import wave
+import struct
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessor import iter_audio_chunks, speech_intervals, remove_pauses, restore_time
+
+
+def write_wav(path, seconds, sample_rate=16000, channels=1, amplitude=8000):
+    """Записать 16-битный WAV с тоном 440 Гц (amplitude=0 - тишина)"""
+    write_pieces(path, [(seconds, amplitude)], sample_rate, channels)
+
+
+def write_pieces(path, pieces, sample_rate=16000, channels=1):
+    """Записать WAV из частей (длительность в секундах, амплитуда тона)"""
+    frames = []
+    for seconds, amplitude in pieces:
+        for number in range(int(seconds * sample_rate)):
+            value = int(amplitude * math.sin(2 * math.pi * 440 * number / sample_rate))
+            frames.append(struct.pack("<" + "h" * channels, *([value] * channels)))
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"".join(frames))
+
+
+class IterAudioChunksTest(unittest.TestCase):
+    """Нарезка аудио на части с перекрытием и ограничением размера"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.audio_path = os.path.join(self.directory, "call.wav")
+        write_wav(self.audio_path, 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_chunks_overlap(self):
+        chunks = list(iter_audio_chunks(self.audio_path, max_duration=4000, overlap=1000))
+        self.assertEqual([(chunk["start"], chunk["end"]) for chunk in chunks],
+                         [(0, 4000), (3000, 7000), (6000, 10000)])
+        self.assertEqual([chunk["index"] for chunk in chunks], [1, 2, 3])
+        self.assertEqual(chunks[0]["name"], "chunk_1.wav")
+
+    def test_chunk_is_encoded_wav(self):
+        chunk = next(iter_audio_chunks(self.audio_path, max_duration=4000))
+        with wave.open(io.BytesIO(chunk["data"])) as wf:
+            self.assertEqual(wf.getframerate(), 16000)
+            self.assertEqual(wf.getnframes(), 4 * 16000)
+
+    def test_stereo_is_downmixed_and_resampled(self):
+        write_wav(self.audio_path, 2, sample_rate=44100, channels=2)
+        chunk = next(iter_audio_chunks(self.audio_path, max_duration=4000))
+        with wave.open(io.BytesIO(chunk["data"])) as wf:
+            self.assertEqual((wf.getnchannels(), wf.getframerate()), (1, 16000))
+
+    def test_chunks_shrink_to_max_bytes(self):
+        # 4 секунды моно 16 кГц занимают 128 000 байт данных
+        chunks = list(iter_audio_chunks(self.audio_path, max_duration=4000, overlap=1000, max_bytes=100000))
+        self.assertTrue(all(len(chunk["data"]) <= 100000 for chunk in chunks))
+        self.assertTrue(all(chunk["end"] - chunk["start"] < 4000 for chunk in chunks))
+        self.assertEqual(chunks[-1]["end"], 10000)
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertEqual(previous["end"] - current["start"], 1000)
+
+    def test_no_size_limit(self):
+        chunks = list(iter_audio_chunks(self.audio_path, max_duration=10000, max_bytes=None))
+        self.assertEqual(len(chunks), 1)
+
+    def test_silence_is_not_encoded(self):
+        write_wav(self.audio_path, 3, amplitude=0)
+        chunks = list(iter_audio_chunks(self.audio_path, max_duration=2000))
+        self.assertEqual([chunk["silent"] for chunk in chunks], [True, True])
+        self.assertIsNone(chunks[0]["data"])
+
+    def test_overlap_must_be_shorter_than_chunk(self):
+        with self.assertRaises(ValueError):
+            list(iter_audio_chunks(self.audio_path, max_duration=1000, overlap=1000))
+
+
+class SpeechIntervalsTest(unittest.TestCase):
+    """Поиск участков речи между длинными паузами"""
+
+    def test_long_pause_is_cut_with_padding(self):
+        levels = [-20] * 10 + [-70] * 30 + [-20] * 10
+        intervals = speech_intervals(levels, min_pause=2.0, window=0.1, threshold=-45, padding=0.3)
+        self.assertEqual([(round(start, 6), round(end, 6)) for start, end in intervals], [(0.0, 1.3), (3.7, 5.0)])
+
+    def test_short_pause_is_kept(self):
+        levels = [-20] * 10 + [-70] * 15 + [-20] * 10
+        self.assertEqual(speech_intervals(levels, min_pause=2.0, window=0.1), [(0.0, 3.5)])
+
+    def test_edge_pauses_are_cut_completely(self):
+        levels = [-70] * 25 + [-20] * 10 + [-70] * 25
+        intervals = speech_intervals(levels, min_pause=2.0, window=0.1, padding=0.3)
+        self.assertEqual([(round(start, 6), round(end, 6)) for start, end in intervals], [(2.2, 3.8)])
+
+    def test_silence_only(self):
+        self.assertEqual(speech_intervals([-70] * 50, min_pause=2.0, window=0.1), [])
+
+
+class RemovePausesTest(unittest.TestCase):
+    """Копия записи без длинных пауз и обратный пересчет таймкодов"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.audio_path = os.path.join(self.directory, "call.wav")
+        self.output_path = os.path.join(self.directory, "trimmed.wav")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pauses_are_removed(self):
+        write_pieces(self.audio_path, [(1, 8000), (3, 0), (1, 8000), (0.5, 0), (1, 8000)])
+        time_map = remove_pauses(self.audio_path, self.output_path, min_pause=2.0)
+        with wave.open(self.output_path) as wf:
+            self.assertEqual((wf.getframerate(), wf.getnchannels()), (16000, 1))
+            trimmed_seconds = wf.getnframes() / 16000.0
+        # Из паузы в 3 секунды остается по 0.3 секунды у краев речи
+        self.assertAlmostEqual(trimmed_seconds, 6.5 - 2.4, places=2)
+        self.assertEqual(len(time_map), 2)
+
+        # Время во втором участке речи переводится обратно во время исходной записи
+        self.assertAlmostEqual(restore_time(time_map, 0.5), 0.5, places=2)
+        self.assertAlmostEqual(restore_time(time_map, 1.3 + 0.5), 3.7 + 0.5, places=2)
+
+    def test_nothing_to_remove(self):
+        write_pieces(self.audio_path, [(1, 8000), (1, 0), (1, 8000)])
+        self.assertIsNone(remove_pauses(self.audio_path, self.output_path, min_pause=2.0))
+        self.assertFalse(os.path.exists(self.output_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
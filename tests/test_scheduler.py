@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from scheduler import BackendStats
+
+
+class BackendStatsRecordTest(unittest.TestCase):
+    """Уточнение задержки и rtf по измерениям"""
+
+    def test_fit_separates_latency_and_rtf(self):
+        stats = BackendStats("openai", latency=2.0, rtf=0.05, max_concurrency=4)
+        for audio_seconds in (10, 300, 60, 120, 30, 240, 15):
+            stats.record(audio_seconds, 1.5 + 0.02 * audio_seconds)
+        self.assertAlmostEqual(stats.latency, 1.5, places=6)
+        self.assertAlmostEqual(stats.rtf, 0.02, places=6)
+
+    def test_equal_lengths_converge_to_measured_time(self):
+        stats = BackendStats("openai", latency=2.0, rtf=0.05, max_concurrency=4)
+        for _ in range(30):
+            stats.record(300, 9.0)
+        self.assertAlmostEqual(stats.latency + stats.rtf * 300, 9.0, places=3)
+        # Соотношение задержки и rtf не меняется, пока длительности не различаются
+        self.assertAlmostEqual(stats.latency / stats.rtf, 2.0 / 0.05)
+
+    def test_empty_audio_is_ignored(self):
+        stats = BackendStats("openai", latency=2.0, rtf=0.05, max_concurrency=4)
+        stats.record(0, 5.0)
+        self.assertEqual((stats.latency, stats.rtf, stats.samples), (2.0, 0.05, 0))
+
+    def test_estimates_stay_non_negative(self):
+        stats = BackendStats("openai", latency=2.0, rtf=0.05, max_concurrency=4)
+        for audio_seconds, elapsed in ((10, 5.0), (100, 4.0), (200, 3.0), (300, 2.0)):
+            stats.record(audio_seconds, elapsed)
+        self.assertGreaterEqual(stats.rtf, 0.0)
+        self.assertGreaterEqual(stats.latency, 0.0)
+
+
+class CpuAvailableTest(unittest.TestCase):
+    """Замер загрузки CPU не чаще раза в CPU_SAMPLE_INTERVAL"""
+
+    def test_sample_is_cached(self):
+        fake_psutil = mock.Mock()
+        fake_psutil.cpu_percent.return_value = 75.0
+        with mock.patch.object(scheduler, "psutil", fake_psutil), \
+                mock.patch.object(scheduler, "_cpu_sample", (0.0, None)):
+            self.assertEqual(scheduler.cpu_available(), 0.25)
+            self.assertEqual(scheduler.cpu_available(), 0.25)
+            self.assertEqual(scheduler.cpu_slowdown(), 4.0)
+        self.assertEqual(fake_psutil.cpu_percent.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import csv
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import TranscriptIndex
+
+
+class TranscriptIndexYoTest(unittest.TestCase):
+    """Поиск по тексту с буквой ё"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, "results.csv")
+        self._write_rows([["Имя менеджера", "Дата", "ID", "Резюме"],
+                          ["Иванов", "2024-01-01", "1", "Клиент купил ёлку к празднику"]])
+        self.index = TranscriptIndex(self.csv_path)
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def _write_rows(self, rows, mode="w"):
+        with open(self.csv_path, mode, newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+
+    def test_search_with_both_spellings(self):
+        self.index.sync()
+        self.assertEqual([result["row"] for result in self.index.search("ёлку")], [1])
+        self.assertEqual([result["row"] for result in self.index.search("елка")], [1])
+
+    def test_incremental_sync_normalizes_yo(self):
+        self.index.sync()
+        self._write_rows([["Петров", "2024-01-02", "2", "Обсудили счёт за поставку"]], mode="a")
+        self.index.sync()
+        self.assertEqual([result["row"] for result in self.index.search("счет")], [2])
+        self.assertEqual([result["row"] for result in self.index.search("счёт")], [2])
+
+    def test_row_written_in_parts_is_indexed(self):
+        self.index.sync()
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+            f.write("Петров,2024-01-02,2,Договор на пост")
+        self.index.sync()
+        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+            f.write("авку подписан\r\n")
+        self.index.sync()
+        self.assertEqual([result["row"] for result in self.index.search("поставку")], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
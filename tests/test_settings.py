@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from settings import Settings, convert, parse_overrides, SETTINGS
+
+
+class ConvertTest(unittest.TestCase):
+    """Приведение значений к типу настройки и проверка ограничений"""
+
+    def test_types(self):
+        self.assertEqual(convert("recording.rate", "16000"), 16000)
+        self.assertEqual(convert("transcription.chunk_minutes", "2.5"), 2.5)
+        self.assertEqual(convert("transcription.model", "whisper-1"), "whisper-1")
+
+    def test_bool_values(self):
+        for value in ("1", "true", "Yes", "on", "да", True):
+            self.assertIs(convert("cache.enabled", value), True)
+        for value in ("0", "false", "No", "off", "нет", False):
+            self.assertIs(convert("cache.enabled", value), False)
+        with self.assertRaises(ValueError):
+            convert("cache.enabled", "maybe")
+
+    def test_range(self):
+        self.assertEqual(convert("budget.economy_fraction", "1"), 1.0)
+        for value in ("1.5", "0"):
+            with self.assertRaises(ValueError):
+                convert("budget.economy_fraction", value)
+
+    def test_choices(self):
+        self.assertEqual(convert("transcription.backend", "auto"), "auto")
+        with self.assertRaises(ValueError):
+            convert("transcription.backend", "cloud")
+
+    def test_wrong_type(self):
+        with self.assertRaises(ValueError):
+            convert("budget.price_per_minute", "abc")
+
+    def test_parse_overrides(self):
+        self.assertEqual(parse_overrides(["recording.rate = 16000", "cache.path=a=b"]),
+                         {"recording.rate": "16000", "cache.path": "a=b"})
+        with self.assertRaises(ValueError):
+            parse_overrides(["recording.rate"])
+
+
+class SettingsLoadTest(unittest.TestCase):
+    """Приоритет источников: командная строка, окружение, файл, значения по умолчанию"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "settings.json")
+        # Переменные окружения тестового процесса не должны влиять на результат
+        environment = {name: value for name, value in os.environ.items()
+                       if name not in {spec[2] for spec in SETTINGS.values()}}
+        patcher = mock.patch.dict(os.environ, environment, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_defaults_without_file(self):
+        settings = Settings(self.path)
+        self.assertEqual(settings["recording.rate"], SETTINGS["recording.rate"][1])
+
+    def test_precedence(self):
+        self._write({"recording": {"rate": 22050, "chunk": 2048, "segment_minutes": 10}})
+        os.environ["RECORDING_CHUNK"] = "4096"
+        os.environ["RECORDING_SEGMENT_MINUTES"] = "20"
+        settings = Settings(self.path, overrides={"recording.segment_minutes": "40"})
+        self.assertEqual(settings["recording.rate"], 22050)
+        self.assertEqual(settings["recording.chunk"], 4096)
+        self.assertEqual(settings["recording.segment_minutes"], 40.0)
+
+    def test_empty_environment_value_is_ignored(self):
+        self._write({"recording": {"chunk": 2048}})
+        os.environ["RECORDING_CHUNK"] = ""
+        self.assertEqual(Settings(self.path)["recording.chunk"], 2048)
+
+    def test_all_errors_are_reported(self):
+        self._write({"recording": {"rate": 10}, "unknown": {"key": 1}})
+        with self.assertRaises(ValueError) as context:
+            Settings(self.path, overrides={"cache.enabled": "maybe"})
+        message = str(context.exception)
+        for key in ("recording.rate", "unknown.key", "cache.enabled"):
+            self.assertIn(key, message)
+
+    def test_reload_keeps_values_on_error(self):
+        self._write({"recording": {"chunk": 2048}})
+        settings = Settings(self.path)
+        changed = []
+        settings.subscribe(changed.append)
+
+        self._write({"recording": {"chunk": 1}})
+        self.assertFalse(settings.reload())
+        self.assertEqual(settings["recording.chunk"], 2048)
+
+        self._write({"recording": {"chunk": 512}})
+        self.assertTrue(settings.reload())
+        self.assertEqual(settings["recording.chunk"], 512)
+        self.assertEqual(changed, [{"recording.chunk"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcriber import merge_overlapping_text, overlap_window_words
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{number}" for number in range(count))
+
+
+class MergeOverlappingTextTest(unittest.TestCase):
+    """Склейка текстов соседних чанков с перекрытием"""
+
+    def test_overlap_is_kept_once(self):
+        merged = merge_overlapping_text("мы обсудили условия договора и сроки поставки",
+                                        "и сроки поставки товара на склад", 3000)
+        self.assertEqual(merged, "мы обсудили условия договора и сроки поставки товара на склад")
+
+    def test_punctuation_and_case_are_ignored(self):
+        merged = merge_overlapping_text("Отправим счет завтра утром.", "завтра утром, после обеда", 3000)
+        self.assertEqual(merged, "Отправим счет завтра утром. после обеда")
+
+    def test_cut_word_at_chunk_edge(self):
+        # Последнее слово предыдущего чанка обрезано границей и распознано неверно
+        merged = merge_overlapping_text("цена за единицу товара сост", "единицу товара составляет сто", 3000)
+        self.assertEqual(merged, "цена за единицу товара составляет сто")
+
+    def test_repeated_phrase_does_not_drop_text(self):
+        previous_text = f"да да конечно {words('w', 30)} ok then"
+        next_text = f"ok then {words('x', 20)} да да конечно продолжим"
+        for overlap in (1000, 3000, 30000):
+            with self.subTest(overlap=overlap):
+                merged = merge_overlapping_text(previous_text, next_text, overlap)
+                self.assertEqual(merged, f"да да конечно {words('w', 30)} ok then {words('x', 20)} да да конечно продолжим")
+
+    def test_no_overlap_joins_texts(self):
+        merged = merge_overlapping_text("первая часть разговора", "вторая часть беседы", 3000)
+        self.assertEqual(merged, "первая часть разговора вторая часть беседы")
+
+    def test_single_common_word_is_not_a_match(self):
+        merged = merge_overlapping_text("поговорили и", "и разошлись", 3000)
+        self.assertEqual(merged, "поговорили и и разошлись")
+
+    def test_empty_parts(self):
+        self.assertEqual(merge_overlapping_text("", " текст ", 3000), "текст")
+        self.assertEqual(merge_overlapping_text(" текст ", "", 3000), "текст")
+
+    def test_window_grows_with_overlap(self):
+        self.assertLess(overlap_window_words(1000), overlap_window_words(3000))
+        self.assertGreaterEqual(overlap_window_words(3000), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import usage
+from usage import UsageLedger, request_usage, BUDGET_OK, BUDGET_ECONOMY, BUDGET_EXCEEDED
+
+SETTINGS = {"budget.price_per_minute": 0.006, "budget.economy_fraction": 0.8}
+
+
+class RequestUsageTest(unittest.TestCase):
+    """Расход одного запроса"""
+
+    def setUp(self):
+        patcher = mock.patch.object(usage, "get_settings", return_value=SETTINGS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_paid_backend_rounds_up_to_second(self):
+        result = request_usage("openai", 59.2, 1000)
+        self.assertEqual((result["requests"], result["billed_seconds"], result["bytes"]), (1, 60.0, 1000))
+        self.assertAlmostEqual(result["cost"], 0.006)
+
+    def test_local_backend_is_free(self):
+        result = request_usage("local", 59.2, 1000)
+        self.assertEqual((result["billed_seconds"], result["cost"]), (0.0, 0.0))
+
+
+class BudgetStateTest(unittest.TestCase):
+    """Состояние бюджета по журналу расхода"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = dict(SETTINGS)
+        patcher = mock.patch.object(usage, "get_settings", return_value=self.settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Бюджет 10 минут в час; дневной не задан
+        self.ledger = UsageLedger(os.path.join(self.directory, "usage.sqlite"), daily_budget_minutes=0,
+                                  hourly_budget_minutes=10)
+
+    def tearDown(self):
+        self.ledger.close()
+        shutil.rmtree(self.directory)
+
+    def _spend(self, seconds):
+        self.ledger.record("openai", request_usage("openai", seconds, 0))
+
+    def test_states_follow_spent_seconds(self):
+        self.assertEqual(self.ledger.budget_state(), BUDGET_OK)
+        self._spend(400)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_OK)
+        self._spend(100)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_ECONOMY)
+        self._spend(100)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_ECONOMY)
+        self._spend(1)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_EXCEEDED)
+
+    def test_planned_request_is_counted(self):
+        self._spend(300)
+        self.assertEqual(self.ledger.budget_state(planned_seconds=100), BUDGET_OK)
+        self.assertEqual(self.ledger.budget_state(planned_seconds=200), BUDGET_ECONOMY)
+        self.assertEqual(self.ledger.budget_state(planned_seconds=301), BUDGET_EXCEEDED)
+
+    def test_economy_fraction_is_read_on_each_check(self):
+        self._spend(400)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_OK)
+        self.settings["budget.economy_fraction"] = 0.5
+        self.assertEqual(self.ledger.budget_state(), BUDGET_ECONOMY)
+
+    def test_old_requests_leave_hourly_window(self):
+        with mock.patch.object(usage.time, "time", return_value=time.time() - 3601):
+            self._spend(600)
+        self.assertEqual(self.ledger.budget_state(), BUDGET_OK)
+
+    def test_no_budget_is_always_ok(self):
+        ledger = UsageLedger(os.path.join(self.directory, "free.sqlite"), daily_budget_minutes=0,
+                             hourly_budget_minutes=0)
+        ledger.record("openai", request_usage("openai", 10 ** 6, 0))
+        self.assertEqual(ledger.budget_state(), BUDGET_OK)
+        ledger.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import wave
+import shutil
+import struct
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wav_writer import WavStreamWriter, repair_wav, repair_directory
+from wav_reader import WavReader
+
+FRAMES = struct.pack("<4h", 100, -100, 2000, -2000) * 1000
+
+
+class RepairWavTest(unittest.TestCase):
+    """Восстановление заголовка записи, оборванной аварийным завершением"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "recording.wav")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_crashed(self, tail=b""):
+        """Записать файл, процесс которого завершился после контрольной точки, не закрыв его"""
+        writer = WavStreamWriter(self.path, 2, 2, 16000, checkpoint_seconds=3600)
+        writer.write(FRAMES)
+        writer.checkpoint()
+        # Эти данные попали на диск, но размеры в заголовке остались прежними
+        writer.write(FRAMES + tail)
+        writer.file.close()
+
+    def test_truncated_file_is_repaired(self):
+        self._write_crashed()
+        self.assertTrue(repair_wav(self.path))
+        with wave.open(self.path) as wf:
+            self.assertEqual(wf.getnframes(), 2 * len(FRAMES) // 4)
+            self.assertEqual(wf.readframes(wf.getnframes()), FRAMES * 2)
+        self.assertFalse(repair_wav(self.path))
+
+    def test_partial_frame_is_dropped(self):
+        self._write_crashed(tail=b"\x01\x02\x03")
+        self.assertTrue(repair_wav(self.path))
+        self.assertEqual(os.path.getsize(self.path) % 2, 0)
+        with WavReader(self.path) as reader:
+            self.assertEqual(reader.frame_count, 2 * len(FRAMES) // 4)
+
+    def test_header_without_checkpoint(self):
+        # Запись оборвалась до первой контрольной точки: в заголовке нулевой размер данных
+        writer = WavStreamWriter(self.path, 2, 2, 16000, checkpoint_seconds=3600)
+        writer.write(FRAMES)
+        writer.file.close()
+        self.assertTrue(repair_wav(self.path))
+        with wave.open(self.path) as wf:
+            self.assertEqual(wf.getnframes(), len(FRAMES) // 4)
+
+    def test_complete_file_is_not_changed(self):
+        with WavStreamWriter(self.path, 2, 2, 16000) as writer:
+            writer.write(FRAMES)
+        with open(self.path, "rb") as f:
+            content = f.read()
+        self.assertFalse(repair_wav(self.path))
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_trailing_chunk_is_kept(self):
+        with wave.open(self.path, "wb") as wf:
+            wf.setnchannels(2)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(FRAMES)
+        info = b"INFOISFT" + struct.pack("<I", 6) + b"editor"
+        with open(self.path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            f.write(b"LIST" + struct.pack("<I", len(info)) + info)
+            riff_size = f.tell() - 8
+            f.seek(4)
+            f.write(struct.pack("<I", riff_size))
+        self.assertFalse(repair_wav(self.path))
+
+    def test_repair_directory(self):
+        self._write_crashed()
+        with WavStreamWriter(os.path.join(self.directory, "complete.wav"), 2, 2, 16000) as writer:
+            writer.write(FRAMES)
+        with open(os.path.join(self.directory, "notes.wav"), "wb") as f:
+            f.write(b"not a wav file")
+        self.assertEqual(repair_directory(self.directory), [self.path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,217 +1,910 @@
-import os
-import sys
-import time
-import math
-from openai import OpenAI
-from dotenv import load_dotenv
-from pydub import AudioSegment
-
-class WhisperTranscriber:
-    def __init__(self):
-        # Загружаем переменные окружения
-        load_dotenv()
-        
-        # Получаем API ключ из переменных окружения
-        api_key = os.getenv("OPENAI_API_KEY")
-        
-        if not api_key:
-            raise ValueError("API ключ OpenAI не найден. Убедитесь, что он указан в файле .env")
-        
-        # Создаем клиента OpenAI (только новая версия API 1.x)
-        self.client = OpenAI(api_key=api_key)
-        print("[INFO] Инициализирован клиент OpenAI API v1.x")
-    
-    def transcribe_audio(self, audio_file_path, language=None):
-        """
-        Транскрибировать аудиофайл с использованием Whisper API
-        
-        Args:
-            audio_file_path (str): Путь к аудиофайлу для транскрибации
-            language (str, optional): Код языка для транскрибации (например, "ru", "en", "kk")
-            
-        Returns:
-            str: Текст транскрибации
-        """
-        print(f"[INFO] Начало транскрибации файла: {audio_file_path}")
-        if language:
-            print(f"[INFO] Выбран язык для транскрибации: {language}")
-        else:
-            print(f"[INFO] Язык будет определен автоматически")
-            
-        start_time = time.time()
-        
-        try:
-            # Проверяем размер файла
-            file_size = os.path.getsize(audio_file_path) / (1024 * 1024)  # в МБ
-            print(f"[INFO] Размер файла: {file_size:.2f} МБ")
-            
-            # Если файл больше 25 МБ, используем метод с разбивкой на части
-            if file_size > 25:
-                print(f"[INFO] Файл превышает 25 МБ, используется метод разбиения на части")
-                return self.transcribe_audio_chunked(audio_file_path, language=language)
-            
-            print(f"[INFO] Отправка файла в Whisper API...")
-            
-            # Отправляем запрос в API
-            with open(audio_file_path, "rb") as audio_file:
-                # Создаем параметры для запроса
-                params = {
-                    "model": "whisper-1",
-                    "file": audio_file
-                }
-                
-                # Добавляем параметр языка, если он указан
-                if language:
-                    params["language"] = language
-                
-                # Отправляем запрос
-                response = self.client.audio.transcriptions.create(**params)
-                result = response.text
-            
-            elapsed_time = time.time() - start_time
-            print(f"[INFO] Транскрибация завершена за {elapsed_time:.2f} секунд")
-            print(f"[INFO] Результат: {result[:100]}...")
-            
-            return result
-        
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] Ошибка при транскрибации: {e}")
-            traceback.print_exc()
-            return f"Ошибка транскрибации: {str(e)}"
-    
-    def transcribe_audio_chunked(self, audio_path, language=None, max_duration=5 * 60 * 1000):
-        """
-        Функция для транскрибации аудиофайла на части, чтобы соответствовать ограничениям размера API.
-        
-        Args:
-            audio_path (str): Путь к аудиофайлу для транскрибации
-            language (str, optional): Код языка для транскрибации (например, "ru", "en", "kk")
-            max_duration (int): Максимальная длительность чанка в миллисекундах
-            
-        Returns:
-            str: Объединенный текст транскрибации всех частей
-        """
-        try:
-            print(f"[INFO] Начало транскрибации файла по частям: {audio_path}")
-            if language:
-                print(f"[INFO] Выбран язык для транскрибации: {language}")
-            else:
-                print(f"[INFO] Язык будет определен автоматически")
-                
-            start_time_total = time.time()
-            
-            # Создание временной папки для хранения аудио частей
-            temp_dir = os.path.join(os.path.dirname(audio_path), "temp_audio_chunks")
-            os.makedirs(temp_dir, exist_ok=True)
-            print(f"[INFO] Создана временная папка для частей: {temp_dir}")
-            
-            # Загрузка аудиофайла
-            print(f"[INFO] Загрузка аудиофайла...")
-            audio = AudioSegment.from_file(audio_path)
-            audio_length_sec = len(audio) / 1000
-            print(f"[INFO] Длительность аудио: {audio_length_sec:.2f} секунд")
-            
-            # Инициализация переменных для обработки аудио чанков
-            current_start_time = 0  # Текущее время начала чанка
-            chunk_index = 1         # Индекс текущего чанка
-            transcriptions = []     # Список для хранения всех транскрибаций
-            
-            estimated_chunks = math.ceil(len(audio) / max_duration)
-            print(f"[INFO] Примерное количество частей: {estimated_chunks}")
-            
-            # Обработка аудиофайла чанками
-            while current_start_time < len(audio):
-                chunk_start_time = time.time()
-                print(f"[INFO] Обработка части {chunk_index}/{estimated_chunks}...")
-                
-                # Выделение чанка из аудиофайла
-                chunk_end_time = min(current_start_time + max_duration, len(audio))
-                chunk = audio[current_start_time:chunk_end_time]
-                chunk_length_sec = len(chunk) / 1000
-                
-                print(f"[INFO] Часть {chunk_index}: {current_start_time/1000:.2f}с - {chunk_end_time/1000:.2f}с (длительность: {chunk_length_sec:.2f}с)")
-                
-                # Формирование имени и пути файла чанка
-                chunk_name = f"chunk_{chunk_index}.wav"
-                chunk_path = os.path.join(temp_dir, chunk_name)
-                
-                # Экспорт чанка в формате wav
-                print(f"[INFO] Экспорт части {chunk_index} в {chunk_path}...")
-                chunk.export(chunk_path, format="wav")
-                
-                # Проверка размера файла чанка на соответствие лимиту API
-                chunk_size_mb = os.path.getsize(chunk_path) / (1024 * 1024)
-                print(f"[INFO] Размер части {chunk_index}: {chunk_size_mb:.2f} МБ")
-                
-                if os.path.getsize(chunk_path) > 25 * 1024 * 1024:  # 25 MB
-                    print(f"[INFO] Часть {chunk_index} превышает лимит размера API ({chunk_size_mb:.2f} МБ > 25 МБ). Уменьшаем длительность...")
-                    max_duration = int(max_duration * 0.9)  # Уменьшение длительности чанка на 10%
-                    print(f"[INFO] Новая максимальная длительность: {max_duration/1000:.2f} секунд")
-                    os.remove(chunk_path)  # Удаление чанка, превышающего лимит
-                    continue
-                
-                # Открытие файла чанка для чтения в двоичном режиме
-                with open(chunk_path, "rb") as src_file:
-                    print(f"[INFO] Отправка части {chunk_index} в Whisper API...")
-                    try:
-                        api_start_time = time.time()
-                        
-                        # Создаем параметры для запроса
-                        params = {
-                            "model": "whisper-1",
-                            "file": src_file
-                        }
-                        
-                        # Добавляем параметр языка, если он указан
-                        if language:
-                            params["language"] = language
-                        
-                        # Отправляем запрос
-                        response = self.client.audio.transcriptions.create(**params)
-                        result_text = response.text
-                        
-                        api_elapsed_time = time.time() - api_start_time
-                        print(f"[INFO] Часть {chunk_index} транскрибирована за {api_elapsed_time:.2f} секунд")
-                        print(f"[INFO] Результат части {chunk_index}: {result_text[:50]}...")
-                        
-                        # Добавление результата транскрибации в список транскрипций
-                        transcriptions.append(result_text)
-                    except Exception as e:
-                        print(f"[ERROR] Произошла ошибка при транскрибации части {chunk_index}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        break
-                
-                # Удаление обработанного файла чанка
-                os.remove(chunk_path)
-                print(f"[INFO] Удален временный файл части {chunk_index}")
-                
-                # Переход к следующему чанку
-                current_start_time = chunk_end_time
-                chunk_index += 1
-                
-                chunk_elapsed_time = time.time() - chunk_start_time
-                print(f"[INFO] Обработка части {chunk_index-1} завершена за {chunk_elapsed_time:.2f} секунд")
-            
-            # Удаление временной папки с чанками
-            try:
-                os.rmdir(temp_dir)
-                print(f"[INFO] Удалена временная папка {temp_dir}")
-            except:
-                print(f"[WARNING] Не удалось удалить временную папку {temp_dir}")
-            
-            # Объединение всех транскрипций в одну строку
-            full_transcription = " ".join(transcriptions)
-            
-            total_elapsed_time = time.time() - start_time_total
-            print(f"[INFO] Полная транскрибация завершена за {total_elapsed_time:.2f} секунд")
-            print(f"[INFO] Итоговый результат ({len(full_transcription)} символов): {full_transcription[:100]}...")
-            
-            return full_transcription
-            
-        except Exception as e:
-            print(f"[ERROR] Ошибка при транскрибации в режиме частей: {e}")
-            import traceback
-            traceback.print_exc()
-            return f"Ошибка транскрибации: {str(e)}"
\ No newline at end of file
+import io
+import os
+import time
+import re
+import math
+import tempfile
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from backends import OpenAIBackend, create_local_backend
+from fingerprint import TranscriptCache, data_fingerprint
+from usage import (UsageLedger, request_usage, sum_usage, empty_usage, format_usage,
+                   price_per_minute, BUDGET_ECONOMY, BUDGET_EXCEEDED)
+from preprocessor import (AudioPreprocessor, iter_audio_chunks, get_audio_duration, split_channels, warm_up_codecs,
+                          remove_pauses, restore_time)
+from scheduler import TranscriptionRouter
+from vocabulary import Vocabulary, combine_prompt
+from settings import get_settings
+from profiling import profiled
+
+# Максимальная длина подсказки (prompt) для Whisper в символах.
+# API учитывает только последние 224 токена подсказки, поэтому длиннее передавать бессмысленно
+PROMPT_MAX_CHARS = 200
+
+# Экономный режим при приближении к бюджету: паузы вырезаются до отправки, части сжимаются
+# с низким битрейтом. Части не укорачиваются: каждый запрос округляется до целой секунды вверх,
+# а перекрытие соседних частей оплачивается дважды
+ECONOMY_FORMAT = "mp3"
+
+# Подписи каналов стерео-записи переговоров: левый - менеджер, правый - клиент
+DEFAULT_SPEAKER_LABELS = ("Менеджер", "Клиент")
+
+# Примерный темп речи, слов в секунду: по нему из длительности перекрытия чанков
+# оценивается, сколько слов на стыке нужно сравнивать
+WORDS_PER_SECOND = 3
+
+# Сколько слов на краю чанка может не совпасть с соседним: Whisper обрезает
+# или додумывает слово, попавшее на границу
+OVERLAP_EDGE_WORDS = 2
+
+
+def _normalize_word(word):
+    """Привести слово к виду для сравнения: нижний регистр, без пунктуации"""
+    return re.sub(r"[^\w]", "", word.lower())
+
+
+def overlap_window_words(overlap):
+    """
+    Сколько слов с каждой стороны стыка сравнивать при перекрытии overlap миллисекунд
+    """
+    return math.ceil(overlap / 1000 * WORDS_PER_SECOND) + 2 * OVERLAP_EDGE_WORDS
+
+
+def _find_anchored_overlap(tail, head):
+    """
+    Найти самый длинный общий фрагмент, который заканчивается у конца tail и начинается у начала head
+    
+    Совпадение в середине окон не подходит: это повтор фразы, а не перекрытие чанков,
+    и склейка по нему выбросила бы текст между повторами.
+    
+    Returns:
+        tuple: (начало в tail, начало в head, длина); длина 0, если совпадения нет
+    """
+    best = (0, 0, 0)
+    for b in range(min(OVERLAP_EDGE_WORDS, len(head) - 1) + 1):
+        for a in range(len(tail)):
+            size = 0
+            while a + size < len(tail) and b + size < len(head) and tail[a + size] == head[b + size]:
+                size += 1
+            if size > best[2] and len(tail) - (a + size) <= OVERLAP_EDGE_WORDS:
+                best = (a, b, size)
+    return best
+
+
+def merge_overlapping_text(previous_text, next_text, overlap):
+    """
+    Склеить транскрипции соседних чанков, которые перекрываются по аудио.
+    
+    Хвост предыдущего текста и начало следующего (по overlap_window_words слов)
+    выравниваются, совпавший на стыке фрагмент остается в тексте один раз.
+    
+    Args:
+        previous_text (str): Текст, накопленный к текущему моменту
+        next_text (str): Текст следующего чанка
+        overlap (int): Перекрытие чанков в миллисекундах
+        
+    Returns:
+        str: Объединенный текст без повторов на стыке
+    """
+    previous_words = previous_text.split()
+    next_words = next_text.split()
+    if not previous_words:
+        return next_text.strip()
+    if not next_words:
+        return previous_text.strip()
+    
+    max_words = overlap_window_words(overlap)
+    tail_offset = max(0, len(previous_words) - max_words)
+    tail = [_normalize_word(w) for w in previous_words[tail_offset:]]
+    head = [_normalize_word(w) for w in next_words[:max_words]]
+    
+    match_a, match_b, size = _find_anchored_overlap(tail, head)
+    
+    # Одно совпавшее слово может быть случайным ("и", "в"), поэтому требуем хотя бы два
+    if size < 2:
+        return " ".join(previous_words + next_words)
+    
+    merged = previous_words[:tail_offset + match_a + size] + next_words[match_b + size:]
+    return " ".join(merged)
+
+
+def build_prompt_from_tail(text, max_chars=PROMPT_MAX_CHARS):
+    """
+    Взять хвост текста для передачи в параметр prompt следующего запроса
+    
+    Args:
+        text (str): Текст предыдущего чанка
+        max_chars (int): Максимальная длина подсказки
+        
+    Returns:
+        str: Последние слова текста длиной не более max_chars
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    # Не начинаем подсказку с обрезанного слова
+    space = tail.find(" ")
+    return tail[space + 1:] if space != -1 else tail
+
+
+def format_speaker_transcript(segments):
+    """
+    Собрать текст с подписями говорящих из сегментов, упорядоченных по времени
+    
+    Подряд идущие реплики одного говорящего объединяются в одну строку.
+    
+    Args:
+        segments (list): Сегменты с ключами start, speaker и text
+        
+    Returns:
+        str: Строки вида "[00:01:02] Менеджер: текст"
+    """
+    lines = []
+    current_speaker = None
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        if segment["speaker"] == current_speaker:
+            lines[-1] += " " + text
+            continue
+        current_speaker = segment["speaker"]
+        seconds = int(segment["start"])
+        timestamp = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        lines.append(f"[{timestamp}] {current_speaker}: {text}")
+    return "\n".join(lines)
+
+
+def join_segment_results(parts):
+    """
+    Объединить результаты распознавания последовательных файлов-сегментов одной записи
+    
+    Args:
+        parts (list): Кортежи (сдвиг начала сегмента в секундах, результат распознавания)
+        
+    Returns:
+        dict: {"text", "segments", "error"} - таймкоды отсчитываются от начала всей записи
+    """
+    texts = []
+    segments = []
+    errors = []
+    for offset, result in parts:
+        if result["error"]:
+            errors.append(result["error"])
+            continue
+        if result["text"].strip():
+            texts.append(result["text"].strip())
+        for segment in result["segments"]:
+            shifted = dict(segment)
+            shifted["start"] = segment["start"] + offset
+            shifted["end"] = segment["end"] + offset
+            segments.append(shifted)
+    
+    if any("speaker" in segment for segment in segments):
+        # Таймкоды реплик в тексте пересчитываются от начала всей записи
+        text = format_speaker_transcript(segments)
+    else:
+        text = " ".join(texts)
+    error = "; ".join(errors) or None
+    if error and not text:
+        text = f"Ошибка транскрибации: {error}"
+    return {"text": text, "segments": segments, "error": error,
+            "usage": sum_usage(result for offset, result in parts)}
+
+
+def _payload_size(audio_file):
+    """Размер отправляемого файла или буфера в байтах"""
+    if isinstance(audio_file, str):
+        return os.path.getsize(audio_file)
+    position = audio_file.tell()
+    audio_file.seek(0, os.SEEK_END)
+    size = audio_file.tell()
+    audio_file.seek(position)
+    return size
+
+
+class WhisperTranscriber:
+    def __init__(self, default_backend=None):
+        # Загружаем переменные окружения
+        load_dotenv()
+        settings = get_settings()
+        
+        # Движок по умолчанию: "openai" (Whisper API), "local" (faster-whisper на CPU)
+        # или "auto" (выбор для каждого файла или части по нагрузке)
+        self.default_backend = default_backend or settings["transcription.backend"]
+        self.backends = {}
+        self.backends_lock = threading.Lock()
+        self.router = None
+        self.client = None
+        
+        # Выставляется при завершении приложения: новые части длинных записей больше не отправляются
+        self.cancel_event = threading.Event()
+        
+        # Учет оплачиваемых секунд, объема и числа запросов; бюджеты в минутах аудио
+        self.usage = UsageLedger()
+        
+        # Словари терминов менеджеров для подсказки распознавания (папка glossaries/)
+        self.vocabulary = Vocabulary()
+        
+        # Индекс уже распознанных записей: повторно отправленный файл не распознается заново
+        self.cache = None
+        if settings["cache.enabled"]:
+            self.cache = TranscriptCache(settings["cache.path"], max_entries=settings["cache.max_entries"])
+        
+        # Получаем API ключ из переменных окружения
+        api_key = os.getenv("OPENAI_API_KEY")
+        
+        if api_key:
+            self.backends["openai"] = OpenAIBackend(api_key, model=settings["transcription.model"])
+            self.client = self.backends["openai"].client
+        elif self.default_backend == "openai":
+            raise ValueError("API ключ OpenAI не найден. Убедитесь, что он указан в файле .env")
+        elif self.default_backend == "auto" and not self.available_backends():
+            raise ValueError("Нет доступных движков распознавания: укажите API ключ OpenAI или установите faster-whisper")
+        
+        # Параметры разбиения и параллельности берутся из настроек и обновляются при их перезагрузке
+        self._apply_settings()
+        settings.subscribe(self._apply_settings)
+    
+    def _apply_settings(self, changed=None):
+        """Применить настройки разбиения на части, модели API, параллельности и бюджета"""
+        settings = get_settings()
+        # Перекрытие соседних чанков и длительность чанка в миллисекундах при разбиении длинных файлов
+        self.chunk_overlap = int(settings["transcription.chunk_overlap_seconds"] * 1000)
+        self.chunk_duration = int(settings["transcription.chunk_minutes"] * 60 * 1000)
+        self.economy_bitrate = settings["transcription.economy_bitrate"]
+        self.economy_min_pause = settings["transcription.economy_min_pause_seconds"]
+        self.upload_workers = settings["transcription.upload_workers"]
+        self.preprocess_workers = settings["transcription.preprocess_workers"] or None
+        # Дольше этого запрос не ждет освобождения бюджета, а завершается ошибкой
+        self.max_budget_wait = settings["budget.max_wait_seconds"]
+        if self.router is not None:
+            self.router.api_seconds_per_hour = settings["budget.api_seconds_per_hour"] or None
+        if "openai" in self.backends:
+            self.backends["openai"].model = settings["transcription.model"]
+            self.backends["openai"].max_file_size = int(settings["transcription.max_file_mb"] * 1024 * 1024)
+    
+    def available_backends(self):
+        """
+        Список движков, которые можно использовать
+        
+        Returns:
+            list: Имена движков
+        """
+        names = []
+        if "openai" in self.backends:
+            names.append("openai")
+        if "local" in self.backends or importlib.util.find_spec("faster_whisper") is not None:
+            names.append("local")
+        return names
+    
+    def get_router(self):
+        """Получить планировщик для режима "auto" (создается при первом обращении)"""
+        with self.backends_lock:
+            if self.router is None:
+                self.router = TranscriptionRouter(
+                    self.available_backends(),
+                    api_seconds_per_hour=get_settings()["budget.api_seconds_per_hour"] or None
+                )
+            return self.router
+    
+    def get_backend(self, name=None):
+        """
+        Получить движок распознавания по имени
+        
+        Движки создаются один раз и переиспользуются, поэтому локальная модель
+        остается загруженной между транскрибациями.
+        
+        Args:
+            name (str, optional): "openai" или "local"; по умолчанию - self.default_backend
+            
+        Returns:
+            TranscriptionBackend: Движок распознавания
+        """
+        name = name or self.default_backend
+        with self.backends_lock:
+            if name not in self.backends:
+                if name == "local":
+                    self.backends[name] = create_local_backend()
+                elif name == "openai":
+                    raise ValueError("API ключ OpenAI не найден. Убедитесь, что он указан в файле .env")
+                else:
+                    raise ValueError(f"Неизвестный движок распознавания: {name}")
+            return self.backends[name]
+    
+    def _max_file_size(self, backend):
+        """
+        Лимит размера файла для движка в байтах (настройка transcription.max_file_mb для API)
+        
+        Returns:
+            int: Лимит или None, если движок принимает файлы любого размера
+        """
+        if backend == "auto":
+            # Планировщик может выбрать API, поэтому учитываем его ограничение размера
+            return self.backends["openai"].max_file_size if "openai" in self.backends else None
+        return self.get_backend(backend).max_file_size
+    
+    def warm_up(self, backend=None, codecs=True):
+        """
+        Подготовить движок и кодеки к первой транскрибации
+        
+        Для Whisper API заранее открывается соединение, локальная модель загружается в память.
+        В режиме "auto" прогревается только API: локальная модель загружается при первом выборе.
+        Ошибки прогрева не мешают работе и только выводятся в консоль.
+        
+        Args:
+            backend (str, optional): Имя движка; по умолчанию - self.default_backend
+            codecs (bool): Прогреть также кодирование частей (WAV и сжатие экономного режима)
+        """
+        name = backend or self.default_backend
+        if name == "auto":
+            name = "openai" if "openai" in self.backends else None
+        
+        if name:
+            started = time.time()
+            try:
+                self.get_backend(name).warm_up()
+                print(f"[INFO] Движок {name} готов к работе ({time.time() - started:.1f} с)")
+            except Exception as e:
+                print(f"[WARNING] Не удалось подготовить движок {name}: {e}")
+        
+        if codecs:
+            try:
+                warm_up_codecs(("wav", ECONOMY_FORMAT), bitrate=self.economy_bitrate)
+            except Exception as e:
+                print(f"[WARNING] Не удалось подготовить кодеки: {e}")
+    
+    def transcribe_audio(self, audio_file_path, language=None, backend=None):
+        """
+        Транскрибировать аудиофайл с использованием Whisper API или локальной модели
+        
+        Args:
+            audio_file_path (str): Путь к аудиофайлу для транскрибации
+            language (str, optional): Код языка для транскрибации (например, "ru", "en", "kk")
+            backend (str, optional): Движок распознавания ("openai", "local")
+            
+        Returns:
+            str: Текст транскрибации
+        """
+        return self.transcribe_audio_detailed(audio_file_path, language=language, with_segments=False,
+                                              backend=backend)["text"]
+    
+    def _lookup_cache(self, audio_file_path, language, with_segments):
+        """
+        Проверить, не распознавалась ли эта запись раньше
+        
+        Returns:
+            tuple: (отпечаток или None, сохраненный результат или None)
+        """
+        if self.cache is None:
+            return None, None
+        
+        start_time = time.time()
+        try:
+            fingerprint = self.cache.fingerprint(audio_file_path)
+            cached = self.cache.lookup(fingerprint, language, with_segments)
+        except Exception as e:
+            print(f"[WARNING] Не удалось проверить запись на повтор: {e}")
+            return None, None
+        
+        if cached:
+            print(f"[INFO] Повторная запись найдена за {(time.time() - start_time) * 1000:.1f} мс")
+        return fingerprint, cached
+    
+    @profiled()
+    def transcribe_audio_detailed(self, audio_file_path, language=None, with_segments=True, backend=None,
+                                  manager=None, context=None, on_partial=None):
+        """
+        Транскрибировать аудиофайл и, при необходимости, получить сегменты с таймкодами
+        
+        Args:
+            audio_file_path (str): Путь к аудиофайлу для транскрибации
+            language (str, optional): Код языка для транскрибации (например, "ru", "en", "kk")
+            with_segments (bool): Запросить сегменты с таймкодами (response_format="verbose_json")
+            backend (str, optional): Движок распознавания ("openai", "local")
+            manager (str, optional): Имя менеджера: его словарь терминов передается в подсказке
+            context (str, optional): Текст, предшествующий записи (например, предыдущий сегмент);
+                его хвост передается в подсказке для связности
+            on_partial (callable, optional): Вызывается с текстом каждой распознанной части
+                (для файла без разбиения - один раз со всем текстом), пока транскрибация продолжается
+            
+        Returns:
+            dict: {"text": str, "segments": list, "error": str или None}.
+                Время сегментов указано в секундах от начала всего файла
+        """
+        print(f"[INFO] Начало транскрибации файла: {audio_file_path}")
+        if language:
+            print(f"[INFO] Выбран язык для транскрибации: {language}")
+        else:
+            print(f"[INFO] Язык будет определен автоматически")
+            
+        start_time = time.time()
+        
+        fingerprint, cached = self._lookup_cache(audio_file_path, language, with_segments)
+        if cached:
+            cached["usage"] = empty_usage()
+            if on_partial:
+                on_partial(cached["text"])
+            return cached
+        
+        try:
+            backend = backend or self.default_backend
+            glossary = self.vocabulary.prompt_for(manager)
+            audio_seconds = 0.0
+            max_file_size = self._max_file_size(backend)
+            
+            # Длительность нужна планировщику и для учета оплачиваемых секунд
+            billed = backend == "auto" or price_per_minute(backend) > 0
+            if billed:
+                audio_seconds = get_audio_duration(audio_file_path)
+            
+            # Проверяем размер файла
+            file_size = os.path.getsize(audio_file_path)
+            print(f"[INFO] Размер файла: {file_size / (1024 * 1024):.2f} МБ")
+            
+            economy = billed and self.usage.budget_state(audio_seconds) == BUDGET_ECONOMY
+            
+            # Если файл больше лимита движка (25 МБ для API), используем метод с разбивкой на части
+            if (max_file_size and file_size > max_file_size) or economy:
+                if economy:
+                    print(f"[INFO] Расход близок к бюджету: экономный режим (паузы от {self.economy_min_pause:.0f} с "
+                          f"вырезаются, сжатие {self.economy_bitrate})")
+                else:
+                    print(f"[INFO] Файл превышает {max_file_size / (1024 * 1024):.0f} МБ, используется метод разбиения на части")
+                result = self._transcribe_long_file(audio_file_path, language=language, overlap=self.chunk_overlap,
+                                                    with_segments=with_segments, backend=backend, economy=economy,
+                                                    glossary=glossary, context=context, on_partial=on_partial)
+            else:
+                print(f"[INFO] Отправка файла в движок распознавания '{backend}'...")
+                
+                # Отправляем запрос в API
+                prompt = combine_prompt(glossary, build_prompt_from_tail(context) if context else None)
+                with open(audio_file_path, "rb") as audio_file:
+                    result = self._request_transcription(audio_file, language=language, prompt=prompt,
+                                                         with_segments=with_segments, backend=backend,
+                                                         audio_seconds=audio_seconds)
+                
+                elapsed_time = time.time() - start_time
+                print(f"[INFO] Транскрибация завершена за {elapsed_time:.2f} секунд")
+                print(f"[INFO] Результат: {result['text'][:100]}...")
+                if on_partial and not result["error"]:
+                    on_partial(result["text"])
+            
+            print(f"[INFO] Расход на файл: {format_usage(result.get('usage') or empty_usage())}")
+            
+            if fingerprint:
+                self.cache.store(fingerprint, result, language=language, backend=backend,
+                                 with_segments=with_segments, source_path=audio_file_path)
+            
+            return result
+        
+        except Exception as e:
+            import traceback
+            print(f"[ERROR] Ошибка при транскрибации: {e}")
+            traceback.print_exc()
+            return {"text": f"Ошибка транскрибации: {str(e)}", "segments": [], "error": str(e)}
+    
+    def _request_transcription(self, audio_file, language=None, prompt=None, with_segments=False, backend=None,
+                               audio_seconds=0.0):
+        """
+        Отправить один файл или буфер выбранному движку распознавания
+        
+        Args:
+            audio_file: Открытый файл или BytesIO с атрибутом name
+            language (str, optional): Код языка для транскрибации
+            prompt (str, optional): Подсказка с предыдущим контекстом
+            with_segments (bool): Запросить сегменты с таймкодами
+            backend (str, optional): Имя движка ("openai", "local", "auto"); по умолчанию - self.default_backend
+            audio_seconds (float): Длительность аудио, нужна планировщику в режиме "auto" и для учета расхода
+            
+        Returns:
+            dict: {"text": str, "segments": list, "error": None, "usage": расход запроса}
+        """
+        backend = self._apply_budget(backend or self.default_backend, audio_seconds)
+        size = _payload_size(audio_file)
+        
+        if backend == "auto":
+            router = self.get_router()
+            with router.dispatch(audio_seconds) as chosen:
+                print(f"[INFO] Планировщик выбрал движок '{chosen}' для {audio_seconds:.1f} с аудио: {router.describe()}")
+                result = self.get_backend(chosen).transcribe(
+                    audio_file, language=language, prompt=prompt, with_segments=with_segments
+                )
+        else:
+            chosen = backend
+            result = self.get_backend(backend).transcribe(
+                audio_file, language=language, prompt=prompt, with_segments=with_segments
+            )
+        
+        result["usage"] = request_usage(chosen, audio_seconds, size)
+        if result["usage"]["billed_seconds"]:
+            self.usage.record(chosen, result["usage"])
+        return result
+    
+    def _apply_budget(self, backend, audio_seconds):
+        """
+        Проверить бюджет перед платным запросом
+        
+        Если бюджет исчерпан, запрос переводится на локальную модель, а без нее ждет
+        освобождения бюджета (не дольше max_budget_wait).
+        
+        Returns:
+            str: Движок, которому отправлять запрос
+        """
+        if backend == "local" or self.usage.budget_state(audio_seconds) != BUDGET_EXCEEDED:
+            return backend
+        
+        if "local" in self.available_backends():
+            print("[INFO] Бюджет распознавания исчерпан, запрос выполняется локальной моделью")
+            return "local"
+        
+        wait = self.usage.seconds_until_available(audio_seconds)
+        if wait > self.max_budget_wait:
+            raise RuntimeError(f"Бюджет распознавания исчерпан, он освободится через {wait / 60:.0f} мин")
+        
+        print(f"[INFO] Бюджет распознавания исчерпан, ожидание {wait:.0f} секунд")
+        if self.cancel_event.wait(wait):
+            raise RuntimeError("Транскрибация прервана при завершении работы")
+        return backend
+    
+    def _transcribe_chunks(self, chunks, language=None, overlap=0, with_segments=False, backend=None,
+                           glossary=None, context=None, on_partial=None):
+        """
+        Транскрибировать подготовленные части и собрать общий текст
+        
+        Каждая часть отправляется с подсказкой из словаря терминов и хвоста текста
+        предыдущей части, чтобы имена и названия писались одинаково во всей записи.
+        
+        Args:
+            chunks (iterable): Части в формате preprocessor.iter_audio_chunks
+            language (str, optional): Код языка для транскрибации
+            overlap (int): Перекрытие частей в миллисекундах
+            with_segments (bool): Запросить сегменты с таймкодами
+            backend (str, optional): Движок распознавания
+            glossary (str, optional): Подсказка со словарем терминов (Vocabulary.prompt_for)
+            context (str, optional): Текст, предшествующий первой части
+            on_partial (callable, optional): Вызывается с текстом каждой распознанной части
+            
+        Returns:
+            dict: {"text": str, "segments": list, "error": str или None}
+        """
+        transcriptions = []     # Список для хранения всех транскрибаций
+        segments = []           # Сегменты с абсолютным временем от начала файла
+        results = []            # Ответы движка для учета расхода
+        error = None
+        
+        for chunk in chunks:
+            if self.cancel_event.is_set():
+                # Уже распознанные части сохранены в кеше и не будут отправляться повторно
+                print("[INFO] Транскрибация прервана: приложение завершает работу")
+                error = "Транскрибация прервана при завершении работы"
+                break
+            
+            chunk_index = chunk["index"]
+            chunk_length_sec = (chunk["end"] - chunk["start"]) / 1000
+            print(f"[INFO] Часть {chunk_index}: {chunk['start']/1000:.2f}с - {chunk['end']/1000:.2f}с (длительность: {chunk_length_sec:.2f}с)")
+            
+            if chunk["silent"]:
+                print(f"[INFO] Часть {chunk_index} содержит только тишину и пропускается")
+                continue
+            
+            chunk_size_mb = len(chunk["data"]) / (1024 * 1024)
+            print(f"[INFO] Размер части {chunk_index}: {chunk_size_mb:.2f} МБ")
+            
+            # Буфер в памяти вместо временного файла; имя нужно клиенту OpenAI, чтобы определить формат
+            buffer = io.BytesIO(chunk["data"])
+            buffer.name = chunk["name"]
+            
+            print(f"[INFO] Отправка части {chunk_index} на распознавание...")
+            try:
+                api_start_time = time.time()
+                
+                # Передаем словарь и хвост предыдущей части для связности текста
+                previous_text = transcriptions[-1] if transcriptions else context
+                prompt = combine_prompt(glossary, build_prompt_from_tail(previous_text) if previous_text else None)
+                
+                # Части, распознанные до прерывания прошлой попытки, берем из кеша
+                chunk_fingerprint = data_fingerprint(chunk["data"]) if self.cache is not None else None
+                result = None
+                if chunk_fingerprint:
+                    result = self.cache.lookup(chunk_fingerprint, language, with_segments)
+                if result is None:
+                    result = self._request_transcription(buffer, language=language, prompt=prompt,
+                                                         with_segments=with_segments, backend=backend,
+                                                         audio_seconds=chunk_length_sec)
+                    if chunk_fingerprint:
+                        self.cache.store(chunk_fingerprint, result, language=language, backend=backend,
+                                         with_segments=with_segments, source_path=chunk["name"])
+                results.append(result)
+                result_text = result["text"]
+                
+                api_elapsed_time = time.time() - api_start_time
+                print(f"[INFO] Часть {chunk_index} транскрибирована за {api_elapsed_time:.2f} секунд")
+                print(f"[INFO] Результат части {chunk_index}: {result_text[:50]}...")
+                
+                # Добавление результата транскрибации в список транскрипций
+                transcriptions.append(result_text)
+                if on_partial:
+                    on_partial(result_text)
+                
+                # Переводим время сегментов из относительного (от начала части) в абсолютное
+                offset = chunk["start"] / 1000
+                last_end = segments[-1]["end"] if segments else 0.0
+                for segment in result["segments"]:
+                    start = segment["start"] + offset
+                    end = segment["end"] + offset
+                    # Сегменты из зоны перекрытия уже получены в предыдущей части
+                    if end <= last_end:
+                        continue
+                    segments.append({"start": max(start, last_end), "end": end, "text": segment["text"]})
+            except Exception as e:
+                print(f"[ERROR] Произошла ошибка при транскрибации части {chunk_index}: {e}")
+                import traceback
+                traceback.print_exc()
+                error = str(e)
+                break
+            finally:
+                # Освобождаем память, занятую закодированным чанком
+                buffer.close()
+                chunk["data"] = None
+        
+        # Объединение всех транскрипций в одну строку
+        if overlap:
+            full_transcription = ""
+            for text in transcriptions:
+                full_transcription = merge_overlapping_text(full_transcription, text, overlap)
+        else:
+            full_transcription = " ".join(transcriptions)
+        
+        return {"text": full_transcription, "segments": segments, "error": error, "usage": sum_usage(results)}
+    
+    @profiled()
+    def transcribe_audio_chunked(self, audio_path, language=None, max_duration=None, overlap=0):
+        """
+        Функция для транскрибации аудиофайла на части, чтобы соответствовать ограничениям размера API.
+        
+        Args:
+            audio_path (str): Путь к аудиофайлу для транскрибации
+            language (str, optional): Код языка для транскрибации (например, "ru", "en", "kk")
+            max_duration (int, optional): Максимальная длительность чанка в миллисекундах
+                (по умолчанию - настройка transcription.chunk_minutes)
+            overlap (int): Перекрытие соседних чанков в миллисекундах. Если больше нуля,
+                повторы на стыках удаляются. Хвост предыдущего чанка передается как prompt всегда
+            
+        Returns:
+            str: Объединенный текст транскрибации всех частей
+        """
+        return self._transcribe_long_file(audio_path, language=language, max_duration=max_duration,
+                                          overlap=overlap)["text"]
+    
+    def _transcribe_long_file(self, audio_path, language=None, max_duration=None, overlap=0,
+                              with_segments=False, backend=None, economy=False, glossary=None, context=None,
+                              on_partial=None):
+        """
+        Транскрибировать длинный файл по частям (см. transcribe_audio_chunked)
+        
+        В экономном режиме из записи сначала вырезаются паузы, а части сжимаются с низким
+        битрейтом: паузы между репликами не оплачиваются, объем загрузки меньше. Таймкоды
+        сегментов пересчитываются обратно во время исходной записи.
+        
+        Returns:
+            dict: {"text": str, "segments": list, "error": str или None}
+        """
+        try:
+            print(f"[INFO] Начало транскрибации файла по частям: {audio_path}")
+            if language:
+                print(f"[INFO] Выбран язык для транскрибации: {language}")
+            else:
+                print(f"[INFO] Язык будет определен автоматически")
+                
+            start_time_total = time.time()
+            
+            max_duration = max_duration or self.chunk_duration
+            # Части не должны превышать лимит движка, заданный настройкой transcription.max_file_mb
+            chunk_options = {"max_bytes": self._max_file_size(backend or self.default_backend)}
+            time_map = None
+            trimmed_path = None
+            if economy:
+                chunk_options.update(export_format=ECONOMY_FORMAT, bitrate=self.economy_bitrate)
+                descriptor, trimmed_path = tempfile.mkstemp(suffix=".wav")
+                os.close(descriptor)
+                time_map = remove_pauses(audio_path, trimmed_path, self.economy_min_pause)
+            
+            try:
+                # Части готовятся по одной, чтобы не держать в памяти весь закодированный файл
+                chunks = iter_audio_chunks(trimmed_path if time_map else audio_path, max_duration=max_duration,
+                                           overlap=overlap, **chunk_options)
+                result = self._transcribe_chunks(chunks, language=language, overlap=overlap,
+                                                 with_segments=with_segments, backend=backend, glossary=glossary,
+                                                 context=context, on_partial=on_partial)
+            finally:
+                if trimmed_path:
+                    os.remove(trimmed_path)
+            
+            if time_map:
+                for segment in result["segments"]:
+                    segment["start"] = restore_time(time_map, segment["start"])
+                    segment["end"] = restore_time(time_map, segment["end"])
+            full_transcription = result["text"]
+            
+            total_elapsed_time = time.time() - start_time_total
+            print(f"[INFO] Полная транскрибация завершена за {total_elapsed_time:.2f} секунд")
+            print(f"[INFO] Итоговый результат ({len(full_transcription)} символов): {full_transcription[:100]}...")
+            
+            return result
+            
+        except Exception as e:
+            print(f"[ERROR] Ошибка при транскрибации в режиме частей: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"text": f"Ошибка транскрибации: {str(e)}", "segments": [], "error": str(e)}
+    
+    def transcribe_speakers(self, tracks, language=None, backend=None, manager=None):
+        """
+        Транскрибировать раздельные дорожки говорящих параллельно и объединить реплики по времени
+        
+        Args:
+            tracks (list): Кортежи (подпись говорящего, путь к моно-файлу, сдвиг начала дорожки в секундах)
+            language (str, optional): Код языка для транскрибации
+            backend (str, optional): Движок распознавания
+            manager (str, optional): Имя менеджера для словаря терминов
+            
+        Returns:
+            dict: {"text": текст с подписями говорящих, "segments": сегменты с ключом speaker,
+                "error": str или None}
+        """
+        print(f"[INFO] Раздельная транскрибация {len(tracks)} дорожек")
+        start_time = time.time()
+        
+        with ThreadPoolExecutor(max_workers=len(tracks)) as executor:
+            futures = [
+                executor.submit(self.transcribe_audio_detailed, path, language, True, backend, manager)
+                for label, path, offset in tracks
+            ]
+            results = [future.result() for future in futures]
+        
+        segments = []
+        errors = []
+        for (label, path, offset), result in zip(tracks, results):
+            if result["error"]:
+                errors.append(f"{label}: {result['error']}")
+            for segment in result["segments"]:
+                segments.append({
+                    "start": segment["start"] + offset,
+                    "end": segment["end"] + offset,
+                    "text": segment["text"],
+                    "speaker": label
+                })
+        
+        segments.sort(key=lambda segment: segment["start"])
+        text = format_speaker_transcript(segments)
+        
+        elapsed_time = time.time() - start_time
+        print(f"[INFO] Раздельная транскрибация завершена за {elapsed_time:.2f} секунд")
+        
+        error = "; ".join(errors) or None
+        if error and not text:
+            text = f"Ошибка транскрибации: {error}"
+        return {"text": text, "segments": segments, "error": error, "usage": sum_usage(results)}
+    
+    def transcribe_stereo(self, audio_path, language=None, labels=DEFAULT_SPEAKER_LABELS, backend=None,
+                          manager=None):
+        """
+        Транскрибировать стерео-запись, где каждый говорящий записан на своем канале
+        
+        Args:
+            audio_path (str): Путь к стерео WAV файлу
+            language (str, optional): Код языка для транскрибации
+            labels (tuple): Подписи говорящих по порядку каналов
+            backend (str, optional): Движок распознавания
+            manager (str, optional): Имя менеджера для словаря терминов
+            
+        Returns:
+            dict: Результат в формате transcribe_speakers
+        """
+        try:
+            channel_paths = split_channels(audio_path)
+        except Exception as e:
+            print(f"[ERROR] Не удалось разделить каналы файла {audio_path}: {e}")
+            return {"text": f"Ошибка транскрибации: {str(e)}", "segments": [], "error": str(e)}
+        
+        tracks = [
+            (labels[channel] if channel < len(labels) else f"Канал {channel + 1}", path, 0.0)
+            for channel, path in enumerate(channel_paths)
+        ]
+        return self.transcribe_speakers(tracks, language=language, backend=backend, manager=manager)
+    
+    def transcribe_batch(self, audio_paths, language=None, max_duration=None,
+                         preprocess_workers=None, upload_workers=None, backend=None, manager=None):
+        """
+        Транскрибировать пакет файлов: подготовка аудио идет в пуле процессов на всех ядрах,
+        а отправка в API - в отдельном пуле потоков
+        
+        Args:
+            audio_paths (list): Пути к аудиофайлам
+            language (str, optional): Код языка для транскрибации
+            max_duration (int, optional): Максимальная длительность чанка в миллисекундах
+                (по умолчанию - настройка transcription.chunk_minutes)
+            preprocess_workers (int, optional): Количество процессов предобработки
+                (по умолчанию - настройка transcription.preprocess_workers, 0 - все ядра)
+            upload_workers (int, optional): Количество одновременных запросов к API
+                (по умолчанию - настройка transcription.upload_workers)
+            backend (str, optional): Движок распознавания
+            manager (str, optional): Имя менеджера для словаря терминов
+            
+        Returns:
+            dict: Путь к файлу -> текст транскрибации (или сообщение об ошибке)
+        """
+        print(f"[INFO] Пакетная транскрибация {len(audio_paths)} файлов")
+        start_time = time.time()
+        results = {}
+        
+        usages = []
+        glossary = self.vocabulary.prompt_for(manager)
+        max_duration = max_duration or self.chunk_duration
+        max_bytes = self._max_file_size(backend or self.default_backend)
+        preprocess_workers = preprocess_workers or self.preprocess_workers
+        upload_workers = upload_workers or self.upload_workers
+        
+        # Повторно отправленные записи берем из кеша, одинаковые файлы внутри пакета распознаем один раз
+        fingerprints = {}
+        duplicates = {}
+        pending = []
+        for path in audio_paths:
+            fingerprint, cached = self._lookup_cache(path, language, False)
+            if cached:
+                results[path] = cached["text"]
+                continue
+            if fingerprint and fingerprint in fingerprints.values():
+                original = next(known for known, value in fingerprints.items() if value == fingerprint)
+                duplicates[path] = original
+                continue
+            fingerprints[path] = fingerprint
+            pending.append(path)
+        
+        with AudioPreprocessor(max_workers=preprocess_workers) as preprocessor, \
+                ThreadPoolExecutor(max_workers=upload_workers) as uploader:
+            # Стадия 1: подготовка частей всех файлов параллельно в процессах
+            prepare_futures = {
+                preprocessor.submit(path, max_duration=max_duration, overlap=self.chunk_overlap, max_bytes=max_bytes): path
+                for path in pending
+            }
+            
+            # Стадия 2: отправка в API по мере готовности файлов
+            upload_futures = {}
+            for future in as_completed(prepare_futures):
+                path = prepare_futures[future]
+                try:
+                    chunks = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Ошибка при подготовке файла {path}: {e}")
+                    results[path] = f"Ошибка транскрибации: {str(e)}"
+                    continue
+                upload_futures[uploader.submit(self._transcribe_chunks, chunks, language, self.chunk_overlap,
+                                               False, backend, glossary)] = path
+            
+            for future in as_completed(upload_futures):
+                path = upload_futures[future]
+                try:
+                    result = future.result()
+                    usages.append(result)
+                    results[path] = result["text"]
+                    if fingerprints.get(path):
+                        self.cache.store(fingerprints[path], result, language=language, backend=backend,
+                                         with_segments=False, source_path=path)
+                except Exception as e:
+                    print(f"[ERROR] Ошибка при транскрибации файла {path}: {e}")
+                    results[path] = f"Ошибка транскрибации: {str(e)}"
+        
+        for path, original in duplicates.items():
+            print(f"[INFO] Файл {path} совпадает с {original}, используется тот же результат")
+            results[path] = results[original]
+        
+        elapsed_time = time.time() - start_time
+        print(f"[INFO] Пакетная транскрибация завершена за {elapsed_time:.2f} секунд")
+        print(f"[INFO] Расход на пакет: {format_usage(sum_usage(usages))}")
+        return results
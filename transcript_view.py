@@ -0,0 +1,115 @@
+import queue
+import threading
+import tkinter as tk
+
+# Как часто переносить накопленный текст в виджет, мс: не больше 4 перерисовок в секунду
+REFRESH_INTERVAL = 250
+
+# Доля высоты текста, начиная с которой поле считается прокрученным до конца
+FOLLOW_THRESHOLD = 0.999
+
+
+class TranscriptView:
+    """
+    Поле с текстом транскрибации, которое пополняется по мере распознавания
+
+    Фоновые потоки передают готовые части текста через очередь (append), а главный
+    поток раз в REFRESH_INTERVAL мс переносит все накопленное в виджет одной вставкой
+    в конец. Уже показанный текст не перерисовывается, поэтому поле остается отзывчивым
+    и при сотнях тысяч символов. Каждая часть вставляется отдельным абзацем: Tk медленно
+    переносит по словам одну очень длинную строку. Если пользователь прокрутил поле вверх,
+    позиция прокрутки сохраняется; если он в конце, поле следует за новым текстом.
+    """
+
+    def __init__(self, textbox, refresh_interval=REFRESH_INTERVAL):
+        """
+        Args:
+            textbox (ctk.CTkTextbox): Текстовое поле
+            refresh_interval (int): Интервал обновления поля, мс
+        """
+        self.textbox = textbox
+        self.refresh_interval = refresh_interval
+        self.queue = queue.Queue()
+        # Следующая часть текста заменяет содержимое поля (начата новая запись)
+        self.replace_on_append = False
+        self.textbox.after(self.refresh_interval, self._poll)
+
+    def append(self, text):
+        """Добавить часть текста в конец поля (можно вызывать из любого потока)"""
+        if text and text.strip():
+            self.queue.put(("append", text.strip()))
+
+    def new_session(self):
+        """Следующая добавленная часть заменит текущее содержимое поля"""
+        self.queue.put(("new_session", None))
+
+    def set(self, text):
+        """
+        Заменить содержимое поля (например, итоговым результатом транскрибации)
+
+        Из главного потока изменение применяется сразу, из остальных - при следующем обновлении.
+        """
+        self.queue.put(("set", text or ""))
+        if threading.current_thread() is threading.main_thread():
+            self.flush()
+
+    def clear(self):
+        """Очистить поле"""
+        self.set("")
+
+    def flush(self):
+        """
+        Перенести в поле все накопленные изменения (только из главного потока)
+
+        Returns:
+            bool: True, если содержимое поля изменилось
+        """
+        content = None
+        appended = []
+        while True:
+            try:
+                action, text = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if action == "set":
+                content, appended = text, []
+                self.replace_on_append = False
+            elif action == "new_session":
+                self.replace_on_append = True
+            elif self.replace_on_append:
+                content, appended = "", [text]
+                self.replace_on_append = False
+            else:
+                appended.append(text)
+
+        if content is None and not appended:
+            return False
+
+        first, last = self.textbox.yview()
+        follow = last >= FOLLOW_THRESHOLD
+        if content is not None:
+            self.textbox.delete("1.0", tk.END)
+            if content:
+                self.textbox.insert("1.0", content)
+        if appended:
+            separator = "\n" if self.textbox.get("end-2c", "end-1c") not in ("", "\n") else ""
+            self.textbox.insert(tk.END, separator + "\n".join(appended))
+
+        if follow:
+            self.textbox.see(tk.END)
+        elif content is not None:
+            self.textbox.yview_moveto(first)
+        return True
+
+    def _poll(self):
+        try:
+            self.flush()
+        except tk.TclError:
+            # Окно закрыто
+            return
+        except Exception as e:
+            print(f"[WARNING] Ошибка при обновлении текста транскрибации: {e}")
+        try:
+            self.textbox.after(self.refresh_interval, self._poll)
+        except tk.TclError:
+            pass
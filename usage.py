@@ -0,0 +1,217 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from settings import get_settings
+
+# Платные движки; остальные (локальная модель) не тарифицируются
+PAID_BACKENDS = ("openai",)
+
+# Состояния бюджета
+BUDGET_OK = "ok"
+BUDGET_ECONOMY = "economy"
+BUDGET_EXCEEDED = "exceeded"
+
+
+def price_per_minute(backend):
+    """
+    Цена минуты аудио движка в долларах (Whisper API тарифицирует посекундно)
+
+    Цена берется из настройки budget.price_per_minute при каждом обращении, поэтому
+    переменные из .env учитываются, а изменение файла настроек применяется без перезапуска.
+    """
+    if backend not in PAID_BACKENDS:
+        return 0.0
+    return get_settings()["budget.price_per_minute"]
+
+
+def empty_usage():
+    """Пустой счетчик расхода"""
+    return {"requests": 0, "billed_seconds": 0.0, "bytes": 0, "cost": 0.0}
+
+
+def request_usage(backend, audio_seconds, size):
+    """
+    Расход одного запроса к движку
+
+    Args:
+        backend (str): Движок, выполнивший запрос
+        audio_seconds (float): Длительность отправленного аудио
+        size (int): Размер отправленных данных в байтах
+
+    Returns:
+        dict: {"requests", "billed_seconds", "bytes", "cost"}
+    """
+    price = price_per_minute(backend)
+    # Бесплатные движки не тарифицируются, платные - с округлением до целой секунды вверх
+    billed_seconds = float(math.ceil(audio_seconds)) if price else 0.0
+    return {
+        "requests": 1,
+        "billed_seconds": billed_seconds,
+        "bytes": int(size),
+        "cost": billed_seconds / 60 * price
+    }
+
+
+def sum_usage(results):
+    """
+    Сложить расход нескольких результатов распознавания
+
+    Args:
+        results (iterable): Результаты с необязательным ключом usage
+
+    Returns:
+        dict: Суммарный расход
+    """
+    total = empty_usage()
+    for result in results:
+        usage = result.get("usage") if result else None
+        if not usage:
+            continue
+        for key in total:
+            total[key] += usage[key]
+    return total
+
+
+def format_usage(usage):
+    """Краткое описание расхода для строки состояния и журнала"""
+    return (f"оплачено {usage['billed_seconds'] / 60:.1f} мин (${usage['cost']:.3f}), "
+            f"запросов: {usage['requests']}, отправлено {usage['bytes'] / (1024 * 1024):.1f} МБ")
+
+
+class UsageLedger:
+    """
+    Журнал расхода распознавания и проверка бюджетов
+
+    Каждый запрос записывается в SQLite, по журналу считаются итоги за день и
+    за последний час. Бюджеты задаются в минутах оплачиваемого аудио:
+    WHISPER_DAILY_BUDGET_MINUTES и WHISPER_HOURLY_BUDGET_MINUTES.
+    """
+
+    def __init__(self, db_path=None, daily_budget_minutes=None, hourly_budget_minutes=None):
+        self.db_path = db_path or os.getenv("WHISPER_USAGE_PATH", "usage.sqlite")
+        if daily_budget_minutes is None and os.getenv("WHISPER_DAILY_BUDGET_MINUTES"):
+            daily_budget_minutes = float(os.getenv("WHISPER_DAILY_BUDGET_MINUTES"))
+        if hourly_budget_minutes is None and os.getenv("WHISPER_HOURLY_BUDGET_MINUTES"):
+            hourly_budget_minutes = float(os.getenv("WHISPER_HOURLY_BUDGET_MINUTES"))
+        self.daily_budget_seconds = daily_budget_minutes * 60 if daily_budget_minutes else None
+        self.hourly_budget_seconds = hourly_budget_minutes * 60 if hourly_budget_minutes else None
+        self.lock = threading.Lock()
+
+        # Журнал пишут потоки транскрибации, доступ защищен блокировкой
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS requests ("
+                "time REAL, day TEXT, backend TEXT, billed_seconds REAL, bytes INTEGER, cost REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS requests_time ON requests (time)")
+
+    def record(self, backend, usage):
+        """Записать расход одного запроса"""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO requests (time, day, backend, billed_seconds, bytes, cost) VALUES (?, ?, ?, ?, ?, ?)",
+                (now, datetime.fromtimestamp(now).strftime("%Y-%m-%d"), backend,
+                 usage["billed_seconds"], usage["bytes"], usage["cost"])
+            )
+
+    def _billed_since(self, moment):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT COALESCE(SUM(billed_seconds), 0) FROM requests WHERE time >= ?", (moment,)
+            ).fetchone()
+        return row[0]
+
+    def daily_summary(self, days=30):
+        """
+        Итоги расхода по дням и движкам
+
+        Returns:
+            list: Словари {"day", "backend", "requests", "billed_seconds", "bytes", "cost"}, новые дни первыми
+        """
+        border = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT day, backend, COUNT(*), SUM(billed_seconds), SUM(bytes), SUM(cost) FROM requests "
+                "WHERE day >= ? GROUP BY day, backend ORDER BY day DESC, backend", (border,)
+            ).fetchall()
+        return [
+            {"day": day, "backend": backend, "requests": requests, "billed_seconds": billed_seconds,
+             "bytes": size, "cost": cost}
+            for day, backend, requests, billed_seconds, size, cost in rows
+        ]
+
+    def _windows(self):
+        """Бюджеты с началом окна и временем его освобождения: (лимит, начало окна, конец окна)"""
+        now = time.time()
+        windows = []
+        if self.daily_budget_seconds:
+            midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            windows.append((self.daily_budget_seconds, midnight.timestamp(),
+                            (midnight + timedelta(days=1)).timestamp()))
+        if self.hourly_budget_seconds:
+            windows.append((self.hourly_budget_seconds, now - 3600, None))
+        return windows
+
+    def budget_state(self, planned_seconds=0.0):
+        """
+        Состояние бюджета с учетом планируемого запроса
+
+        Args:
+            planned_seconds (float): Длительность аудио, которое собираются отправить
+
+        Returns:
+            str: BUDGET_OK, BUDGET_ECONOMY (близко к лимиту) или BUDGET_EXCEEDED
+        """
+        state = BUDGET_OK
+        economy_fraction = get_settings()["budget.economy_fraction"]
+        for limit, start, end in self._windows():
+            spent = self._billed_since(start) + planned_seconds
+            if spent > limit:
+                return BUDGET_EXCEEDED
+            if spent > limit * economy_fraction:
+                state = BUDGET_ECONOMY
+        return state
+
+    def seconds_until_available(self, planned_seconds=0.0):
+        """
+        Сколько ждать, пока запрос поместится в бюджет
+
+        Returns:
+            float: Секунды ожидания (0 - можно отправлять сразу)
+        """
+        now = time.time()
+        wait = 0.0
+        for limit, start, end in self._windows():
+            if self._billed_since(start) + planned_seconds <= limit:
+                continue
+            if end is not None:
+                # Дневной бюджет освобождается в полночь
+                wait = max(wait, end - now)
+                continue
+
+            # Скользящее окно: ждем, пока из него выйдет достаточно старых запросов
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT time, billed_seconds FROM requests WHERE time >= ? ORDER BY time", (start,)
+                ).fetchall()
+            spent = sum(billed for moment, billed in rows)
+            for moment, billed in rows:
+                spent -= billed
+                if spent + planned_seconds <= limit:
+                    wait = max(wait, moment + 3600 - now)
+                    break
+            else:
+                wait = max(wait, 3600.0)
+        return wait
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
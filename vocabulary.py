@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+
+# Общий словарь для всех менеджеров: названия компании, продуктов, тарифов
+COMMON_GLOSSARY = "common"
+
+# Максимальная длина словарной части подсказки в символах. Вместе с хвостом предыдущей
+# части (transcriber.PROMPT_MAX_CHARS) подсказка укладывается в 224 токена, которые учитывает Whisper
+GLOSSARY_MAX_CHARS = 250
+
+
+def glossary_file_name(manager):
+    """Имя файла словаря менеджера без символов, недопустимых в именах файлов"""
+    name = re.sub(r'[\\/:*?"<>|]+', "_", manager.strip())
+    return f"{name}.txt"
+
+
+def read_terms(path):
+    """
+    Прочитать термины из файла словаря
+
+    Формат: один термин на строке, пустые строки и строки с # пропускаются.
+
+    Args:
+        path (str): Путь к файлу словаря
+
+    Returns:
+        list: Термины в порядке файла
+    """
+    terms = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            term = line.strip()
+            if term and not term.startswith("#"):
+                terms.append(term)
+    return terms
+
+
+def compile_prompt(terms, max_chars=GLOSSARY_MAX_CHARS):
+    """
+    Собрать подсказку из терминов без повторов, не длиннее max_chars
+
+    Термины, которые не помещаются целиком, отбрасываются: первыми в файле должны
+    идти самые важные.
+
+    Returns:
+        str: Термины через запятую с точкой в конце или пустая строка
+    """
+    seen = set()
+    selected = []
+    length = 0
+    for term in terms:
+        key = term.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        added = len(term) + (2 if selected else 1)
+        if length + added > max_chars:
+            continue
+        selected.append(term)
+        length += added
+    return ", ".join(selected) + "." if selected else ""
+
+
+def combine_prompt(glossary, context):
+    """
+    Объединить словарь и хвост предыдущего текста в одну подсказку
+
+    Хвост идет последним: Whisper продолжает текст подсказки, поэтому непосредственно
+    перед аудио должен стоять предыдущий фрагмент разговора.
+
+    Returns:
+        str: Подсказка или None, если обе части пустые
+    """
+    parts = [part for part in (glossary, context) if part]
+    return " ".join(parts) or None
+
+
+class Vocabulary:
+    """
+    Словари терминов менеджеров для подсказки (prompt) распознавания
+
+    Словари хранятся в папке glossaries/: common.txt - общие термины, <имя менеджера>.txt -
+    имена клиентов и продукты конкретного менеджера. Собранные подсказки кешируются и
+    пересобираются только при изменении файлов, поэтому словари можно править без
+    перезапуска приложения.
+    """
+
+    def __init__(self, glossary_dir=None):
+        """
+        Args:
+            glossary_dir (str, optional): Папка словарей (по умолчанию - переменная
+                WHISPER_GLOSSARY_DIR или glossaries)
+        """
+        self.glossary_dir = glossary_dir or os.getenv("WHISPER_GLOSSARY_DIR", "glossaries")
+        self.lock = threading.Lock()
+        # Имя менеджера -> (время изменения файлов, собранная подсказка)
+        self.prompts = {}
+
+    def _paths(self, manager):
+        """Файлы словарей менеджера: сначала личный, затем общий"""
+        names = []
+        if manager and manager.strip():
+            names.append(glossary_file_name(manager))
+        names.append(f"{COMMON_GLOSSARY}.txt")
+        return [os.path.join(self.glossary_dir, name) for name in names]
+
+    def _signature(self, paths):
+        signature = []
+        for path in paths:
+            try:
+                signature.append(os.path.getmtime(path))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def prompt_for(self, manager=None):
+        """
+        Подсказка со словарем менеджера и общими терминами
+
+        Args:
+            manager (str, optional): Имя менеджера
+
+        Returns:
+            str: Подсказка или пустая строка, если словарей нет
+        """
+        key = (manager or "").strip()
+        paths = self._paths(key)
+        signature = self._signature(paths)
+        with self.lock:
+            cached = self.prompts.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        terms = []
+        for path, mtime in zip(paths, signature):
+            if mtime is None:
+                continue
+            try:
+                terms.extend(read_terms(path))
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[WARNING] Не удалось прочитать словарь {path}: {e}")
+        prompt = compile_prompt(terms)
+        if prompt:
+            print(f"[INFO] Словарь терминов{' менеджера ' + key if key else ''}: {prompt[:100]}")
+
+        with self.lock:
+            self.prompts[key] = (signature, prompt)
+        return prompt
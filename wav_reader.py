@@ -0,0 +1,239 @@
+import io
+import math
+import mmap
+import struct
+
+# Код формата PCM в заголовке WAV
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavReader:
+    """
+    Чтение WAV файла без копирования данных в память
+
+    Файл отображается в память через mmap, заголовок разбирается один раз,
+    а фрагменты отдаются как memoryview поверх отображения. Операционная система
+    подгружает с диска только те страницы, к которым действительно обращаются.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        """Разобрать RIFF заголовок и найти блоки fmt и data"""
+        if len(self.map) < 12 or self.map[0:4] not in (b"RIFF", b"RF64") or self.map[8:12] != b"WAVE":
+            raise ValueError(f"Файл {self.path} не является WAV файлом")
+
+        self.format_tag = None
+        self.data_offset = None
+        self.data_size = 0
+        # В RF64 (записи больше 4 ГБ) размер данных хранится в блоке ds64
+        ds64_data_size = None
+
+        position = 12
+        while position + 8 <= len(self.map):
+            chunk_id = self.map[position:position + 4]
+            chunk_size = struct.unpack_from("<I", self.map, position + 4)[0]
+            body = position + 8
+
+            if chunk_id == b"ds64":
+                ds64_data_size = struct.unpack_from("<Q", self.map, body + 8)[0]
+            elif chunk_id == b"fmt ":
+                (self.format_tag, self.channels, self.sample_rate, self.byte_rate,
+                 self.block_align, self.bits_per_sample) = struct.unpack_from("<HHIIHH", self.map, body)
+            elif chunk_id == b"data":
+                self.data_offset = body
+                if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                    chunk_size = ds64_data_size
+                # В оборванном файле размер в заголовке может быть неверным - верим длине файла
+                self.data_size = min(chunk_size, len(self.map) - body)
+                break
+
+            # Блоки выравниваются по четной границе
+            position = body + chunk_size + (chunk_size & 1)
+
+        if self.format_tag is None or self.data_offset is None:
+            raise ValueError(f"В файле {self.path} не найдены блоки fmt или data")
+
+        # Неполный последний фрейм не используем
+        self.data_size -= self.data_size % self.block_align
+
+    @property
+    def sample_width(self):
+        """Размер одного отсчета в байтах"""
+        return self.bits_per_sample // 8
+
+    @property
+    def is_pcm16(self):
+        """Файл содержит 16-битный PCM"""
+        return self.format_tag in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE) and self.bits_per_sample == 16
+
+    @property
+    def frame_count(self):
+        """Количество фреймов (отсчетов на канал)"""
+        return self.data_size // self.block_align
+
+    @property
+    def duration(self):
+        """Длительность в секундах"""
+        return self.frame_count / float(self.sample_rate)
+
+    def _byte_range(self, start=0.0, end=None):
+        """Границы фрагмента [start, end) в секундах в виде смещений в данных"""
+        first = min(self.frame_count, max(0, int(start * self.sample_rate)))
+        last = self.frame_count if end is None else min(self.frame_count, max(first, int(end * self.sample_rate)))
+        return self.data_offset + first * self.block_align, self.data_offset + last * self.block_align
+
+    def frames(self, start=0.0, end=None):
+        """
+        Получить сырые PCM данные фрагмента без копирования
+
+        Args:
+            start (float): Начало фрагмента в секундах
+            end (float, optional): Конец фрагмента в секундах (по умолчанию - до конца файла)
+
+        Returns:
+            memoryview: Байты фрагмента поверх отображенного файла
+        """
+        first, last = self._byte_range(start, end)
+        return self.view[first:last]
+
+    def samples(self, start=0.0, end=None):
+        """
+        Получить отсчеты 16-битного PCM фрагмента без копирования
+
+        Для многоканальных файлов отсчеты каналов чередуются.
+
+        Returns:
+            memoryview: Отсчеты в формате int16
+        """
+        if not self.is_pcm16:
+            raise ValueError("Доступ к отсчетам поддерживается только для 16-битного PCM")
+        return self.frames(start, end).cast("h")
+
+    def as_numpy(self, start=0.0, end=None):
+        """
+        Получить фрагмент как массив NumPy формы (фреймы, каналы) без копирования
+
+        Returns:
+            numpy.ndarray: Массив int16 только для чтения
+        """
+        import numpy as np
+
+        if not self.is_pcm16:
+            raise ValueError("Доступ к отсчетам поддерживается только для 16-битного PCM")
+        return np.frombuffer(self.frames(start, end), dtype="<i2").reshape(-1, self.channels)
+
+    def rms(self, start=0.0, end=None):
+        """
+        Среднеквадратичная амплитуда фрагмента
+
+        Returns:
+            float: RMS в единицах отсчетов int16
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            data = self.as_numpy(start, end)
+            if data.size == 0:
+                return 0.0
+            return float(np.sqrt(np.mean(np.square(data, dtype=np.float64))))
+
+        values = self.samples(start, end)
+        if not len(values):
+            return 0.0
+        return math.sqrt(sum(float(sample * sample) for sample in values) / len(values))
+
+    def dbfs(self, start=0.0, end=None):
+        """Уровень фрагмента в dBFS (минус бесконечность для полной тишины)"""
+        rms = self.rms(start, end)
+        if rms == 0:
+            return -float("inf")
+        return 20 * math.log10(rms / 32768.0)
+
+    def rms_profile(self, window=0.03, start=0.0, end=None):
+        """
+        RMS по окнам фиксированной длины, например для простого детектора речи
+
+        Args:
+            window (float): Длина окна в секундах
+            start (float): Начало фрагмента в секундах
+            end (float, optional): Конец фрагмента в секундах
+
+        Returns:
+            list: RMS для каждого окна
+        """
+        end = self.duration if end is None else min(end, self.duration)
+        profile = []
+        position = start
+        while position < end:
+            profile.append(self.rms(position, min(position + window, end)))
+            position += window
+        return profile
+
+    def wav_header(self, data_size, channels=None, sample_rate=None):
+        """Заголовок PCM WAV для данных размером data_size байт"""
+        channels = channels or self.channels
+        sample_rate = sample_rate or self.sample_rate
+        block_align = channels * self.sample_width
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + data_size, b"WAVE",
+            b"fmt ", 16, WAVE_FORMAT_PCM, channels, sample_rate, sample_rate * block_align, block_align,
+            self.bits_per_sample,
+            b"data", data_size
+        )
+
+    def export_wav(self, start=0.0, end=None):
+        """
+        Сохранить фрагмент как самостоятельный WAV файл в памяти
+
+        Args:
+            start (float): Начало фрагмента в секундах
+            end (float, optional): Конец фрагмента в секундах
+
+        Returns:
+            io.BytesIO: Буфер с WAV файлом, позиция в начале
+        """
+        data = self.frames(start, end)
+        buffer = io.BytesIO()
+        buffer.write(self.wav_header(len(data)))
+        buffer.write(data)
+        buffer.seek(0)
+        return buffer
+
+    def close(self):
+        """Освободить отображение и закрыть файл"""
+        view = getattr(self, "view", None)
+        if view is not None:
+            view.release()
+            self.view = None
+        if getattr(self, "map", None) is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # Кто-то еще держит memoryview на данные; отображение закроется вместе с ним
+                print(f"[WARNING] Отображение файла {self.path} еще используется")
+            self.map = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,245 @@
+import os
+import time
+import struct
+
+# Код формата PCM в заголовке WAV
+WAVE_FORMAT_PCM = 1
+
+# Блок JUNK резервирует место под блок ds64: если запись превысит 4 ГБ, заголовок
+# переписывается в формат RF64 на месте, без сдвига уже записанных данных
+DS64_SIZE = 28
+HEADER_SIZE = 12 + (8 + DS64_SIZE) + (8 + 16) + 8
+
+# Максимальное значение 32-битного поля размера
+MAX_CHUNK_SIZE = 0xFFFFFFFF
+
+# Как часто обновлять размеры в заголовке и сбрасывать данные на диск
+# (в приложении задается настройкой recording.checkpoint_seconds)
+CHECKPOINT_SECONDS = 5.0
+
+
+def build_header(data_size, channels, sample_width, rate):
+    """
+    Заголовок WAV фиксированной длины HEADER_SIZE для данных размером data_size
+
+    Returns:
+        bytes: Заголовок RIFF (с блоком JUNK) или RF64 (с блоком ds64), если данные больше 4 ГБ
+    """
+    block_align = channels * sample_width
+    fmt = struct.pack("<HHIIHH", WAVE_FORMAT_PCM, channels, rate, rate * block_align, block_align, sample_width * 8)
+    riff_size = HEADER_SIZE - 8 + data_size + (data_size & 1)
+
+    if riff_size <= MAX_CHUNK_SIZE:
+        return (b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+                + b"JUNK" + struct.pack("<I", DS64_SIZE) + bytes(DS64_SIZE)
+                + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+                + b"data" + struct.pack("<I", data_size))
+
+    ds64 = struct.pack("<QQQI", riff_size, data_size, data_size // block_align, 0)
+    return (b"RF64" + struct.pack("<I", MAX_CHUNK_SIZE) + b"WAVE"
+            + b"ds64" + struct.pack("<I", DS64_SIZE) + ds64
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", MAX_CHUNK_SIZE))
+
+
+class WavStreamWriter:
+    """
+    Запись WAV на диск по мере поступления отсчетов
+
+    Данные дописываются в конец файла, а размеры в заголовке обновляются каждые
+    несколько секунд (checkpoint_seconds) с последующим fsync.
+    При аварийном завершении процесса на диске остается корректный файл, в котором
+    потеряны не более последних секунд; заголовок такого файла исправляет repair_wav.
+    """
+
+    def __init__(self, path, channels, sample_width, rate, checkpoint_seconds=None):
+        """
+        Args:
+            path (str): Путь к файлу
+            channels (int): Количество каналов
+            sample_width (int): Размер отсчета в байтах
+            rate (int): Частота дискретизации
+            checkpoint_seconds (float, optional): Интервал обновления заголовка
+        """
+        self.path = path
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.checkpoint_seconds = CHECKPOINT_SECONDS if checkpoint_seconds is None else checkpoint_seconds
+        self.data_size = 0
+        self.file = open(path, "wb")
+        self.file.write(build_header(0, channels, sample_width, rate))
+        self.last_checkpoint = time.monotonic()
+
+    @property
+    def duration(self):
+        """Длительность записанного аудио в секундах"""
+        return self.data_size / float(self.rate * self.channels * self.sample_width)
+
+    def write(self, data):
+        """Дописать фреймы и при необходимости обновить заголовок"""
+        self.file.write(data)
+        self.data_size += len(data)
+        if time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Записать текущие размеры в заголовок и сбросить файл на диск"""
+        self.file.flush()
+        self.file.seek(0)
+        self.file.write(build_header(self.data_size, self.channels, self.sample_width, self.rate))
+        self.file.seek(0, os.SEEK_END)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_checkpoint = time.monotonic()
+
+    def close(self):
+        """Завершить файл: выравнивающий байт, окончательный заголовок"""
+        if self.file is None:
+            return
+        try:
+            if self.data_size & 1:
+                self.file.write(b"\0")
+            self.checkpoint()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_layout(f, file_size):
+    """
+    Найти в заголовке WAV поля размеров
+
+    Returns:
+        dict: {"form", "ds64_offset", "junk_offset", "fmt", "data_offset", "declared_size"}
+            или None, если это не WAV
+    """
+    f.seek(0)
+    head = f.read(12)
+    if len(head) < 12 or head[0:4] not in (b"RIFF", b"RF64") or head[8:12] != b"WAVE":
+        return None
+
+    layout = {"form": head[0:4], "ds64_offset": None, "junk_offset": None, "fmt": None,
+              "data_offset": None, "declared_size": 0}
+    ds64_data_size = None
+    position = 12
+    while position + 8 <= file_size:
+        f.seek(position)
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        body = position + 8
+        if chunk_id == b"ds64":
+            layout["ds64_offset"] = body
+            ds64_data_size = struct.unpack("<QQ", f.read(16))[1]
+        elif chunk_id == b"JUNK" and chunk_size >= DS64_SIZE:
+            layout["junk_offset"] = position
+        elif chunk_id == b"fmt ":
+            layout["fmt"] = struct.unpack("<HHIIHH", f.read(16))
+        elif chunk_id == b"data":
+            layout["data_offset"] = body
+            layout["declared_size"] = ds64_data_size if chunk_size == MAX_CHUNK_SIZE and ds64_data_size is not None \
+                else chunk_size
+            break
+        position = body + chunk_size + (chunk_size & 1)
+
+    if layout["fmt"] is None or layout["data_offset"] is None:
+        return None
+    return layout
+
+
+def _has_trailing_chunk(f, position, file_size):
+    """После блока data по смещению position начинается корректный блок RIFF"""
+    if position + 8 > file_size:
+        return False
+    f.seek(position)
+    chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+    return all(32 <= byte < 127 for byte in chunk_id) and position + 8 + chunk_size <= file_size
+
+
+def repair_wav(path):
+    """
+    Исправить заголовок WAV файла, оборванного аварийным завершением записи
+
+    Размер данных берется по фактической длине файла (без неполного последнего фрейма),
+    после чего обновляются поля размеров RIFF/data или ds64 для файлов больше 4 ГБ.
+
+    Args:
+        path (str): Путь к WAV файлу
+
+    Returns:
+        bool: True, если заголовок был исправлен
+    """
+    with open(path, "r+b") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        layout = _read_layout(f, file_size)
+        if layout is None:
+            return False
+
+        block_align = layout["fmt"][4] or 1
+        data_offset = layout["data_offset"]
+        actual_size = file_size - data_offset
+        actual_size -= actual_size % block_align
+        declared_size = layout["declared_size"]
+        if declared_size == actual_size and data_offset + actual_size + (actual_size & 1) == file_size:
+            return False
+        if declared_size < actual_size and _has_trailing_chunk(f, data_offset + declared_size + (declared_size & 1),
+                                                               file_size):
+            # После данных идут служебные блоки (LIST и т.п.) - файл цел
+            return False
+
+        f.truncate(data_offset + actual_size)
+        riff_size = data_offset + actual_size - 8
+        if riff_size <= MAX_CHUNK_SIZE and layout["form"] == b"RIFF":
+            f.seek(4)
+            f.write(struct.pack("<I", riff_size))
+            f.seek(data_offset - 4)
+            f.write(struct.pack("<I", actual_size))
+        elif layout["ds64_offset"] is not None or layout["junk_offset"] is not None:
+            # Больше 4 ГБ: размеры хранятся в блоке ds64 (на месте блока JUNK, если его еще нет)
+            ds64_offset = layout["ds64_offset"]
+            if ds64_offset is None:
+                f.seek(layout["junk_offset"])
+                f.write(b"ds64" + struct.pack("<I", DS64_SIZE))
+                ds64_offset = layout["junk_offset"] + 8
+            f.seek(0)
+            f.write(b"RF64" + struct.pack("<I", MAX_CHUNK_SIZE))
+            f.seek(ds64_offset)
+            f.write(struct.pack("<QQQ", riff_size, actual_size, actual_size // block_align))
+            f.seek(data_offset - 4)
+            f.write(struct.pack("<I", MAX_CHUNK_SIZE))
+        else:
+            raise ValueError(f"Файл {path} больше 4 ГБ и не содержит места под заголовок RF64")
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def repair_directory(directory):
+    """
+    Проверить WAV файлы папки записей и исправить оборванные
+
+    Args:
+        directory (str): Папка с записями
+
+    Returns:
+        list: Пути к исправленным файлам
+    """
+    repaired = []
+    if not os.path.isdir(directory):
+        return repaired
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(".wav"):
+                continue
+            try:
+                if repair_wav(entry.path):
+                    repaired.append(entry.path)
+                    print(f"[INFO] Восстановлен заголовок оборванной записи {entry.path}")
+            except (OSError, ValueError, struct.error) as e:
+                print(f"[WARNING] Не удалось проверить запись {entry.path}: {e}")
+    return sorted(repaired)